@@ -0,0 +1,268 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from .equipment_catalog import MONGO_ENSURE_INDEXES, ensure_index
+
+# ----- Configuration -----
+ALARM_STATS_ENABLED = os.getenv("ALARM_STATS_ENABLED", "true").lower() == "true"
+ALARM_STATS_REFRESH_SECONDS = float(os.getenv("ALARM_STATS_REFRESH", "30"))
+ALARM_STATS_MAX_STALENESS = float(os.getenv("ALARM_STATS_MAX_STALENESS", "300"))
+ALARM_STATS_PRIME_TIMEOUT = float(os.getenv("ALARM_STATS_PRIME_TIMEOUT", "60"))
+ALARM_STATS_REPRIME_SECONDS = float(os.getenv("ALARM_STATS_REPRIME_SECONDS", "30"))  # Retry delay for the prime and index check
+ALARM_RECENT_DAYS = 30       # Daily buckets kept per alarm
+ALARM_TREND_DAYS = 7         # Daily counts returned with each alarm
+ALARM_POLL_BATCH = 5000
+
+ALARM_COLLECTION = "Alarm History"
+ALARM_PROJECTION = {"L1Name": 1, "signalname": 1, "updatedate": 1}
+
+# New alarms are found by updatedate alone, which the (L1Name, updatedate) index can't serve
+ALARM_POLL_INDEX = [("updatedate", 1)]
+
+
+class AlarmStats:
+    """
+    Materialized alarm frequencies per L1Name, kept in process memory.
+
+    For every (L1Name, signalname): total count, last occurrence and daily
+    counts for the last ALARM_RECENT_DAYS. Built once with a $group over
+    Alarm History, then advanced by a background job that reads only alarms
+    at or after the updatedate high-water mark. HistoryAgent.check_history
+    becomes a dictionary lookup instead of an aggregation per diagnosis.
+
+    Recent windows are measured back from the newest alarm seen, so imported
+    or paused data still has meaningful "last 7 days" counts. Polling needs an
+    index on updatedate; without one the summary stays disabled and
+    check_history keeps running the aggregation.
+    """
+
+    def __init__(self, db, refresh_interval: float = ALARM_STATS_REFRESH_SECONDS,
+                 max_staleness: float = ALARM_STATS_MAX_STALENESS):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        # L1Name -> signalname -> {"count", "last", "daily": {date: count}}
+        self._stats: Dict[str, Dict[str, dict]] = {}
+        self.high_water = None
+        self._boundary_ids = set()     # _ids already counted at exactly high_water
+        self.synced_at: Optional[float] = None
+        self.primed = False            # Polls only advance a primed summary
+        self.disabled_reason: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"reads": 0, "stale_reads": 0, "alarms_applied": 0, "sync_errors": 0}
+
+    def is_fresh(self) -> bool:
+        return (self.primed and self.disabled_reason is None and self.synced_at is not None
+                and time.time() - self.synced_at <= self.max_staleness)
+
+    # ----- Maintenance -----
+
+    def _entry(self, name: str, signal: str) -> dict:
+        return self._stats.setdefault(name, {}).setdefault(signal, {"count": 0, "last": None, "daily": {}})
+
+    def _advance_high_water(self, doc: dict):
+        updated = doc["updatedate"]
+        if self.high_water is None or updated > self.high_water:
+            self.high_water = updated
+            self._boundary_ids = {doc["_id"]}
+        elif updated == self.high_water:
+            self._boundary_ids.add(doc["_id"])
+
+    def _apply(self, doc: dict):
+        name, signal, updated = doc.get("L1Name"), doc.get("signalname"), doc.get("updatedate")
+        if not isinstance(name, str) or updated is None:
+            return
+        entry = self._entry(name, signal)
+        entry["count"] += 1
+        if entry["last"] is None or updated > entry["last"]:
+            entry["last"] = updated
+        day = updated.date()
+        entry["daily"][day] = entry["daily"].get(day, 0) + 1
+        self._advance_high_water(doc)
+        self.stats["alarms_applied"] += 1
+
+    def _prune_daily(self):
+        if self.high_water is None:
+            return
+        cutoff = (self.high_water - timedelta(days=ALARM_RECENT_DAYS)).date()
+        for signals in self._stats.values():
+            for entry in signals.values():
+                for day in [d for d in entry["daily"] if d <= cutoff]:
+                    del entry["daily"][day]
+
+    async def prime(self):
+        """Full rebuild: totals by $group, then daily buckets from the recent window only."""
+        collection = self.db[ALARM_COLLECTION]
+        stats: Dict[str, Dict[str, dict]] = {}
+        high_water = None
+        pipeline = [{"$group": {
+            "_id": {"L1Name": "$L1Name", "signalname": "$signalname"},
+            "count": {"$sum": 1},
+            "last": {"$max": "$updatedate"},
+        }}]
+        async for row in collection.aggregate(pipeline, allowDiskUse=True):
+            name = row["_id"].get("L1Name")
+            if not isinstance(name, str) or row["last"] is None:
+                continue
+            stats.setdefault(name, {})[row["_id"].get("signalname")] = {"count": row["count"], "last": row["last"], "daily": {}}
+            high_water = row["last"] if high_water is None or row["last"] > high_water else high_water
+
+        self._stats, self.high_water, self._boundary_ids = stats, high_water, set()
+        if high_water is None:
+            self.primed = True
+            self.synced_at = time.time()
+            return
+
+        # Bounded by high_water so alarms arriving meanwhile are left to poll_once
+        window = {"$gt": high_water - timedelta(days=ALARM_RECENT_DAYS), "$lte": high_water}
+        async for doc in collection.find({"updatedate": window}, ALARM_PROJECTION):
+            entry = stats.get(doc.get("L1Name"), {}).get(doc.get("signalname"))
+            if entry is None:
+                continue
+            day = doc["updatedate"].date()
+            entry["daily"][day] = entry["daily"].get(day, 0) + 1
+            if doc["updatedate"] == high_water:
+                self._boundary_ids.add(doc["_id"])
+        self.primed = True
+        self.synced_at = time.time()
+
+    async def _prime_until_ready(self):
+        """Retry the prime until it succeeds; until then is_fresh() stays False and callers aggregate."""
+        while not self.primed:
+            try:
+                await asyncio.wait_for(self.prime(), timeout=ALARM_STATS_PRIME_TIMEOUT)
+                print(f"✅ Alarm stats ready: {len(self._stats)} machines")
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                print(f"⚠️ Alarm stats prime failed: {e!r}; retrying in {ALARM_STATS_REPRIME_SECONDS:g}s")
+                await asyncio.sleep(ALARM_STATS_REPRIME_SECONDS)
+
+    async def poll_once(self):
+        """Apply alarms newer than (or tied with, but not yet counted at) the high-water mark."""
+        if not self.primed:
+            # Without a prime there is no high-water mark and this would read the whole collection
+            return
+        collection = self.db[ALARM_COLLECTION]
+        while True:
+            query = {"updatedate": {"$gte": self.high_water}} if self.high_water is not None else {}
+            docs = await collection.find(query, ALARM_PROJECTION).sort("updatedate", 1).limit(
+                ALARM_POLL_BATCH
+            ).to_list(length=ALARM_POLL_BATCH)
+            new = [doc for doc in docs if doc["_id"] not in self._boundary_ids]
+            for doc in new:
+                self._apply(doc)
+            if len(docs) < ALARM_POLL_BATCH or not new:
+                break
+        self._prune_daily()
+        self.synced_at = time.time()
+
+    async def _wait_for_poll_index(self):
+        """
+        Return once Alarm History has the updatedate index (created when
+        MONGO_ENSURE_INDEXES is set). Until then the summary is disabled and the
+        check is retried every ALARM_STATS_REPRIME_SECONDS.
+        """
+        while True:
+            try:
+                reason = await asyncio.wait_for(
+                    ensure_index(self.db[ALARM_COLLECTION], ALARM_POLL_INDEX, create=MONGO_ENSURE_INDEXES),
+                    timeout=ALARM_STATS_PRIME_TIMEOUT,
+                )
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                reason = f"index check failed: {e!r}"
+            if reason is None:
+                self.disabled_reason = None
+                return
+            reason = f"polling needs an updatedate index: {reason}"
+            if reason != self.disabled_reason:
+                print(f"⚠️ Alarm stats disabled, {reason}; rechecking every {ALARM_STATS_REPRIME_SECONDS:g}s")
+            self.disabled_reason = reason
+            await asyncio.sleep(ALARM_STATS_REPRIME_SECONDS)
+
+    async def _run(self):
+        await self._wait_for_poll_index()
+        await self._prime_until_ready()
+        await self._poll_loop()
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.poll_once()
+            except PyMongoError as e:
+                self.stats["sync_errors"] += 1
+                print(f"Alarm stats poll failed: {e}")
+
+    async def start(self):
+        """
+        Build the summary and keep it current in a background task; returns at once.
+
+        The task first waits for the updatedate index (polling without it would
+        scan the collection), then primes, then polls. Each step is retried
+        until it succeeds; until then check_history runs the aggregation.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ----- Reads -----
+
+    def top_alarms(self, names: List[str], limit: int = 5) -> Tuple[bool, List[dict]]:
+        """
+        Most frequent alarms across the given L1Names.
+
+        Returns:
+            (fresh, issues). When fresh is False the summary is out of date and
+            issues is empty; callers should run the aggregation instead.
+        """
+        if not self.is_fresh():
+            self.stats["stale_reads"] += 1
+            return False, []
+        self.stats["reads"] += 1
+
+        merged: Dict[str, dict] = {}
+        for name in names:
+            for signal, entry in self._stats.get(name, {}).items():
+                m = merged.setdefault(signal, {"count": 0, "last": None, "daily": {}})
+                m["count"] += entry["count"]
+                if entry["last"] is not None and (m["last"] is None or entry["last"] > m["last"]):
+                    m["last"] = entry["last"]
+                for day, count in entry["daily"].items():
+                    m["daily"][day] = m["daily"].get(day, 0) + count
+
+        top = sorted(merged.items(), key=lambda item: item[1]["count"], reverse=True)[:limit]
+        return True, [self._describe(signal, entry) for signal, entry in top]
+
+    def _describe(self, signal: str, entry: dict) -> dict:
+        end = self.high_water.date()
+        trend_days = [end - timedelta(days=i) for i in range(ALARM_TREND_DAYS - 1, -1, -1)]
+        return {
+            "issue": signal,
+            "frequency": entry["count"],
+            "last_seen": entry["last"].isoformat() if entry["last"] else "Unknown",
+            "last_7d": sum(c for d, c in entry["daily"].items() if d > end - timedelta(days=7)),
+            "last_30d": sum(entry["daily"].values()),
+            "daily_trend": [entry["daily"].get(day, 0) for day in trend_days],
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "machines": len(self._stats),
+            "primed": self.primed,
+            "disabled_reason": self.disabled_reason,
+            "fresh": self.is_fresh(),
+            "high_water": self.high_water.isoformat() if self.high_water else None,
+            "age_s": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+        }
+
@@ -0,0 +1,164 @@
+import asyncio
+import difflib
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+# ----- Configuration -----
+CATALOG_REFRESH_SECONDS = float(os.getenv("EQUIPMENT_CATALOG_REFRESH", "300"))
+CATALOG_COLLECTIONS = ("L1Single_Pool", "july_a4_servo", "Alarm History")
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "false").lower() == "true"
+FUZZY_CUTOFF = 0.8           # difflib ratio a token needs to match a name it isn't part of
+MIN_TOKEN_LENGTH = 3
+
+# Indexes the equipment queries rely on (created by ensure_indexes when enabled)
+EQUIPMENT_INDEXES = {
+    "L1Single_Pool": [("L1Name", 1), ("signalname", 1), ("updatedate", -1)],
+    "july_a4_servo": [("L1Name", 1), ("signalname", 1), ("updatedate", -1)],
+    "Alarm History": [("L1Name", 1), ("updatedate", -1)],
+}
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_\-]+")
+
+
+class EquipmentCatalog:
+    """
+    In-memory index of the L1Name values in the mtlinki collections.
+
+    Resolves free text ("pump", "h_op100", "OP-100 spindle") to exact L1Name
+    values, so Mongo queries can filter with {"L1Name": {"$in": names}} on an
+    index instead of an unanchored case-insensitive $regex that scans every
+    document. Names are reloaded (distinct, which can use the L1Name index)
+    every CATALOG_REFRESH_SECONDS.
+    """
+
+    def __init__(self, db, refresh_interval: float = CATALOG_REFRESH_SECONDS,
+                 collections=CATALOG_COLLECTIONS):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.collections = collections
+        self._names: List[str] = []
+        self._by_lower: Dict[str, List[str]] = {}
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {"refreshes": 0, "refresh_errors": 0, "resolved": 0, "fuzzy": 0, "unresolved": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    async def refresh(self):
+        names = set()
+        for collection in self.collections:
+            names.update(n for n in await self.db[collection].distinct("L1Name") if isinstance(n, str))
+
+        by_lower: Dict[str, List[str]] = {}
+        for name in sorted(names):
+            by_lower.setdefault(name.lower(), []).append(name)
+
+        self._names = sorted(names)
+        self._by_lower = by_lower
+        self.loaded_at = time.time()
+        self.stats["refreshes"] += 1
+
+    async def ensure_fresh(self):
+        if self.loaded and time.time() - self.loaded_at < self.refresh_interval:
+            return
+        async with self._lock:
+            if self.loaded and time.time() - self.loaded_at < self.refresh_interval:
+                return
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the previous names; callers fall back to regex when never loaded
+                self.stats["refresh_errors"] += 1
+                print(f"Equipment catalog refresh failed: {e}")
+
+    def resolve_loaded(self, text: str) -> List[str]:
+        """
+        Exact L1Name values matching the text, most specific first:
+        1. the whole text equals a name (case-insensitive)
+        2. names containing one of the text's tokens (same hits as the old regex)
+        3. names close to a token (difflib), for typos like "h_op10O"
+        """
+        lowered = text.strip().lower()
+        if lowered in self._by_lower:
+            self.stats["resolved"] += 1
+            return list(self._by_lower[lowered])
+
+        # Short words ("on", "a") would match half the plant, so only longer tokens count
+        tokens = [t.lower() for t in _TOKEN_RE.findall(text) if len(t) >= MIN_TOKEN_LENGTH] or [lowered]
+        matches = [name for name in self._names if any(t in name.lower() for t in tokens)]
+        if matches:
+            self.stats["resolved"] += 1
+            return matches
+
+        fuzzy = []
+        for token in tokens:
+            for close in difflib.get_close_matches(token, list(self._by_lower), n=3, cutoff=FUZZY_CUTOFF):
+                fuzzy.extend(n for n in self._by_lower[close] if n not in fuzzy)
+        self.stats["fuzzy" if fuzzy else "unresolved"] += 1
+        return fuzzy
+
+    async def resolve(self, text: str) -> Optional[List[str]]:
+        """Resolved names, or None when the catalog could not be loaded (callers then use $regex)."""
+        await self.ensure_fresh()
+        if not self.loaded:
+            return None
+        return self.resolve_loaded(text)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                print(f"Equipment catalog refresh failed: {e}")
+
+    def start_refresh_loop(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    def stop_refresh_loop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "names": len(self._names), "loaded_at": self.loaded_at}
+
+
+def equipment_filter(names: Optional[List[str]], equipment: str) -> dict:
+    """L1Name filter: indexed $in when the catalog resolved the text, else the old regex."""
+    if names is None:
+        return {"$regex": re.escape(equipment), "$options": "i"}
+    return {"$in": names}
+
+
+async def ensure_index(collection, keys, create: bool = False) -> Optional[str]:
+    """
+    Make sure the collection has an index whose leading fields are `keys`, creating
+    it when `create` is set.
+
+    Returns:
+        None when the index is there, otherwise why it is missing (for logs/stats)
+    """
+    fields = [field for field, _ in keys]
+    for spec in (await collection.index_information()).values():
+        if [field for field, _ in spec["key"]][:len(fields)] == fields:
+            return None
+    if not create:
+        return f"no index on '{collection.name}' starting with {fields} (MONGO_ENSURE_INDEXES=true creates it)"
+    await collection.create_index(keys)
+    return None
+
+
+async def ensure_indexes(db) -> List[str]:
+    """Create the compound indexes the equipment queries use. Returns the index names."""
+    created = []
+    for collection, keys in EQUIPMENT_INDEXES.items():
+        created.append(await db[collection].create_index(keys))
+    return created
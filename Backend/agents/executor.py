@@ -0,0 +1,56 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Blocking work the agents still do, split by what it waits on:
+# - LLM calls (sync Groq client) mostly wait on the network, so the pool is
+#   sized for concurrent requests x LLM calls per request
+# - search_chunks (MiniLM encode + Chroma query) is CPU-bound, so more threads
+#   than cores only adds contention
+AGENT_LLM_WORKERS = int(os.getenv("AGENT_LLM_WORKERS", "32"))
+AGENT_CPU_WORKERS = int(os.getenv("AGENT_CPU_WORKERS", str(os.cpu_count() or 4)))
+
+_llm_executor = None
+_cpu_executor = None
+
+
+def get_llm_executor() -> ThreadPoolExecutor:
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = ThreadPoolExecutor(max_workers=AGENT_LLM_WORKERS, thread_name_prefix="agent-llm")
+    return _llm_executor
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ThreadPoolExecutor(max_workers=AGENT_CPU_WORKERS, thread_name_prefix="agent-cpu")
+    return _cpu_executor
+
+
+async def run_llm(fn, *args, **kwargs):
+    """Run a blocking LLM call in the LLM executor."""
+    return await asyncio.get_running_loop().run_in_executor(get_llm_executor(), partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run blocking CPU work (embedding, vector search) in the CPU executor."""
+    return await asyncio.get_running_loop().run_in_executor(get_cpu_executor(), partial(fn, *args, **kwargs))
+
+
+def shutdown_agent_executors():
+    global _llm_executor, _cpu_executor
+    for executor in (_llm_executor, _cpu_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _llm_executor = _cpu_executor = None
+
+
+def get_executor_stats() -> dict:
+    return {
+        "llm_workers": AGENT_LLM_WORKERS,
+        "cpu_workers": AGENT_CPU_WORKERS,
+        "llm_queued": _llm_executor._work_queue.qsize() if _llm_executor else 0,
+        "cpu_queued": _cpu_executor._work_queue.qsize() if _cpu_executor else 0,
+    }
@@ -1,11 +1,19 @@
+import asyncio
 import motor.motor_asyncio
 from datetime import datetime
 
+from .sensor_agent import MONGO_URI, MONGO_DB
+from .equipment_catalog import EquipmentCatalog, equipment_filter
+
 class HistoryAgent:
-    def __init__(self):
-        self.mongo_uri = "mongodb://172.18.7.91:27017/"
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongo_uri)
-        self.db = self.client["mtlinki"]
+    def __init__(self, mongo_client=None, catalog=None, alarm_stats=None):
+        # A shared client/catalog can be injected (see AgentRegistry); otherwise this agent opens its own
+        self.mongo_uri = MONGO_URI
+        self.client = mongo_client or motor.motor_asyncio.AsyncIOMotorClient(self.mongo_uri)
+        self.db = self.client[MONGO_DB]
+        self.catalog = catalog or EquipmentCatalog(self.db)
+        # Optional AlarmStats summary; without one (or when it is stale) each call aggregates Alarm History
+        self.alarm_stats = alarm_stats
 
     async def check_history(self, symptoms: list, equipment: str):
         """
@@ -16,8 +24,22 @@ class HistoryAgent:
             # Query Alarm History for the specific equipment
             # We can also filter by signalname if we can map symptoms to signals,
             # but for now, let's get the most frequent alarms for this machine.
+            names = await self.catalog.resolve(equipment)
+            if self.alarm_stats is not None and names is not None:
+                fresh, issues = self.alarm_stats.top_alarms(names, limit=5)
+                if fresh:
+                    history_data = {
+                        "equipment": equipment,
+                        "total_records_found": len(issues),
+                        "frequent_issues": issues,
+                        "source": "materialized"
+                    }
+                    if not issues:
+                        history_data["message"] = "No significant historical alarms found for this equipment."
+                    return history_data
+
             pipeline = [
-                {"$match": {"L1Name": {"$regex": equipment, "$options": "i"}}},
+                {"$match": {"L1Name": equipment_filter(names, equipment)}},
                 {"$group": {"_id": "$signalname", "count": {"$sum": 1}, "last_occurrence": {"$max": "$updatedate"}}},
                 {"$sort": {"count": -1}},
                 {"$limit": 5}
@@ -29,7 +51,8 @@ class HistoryAgent:
             history_data = {
                 "equipment": equipment,
                 "total_records_found": len(results),
-                "frequent_issues": []
+                "frequent_issues": [],
+                "source": "aggregation"
             }
             
             for res in results:
@@ -46,3 +69,65 @@ class HistoryAgent:
 
         except Exception as e:
             return {"error": f"Failed to fetch history data: {str(e)}"}
+
+    async def check_history_bulk(self, equipment_ids: list) -> dict:
+        """
+        check_history for many machines at once (batch diagnosis): point reads from
+        the alarm summary when fresh, otherwise one $in aggregation for all of them.
+
+        Returns:
+            {equipment_id: history_data}
+        """
+        try:
+            names_by_id = {eid: await self.catalog.resolve(eid) for eid in equipment_ids}
+            if any(names is None for names in names_by_id.values()):
+                # Catalog never loaded: no exact names to batch on, use the per-machine path
+                results = await asyncio.gather(*(self.check_history([], eid) for eid in equipment_ids))
+                return dict(zip(equipment_ids, results))
+
+            if self.alarm_stats is not None and self.alarm_stats.is_fresh():
+                issues_by_id = {eid: self.alarm_stats.top_alarms(names, limit=5)[1] for eid, names in names_by_id.items()}
+                source = "materialized"
+            else:
+                all_names = sorted({name for names in names_by_id.values() for name in names})
+                pipeline = [
+                    {"$match": {"L1Name": {"$in": all_names}}},
+                    {"$group": {
+                        "_id": {"L1Name": "$L1Name", "signalname": "$signalname"},
+                        "count": {"$sum": 1}, "last_occurrence": {"$max": "$updatedate"}
+                    }},
+                ]
+                by_name = {}
+                async for row in self.db["Alarm History"].aggregate(pipeline):
+                    by_name.setdefault(row["_id"]["L1Name"], []).append(row)
+
+                issues_by_id = {}
+                for eid, names in names_by_id.items():
+                    merged = {}
+                    for row in (r for name in names for r in by_name.get(name, [])):
+                        m = merged.setdefault(row["_id"]["signalname"], {"count": 0, "last": None})
+                        m["count"] += row["count"]
+                        if row["last_occurrence"] and (m["last"] is None or row["last_occurrence"] > m["last"]):
+                            m["last"] = row["last_occurrence"]
+                    top = sorted(merged.items(), key=lambda item: item[1]["count"], reverse=True)[:5]
+                    issues_by_id[eid] = [
+                        {"issue": signal, "frequency": m["count"],
+                         "last_seen": m["last"].isoformat() if m["last"] else "Unknown"}
+                        for signal, m in top
+                    ]
+                source = "aggregation"
+
+            reports = {}
+            for eid, issues in issues_by_id.items():
+                reports[eid] = {
+                    "equipment": eid,
+                    "total_records_found": len(issues),
+                    "frequent_issues": issues,
+                    "source": source
+                }
+                if not issues:
+                    reports[eid]["message"] = "No significant historical alarms found for this equipment."
+            return reports
+
+        except Exception as e:
+            return {"error": f"Failed to fetch history data: {str(e)}"}
@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Ensure Backend directory is in sys.path to allow imports from sibling modules
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+# ----- Configuration -----
+# Confident predictions skip the LLM only when enabled. Turn it on with thresholds tuned on
+# the held-out set for the deployed model: `python -m agents.intent_classifier` (from Backend/)
+# prints accuracy, fallback rate and the recommended INTENT_MIN_SIMILARITY / INTENT_MIN_MARGIN.
+INTENT_LOCAL_ROUTING = os.getenv("INTENT_LOCAL_ROUTING", "false").lower() == "true"
+INTENT_MIN_SIMILARITY = float(os.getenv("INTENT_MIN_SIMILARITY", "0.30"))  # Best centroid must be at least this close
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.04"))          # ... and this much closer than the runner-up
+INTENT_TARGET_ACCURACY = 0.95  # Held-out accuracy confident predictions must reach when tuning
+
+LABELS = ["diagnostic", "compliance", "training", "other"]
+
+# Labelled example queries the centroids are built from
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "diagnostic": [
+        "Motor won't start",
+        "Strange noise coming from the spindle",
+        "Vibration is high on the main pump",
+        "The conveyor keeps jamming every few minutes",
+        "Servo alarm 414 on axis X after the tool change",
+        "Hydraulic pressure drops when the press closes",
+        "The motor is humming but not rotating",
+        "Spindle overheating after 20 minutes of running",
+        "Coolant pump stopped and the machine shows an overload fault",
+        "Why is the servo load so high on machine 3?",
+        "The robot arm stops randomly in the middle of a cycle",
+        "Encoder error keeps appearing on the lathe",
+        "Bearing temperature is rising and there is a burning smell",
+        "Air compressor trips its breaker on startup",
+        "Machine 7 has a lubrication alarm and the axis won't move",
+    ],
+    "compliance": [
+        "What is the safety protocol for lockout tagout?",
+        "ISO standards for machine guarding",
+        "Which PPE is required when working on the hydraulic press?",
+        "Are we compliant with OSHA rules for confined space entry?",
+        "What are the regulations for handling cutting fluids?",
+        "Is it allowed to bypass the door interlock during setup?",
+        "Safety requirements for working at height on the gantry",
+        "What does ISO 13849 require for safety circuits?",
+        "Electrical safety rules for opening the control cabinet",
+        "Standard operating procedure for emergency stop testing",
+        "What are the noise exposure limits on the shop floor?",
+        "Do we need a permit for hot work near the paint booth?",
+    ],
+    "training": [
+        "How do I calibrate the torque sensor?",
+        "Explain the working principle of a servo drive",
+        "How to replace the spindle belt step by step",
+        "Teach me how to set the work offsets on the CNC",
+        "What is the procedure to change the hydraulic filter?",
+        "Create a training module for new operators on tool changes",
+        "How does a PID controller work?",
+        "Guide for homing the axes after a power loss",
+        "How do I back up the machine parameters?",
+        "Explain how to read the alarm history screen",
+        "Walk me through aligning a coupling with a dial indicator",
+        "What are the basics of ladder logic for maintenance techs?",
+    ],
+    "other": [
+        "Hello",
+        "What's the weather like today?",
+        "Who are you?",
+        "Thanks for the help",
+        "Summarize the quarterly production report",
+        "What time does the cafeteria close?",
+        "Translate this sentence into German",
+        "Tell me a joke",
+        "How many documents have I uploaded?",
+        "What is the capital of France?",
+        "Write an email to my manager about vacation",
+        "Good morning",
+    ],
+}
+
+# Held-out queries, never used to build the centroids
+HELD_OUT_EXAMPLES: List[Tuple[str, str]] = [
+    ("The pump is leaking oil and making a grinding noise", "diagnostic"),
+    ("Axis Z alarm after emergency stop, won't reset", "diagnostic"),
+    ("Motor draws too much current and trips", "diagnostic"),
+    ("Chiller temperature keeps climbing above setpoint", "diagnostic"),
+    ("Machine 12 spindle vibrates at high rpm", "diagnostic"),
+    ("Conveyor belt slipping under load", "diagnostic"),
+    ("What gloves are mandatory for handling coolant?", "compliance"),
+    ("OSHA requirements for forklift operation in the plant", "compliance"),
+    ("Is a two-person rule required for high voltage work?", "compliance"),
+    ("What standard covers emergency stop design?", "compliance"),
+    ("Lockout procedure before maintenance on the press", "compliance"),
+    ("How do I replace a servo motor encoder?", "training"),
+    ("Explain how hydraulic accumulators work", "training"),
+    ("Step by step guide to grease the linear guides", "training"),
+    ("How to tune the feed rate override for new operators", "training"),
+    ("Teach me to interpret vibration spectrum plots", "training"),
+    ("Hi there", "other"),
+    ("What's the wifi password?", "other"),
+    ("Can you write a poem about factories?", "other"),
+    ("When is the next holiday?", "other"),
+]
+
+_embed_model = None
+
+
+def _get_embed_model():
+    """Reuse the MiniLM model the RAG pipeline already loaded."""
+    global _embed_model
+    if _embed_model is None:
+        from rag_docling import embed_model
+        _embed_model = embed_model
+    return _embed_model
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+class IntentClassifier:
+    """
+    Nearest-centroid intent classifier on MiniLM embeddings.
+
+    One centroid per label (mean of its normalized example embeddings).
+    A prediction is confident when local routing is enabled and the best
+    centroid is close enough and clearly ahead of the runner-up; otherwise
+    callers fall back to the LLM (the scores still drive speculative prefetch).
+    """
+
+    def __init__(self, examples: Dict[str, List[str]] = INTENT_EXAMPLES,
+                 min_similarity: float = INTENT_MIN_SIMILARITY, min_margin: float = INTENT_MIN_MARGIN,
+                 route_locally: bool = INTENT_LOCAL_ROUTING):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.route_locally = route_locally
+        self.labels = [label for label in LABELS if examples.get(label)]
+
+        model = _get_embed_model()
+        self.centroids = _normalize(np.stack([
+            _normalize(model.encode(examples[label], show_progress_bar=False)).mean(axis=0)
+            for label in self.labels
+        ]))
+        self.stats = {"local": 0, "llm_fallback": 0}
+
+    def similarities(self, query: str) -> np.ndarray:
+        query_embedding = _normalize(_get_embed_model().encode([query], show_progress_bar=False))[0]
+        return self.centroids @ query_embedding
+
+    def is_confident(self, similarities: np.ndarray, min_similarity: float, min_margin: float) -> bool:
+        best, runner_up = np.sort(similarities)[::-1][:2]
+        return bool(best >= min_similarity and best - runner_up >= min_margin)
+
+    def predict(self, query: str) -> Tuple[str, bool, Dict[str, float]]:
+        """
+        Returns:
+            (label, confident, similarity per label)
+        """
+        similarities = self.similarities(query)
+        confident = self.route_locally and self.is_confident(similarities, self.min_similarity, self.min_margin)
+
+        scores = {label: round(float(s), 4) for label, s in zip(self.labels, similarities)}
+        return self.labels[int(np.argmax(similarities))], confident, scores
+
+    def tune(self, examples: List[Tuple[str, str]] = HELD_OUT_EXAMPLES,
+             target_accuracy: float = INTENT_TARGET_ACCURACY) -> Dict:
+        """
+        Sweep the confidence thresholds on labelled queries.
+
+        Returns:
+            The (min_similarity, min_margin) pair with the lowest LLM fallback
+            rate whose confident predictions reach target_accuracy (ties go to
+            the stricter pair), with its accuracy and fallback rate; None values
+            when no pair reaches the target.
+        """
+        scored = [(self.similarities(query), self.labels.index(expected)) for query, expected in examples]
+        best = {"min_similarity": None, "min_margin": None, "confident_accuracy": None, "fallback_rate": 1.0}
+
+        for min_similarity in np.arange(0.20, 0.72, 0.02):
+            for min_margin in np.arange(0.0, 0.205, 0.01):
+                confident = [(int(np.argmax(s)) == expected) for s, expected in scored
+                             if self.is_confident(s, min_similarity, min_margin)]
+                if not confident:
+                    continue
+                accuracy = sum(confident) / len(confident)
+                fallback_rate = 1 - len(confident) / len(scored)
+                # Strictly lower fallback wins, so among equals the first (strictest-margin) pair is kept
+                if accuracy >= target_accuracy and fallback_rate < best["fallback_rate"]:
+                    best = {"min_similarity": round(float(min_similarity), 2), "min_margin": round(float(min_margin), 2),
+                            "confident_accuracy": accuracy, "fallback_rate": fallback_rate}
+        return best
+
+    def evaluate(self, examples: List[Tuple[str, str]] = HELD_OUT_EXAMPLES) -> Dict:
+        """
+        Accuracy (overall and on confident predictions), coverage, fallback rate
+        and latency on labelled queries, at the configured thresholds (whether
+        or not local routing is enabled).
+        """
+        latencies, correct, confident_total, confident_correct = [], 0, 0, 0
+        mistakes = []
+
+        for query, expected in examples:
+            start = time.perf_counter()
+            similarities = self.similarities(query)
+            label = self.labels[int(np.argmax(similarities))]
+            confident = self.is_confident(similarities, self.min_similarity, self.min_margin)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            correct += label == expected
+            if confident:
+                confident_total += 1
+                confident_correct += label == expected
+            if label != expected:
+                mistakes.append({"query": query, "expected": expected, "predicted": label, "confident": confident})
+
+        return {
+            "examples": len(examples),
+            "accuracy": correct / len(examples),
+            "coverage": confident_total / len(examples),  # Share answered without the LLM
+            "fallback_rate": 1 - confident_total / len(examples),
+            "confident_accuracy": confident_correct / confident_total if confident_total else None,
+            "latency_ms_p50": float(np.percentile(latencies, 50)),
+            "latency_ms_p95": float(np.percentile(latencies, 95)),
+            "mistakes": mistakes,
+        }
+
+
+_classifier: Optional[IntentClassifier] = None
+
+
+def get_intent_classifier() -> IntentClassifier:
+    """Shared classifier; centroids are built once per process."""
+    global _classifier
+    if _classifier is None:
+        _classifier = IntentClassifier()
+    return _classifier
+
+
+if __name__ == "__main__":
+    # Run from Backend/: python -m agents.intent_classifier
+    classifier = get_intent_classifier()
+    report = classifier.evaluate()
+
+    print(f"\nHeld-out queries:    {report['examples']}")
+    print(f"Thresholds:          similarity >= {classifier.min_similarity}, margin >= {classifier.min_margin}"
+          f" (local routing {'on' if classifier.route_locally else 'off'})")
+    print(f"Accuracy:            {report['accuracy']:.1%}")
+    print(f"Confident coverage:  {report['coverage']:.1%} (fallback rate {report['fallback_rate']:.1%})")
+    if report["confident_accuracy"] is not None:
+        print(f"Confident accuracy:  {report['confident_accuracy']:.1%}")
+    print(f"Latency p50 / p95:   {report['latency_ms_p50']:.1f} ms / {report['latency_ms_p95']:.1f} ms")
+    for m in report["mistakes"]:
+        print(f"  ✗ {m['query']!r}: expected {m['expected']}, got {m['predicted']}"
+              f"{'' if m['confident'] else ' (low confidence, LLM fallback)'}")
+
+    tuned = classifier.tune()
+    if tuned["min_similarity"] is None:
+        print(f"\nNo thresholds reach {INTENT_TARGET_ACCURACY:.0%} confident accuracy: keep INTENT_LOCAL_ROUTING off.")
+    else:
+        print(f"\nTuned for {INTENT_TARGET_ACCURACY:.0%} confident accuracy: "
+              f"{tuned['confident_accuracy']:.1%} accurate, fallback rate {tuned['fallback_rate']:.1%}")
+        print(f"  INTENT_LOCAL_ROUTING=true INTENT_MIN_SIMILARITY={tuned['min_similarity']} "
+              f"INTENT_MIN_MARGIN={tuned['min_margin']}")
@@ -8,20 +8,42 @@ from .symptom_agent import SymptomAgent
 from .sensor_agent import SensorAgent
 from .retrieval_agent import RetrievalAgent
 from .history_agent import HistoryAgent
+from .executor import run_llm
+from .metrics import agent_metrics
 
 load_dotenv()
 
+# ----- Fan-out deadlines (seconds) -----
+DIAGNOSE_EVIDENCE_DEADLINE = float(os.getenv("DIAGNOSE_EVIDENCE_DEADLINE", "12"))  # All evidence agents together
+AGENT_BUDGETS = {
+    "symptoms": float(os.getenv("SYMPTOM_AGENT_BUDGET", "10")),
+    "sensor": float(os.getenv("SENSOR_AGENT_BUDGET", "4")),
+    "retrieval": float(os.getenv("RETRIEVAL_AGENT_BUDGET", "6")),
+    "history": float(os.getenv("HISTORY_AGENT_BUDGET", "4")),
+}
+
+# ----- Batch diagnosis -----
+BATCH_MAX_MACHINES = int(os.getenv("BATCH_MAX_MACHINES", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))  # Synthesis calls in flight per batch
+BATCH_RETRIEVAL_QUERY = "machine health check: servo load trends, recurring alarms, preventive maintenance"
+
 class MasterAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, client=None, symptom_agent=None, sensor_agent=None, retrieval_agent=None, history_agent=None):
+        # Clients/sub-agents can be injected (shared, see AgentRegistry); otherwise each is created here
+        self.client = client or Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "openai/gpt-oss-120b"
         
-        self.symptom_agent = SymptomAgent()
-        self.sensor_agent = SensorAgent()
-        self.retrieval_agent = RetrievalAgent()
-        self.history_agent = HistoryAgent()
+        self.symptom_agent = symptom_agent or SymptomAgent(client=self.client)
+        self.sensor_agent = sensor_agent or SensorAgent()
+        self.retrieval_agent = retrieval_agent or RetrievalAgent()
+        self.history_agent = history_agent or HistoryAgent()
 
-    async def diagnose(self, query: str, user_id: int) -> dict:
+    async def diagnose(self, query: str, user_id: int, prefetched_symptoms=None, prefetched_docs=None) -> dict:
+        """
+        prefetched_symptoms / prefetched_docs: optional awaitables already running
+        extract_symptoms(query) / retrieve_docs(query, user_id), started
+        speculatively by /diagnose while the intent was being detected.
+        """
         # Step 1: Run specialized agents in parallel
         # Note: Sensor and History agents might benefit from Symptom extraction, 
         # but for speed/parallelism we pass the raw query or handle simple extraction inside them.
@@ -40,7 +62,7 @@ class MasterAgent:
         # User said "triggers 4 parallel agents simultaneously". 
         # I will launch them all. Sensor and History will do basic keyword matching on the query string for now.
         
-        task_symptom = asyncio.create_task(self.symptom_agent.extract_symptoms(query))
+        task_symptom = prefetched_symptoms or asyncio.create_task(self.symptom_agent.extract_symptoms(query))
         # For sensor/history, we pass the query. They will need to handle it.
         # My previous implementation of SensorAgent expects 'equipment' string.
         # I'll update the call to extract it from query or pass query.
@@ -53,16 +75,40 @@ class MasterAgent:
         elif "pump" in query.lower(): equipment_keyword = "pump"
         
         task_sensor = asyncio.create_task(self.sensor_agent.get_sensor_data(equipment_keyword))
-        task_retrieval = asyncio.create_task(self.retrieval_agent.retrieve_docs(query, user_id))
+        task_retrieval = prefetched_docs or asyncio.create_task(self.retrieval_agent.retrieve_docs(query, user_id))
         
         # History agent needs symptoms.
         # The new signature is check_history(symptoms: list, equipment: str)
         task_history = asyncio.create_task(self.history_agent.check_history([query], equipment_keyword))
 
-        # Wait for all
-        symptoms, sensor_data, docs, history = await asyncio.gather(
-            task_symptom, task_sensor, task_retrieval, task_history
+        # Wait for all, each within its budget; late agents are cancelled and marked missing
+        evidence = await self._gather_evidence({
+            "symptoms": task_symptom,
+            "sensor": task_sensor,
+            "retrieval": task_retrieval,
+            "history": task_history,
+        })
+        symptoms, sensor_data, docs, history = (
+            evidence[name]["result"] for name in ("symptoms", "sensor", "retrieval", "history")
         )
+        evidence_status = {name: e["status"] for name, e in evidence.items()}
+        return await self.synthesize(query, symptoms, sensor_data, docs, history, evidence_status)
+
+    async def synthesize(self, query: str, symptoms, sensor_data, docs, history, evidence_status: dict) -> dict:
+        """
+        Step 2 of a diagnosis: one LLM call over the gathered evidence.
+
+        Shared by diagnose (one machine, one user query) and diagnose_batch
+        (health checks over many machines). evidence_status lists only the
+        evidence that was gathered; anything not "ok" is flagged as missing.
+        """
+        missing = [name for name, status in evidence_status.items() if status != "ok"]
+        missing_note = ""
+        if missing:
+            missing_note = (
+                f"\n        Missing evidence: {', '.join(missing)} did not arrive in time or failed. "
+                "Do not guess their content; lower your confidence accordingly.\n"
+            )
 
         # Step 2: Synthesize with Master Agent
         prompt = f"""
@@ -76,9 +122,10 @@ class MasterAgent:
         2. Sensor Data (Real-time): {json.dumps(sensor_data)}
         3. Relevant Documents (RAG): {json.dumps(docs)}
         4. Historical Issues: {json.dumps(history)}
-
+        {missing_note}
         Reason step-by-step:
-        - Analyze the symptoms and sensor data to identify anomalies.
+        - Analyze the symptoms and sensor data to identify anomalies; the sensor "trend"
+          (slope, z-score anomalies, limit excursions over the last window) shows developing faults.
         - Correlate with document knowledge and historical patterns.
         - Determine the most likely root causes.
 
@@ -95,20 +142,125 @@ class MasterAgent:
         """
 
         try:
-            response = self.client.chat.completions.create(
+            response = await run_llm(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.2,
                 response_format={"type": "json_object"}
             )
-            return json.loads(response.choices[0].message.content)
+            diagnosis = json.loads(response.choices[0].message.content)
         except Exception as e:
             print(f"MasterAgent error: {e}")
             # Fallback response
-            return {
+            diagnosis = {
                 "likely_causes": [],
                 "immediate_actions": ["Contact supervisor"],
                 "safety_warnings": ["Unknown error in diagnosis"],
                 "confidence": 0.0,
                 "error": str(e)
             }
+        diagnosis["evidence_status"] = evidence_status
+        return diagnosis
+
+    async def diagnose_batch(self, equipment_ids: list, user_id: int, question: str = None):
+        """
+        Health check for many machines, yielding one result per machine as it completes.
+
+        Evidence is gathered once for the whole batch: sensor and history data
+        with bulk $in queries, and a single shared document retrieval. Only the
+        synthesis runs per machine, with at most BATCH_LLM_CONCURRENCY LLM calls
+        in flight. There is no symptom extraction (no user-reported symptoms).
+
+        Yields:
+            {"type": "evidence", ...} once, then {"type": "machine", ...} per machine
+        """
+        evidence = await self._gather_evidence({
+            "batch_sensor": asyncio.create_task(self.sensor_agent.get_sensor_data_bulk(equipment_ids)),
+            "batch_history": asyncio.create_task(self.history_agent.check_history_bulk(equipment_ids)),
+            "batch_retrieval": asyncio.create_task(
+                self.retrieval_agent.retrieve_docs(question or BATCH_RETRIEVAL_QUERY, user_id)
+            ),
+        })
+        sensor, history, docs = (evidence[name] for name in ("batch_sensor", "batch_history", "batch_retrieval"))
+
+        def per_machine(part, equipment_id):
+            # A failed bulk call yields its placeholder for every machine
+            if part["status"] == "ok":
+                return "ok", part["result"].get(equipment_id, {"status": "no_data"})
+            return part["status"], part["result"]
+
+        yield {
+            "type": "evidence",
+            "machines": len(equipment_ids),
+            "evidence_status": {name.replace("batch_", ""): e["status"] for name, e in evidence.items()},
+            "resolved": {
+                eid: sensor["result"].get(eid, {}).get("l1_names") if sensor["status"] == "ok" else None
+                for eid in equipment_ids
+            },
+        }
+
+        semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+        async def diagnose_machine(equipment_id):
+            sensor_status, sensor_data = per_machine(sensor, equipment_id)
+            history_status, history_data = per_machine(history, equipment_id)
+            if sensor_status == "ok" and sensor_data.get("l1_names") == []:
+                return {"type": "machine", "equipment_id": equipment_id, "status": "unknown_equipment"}
+
+            query = f"Routine health check of {equipment_id}" + (f": {question}" if question else "")
+            async with semaphore:
+                diagnosis = await self.synthesize(
+                    query,
+                    {"note": "Batch health check; no user-reported symptoms"},
+                    sensor_data,
+                    docs["result"],
+                    history_data,
+                    {"sensor": sensor_status, "retrieval": docs["status"], "history": history_status},
+                )
+            return {
+                "type": "machine",
+                "equipment_id": equipment_id,
+                "status": "ok",
+                "sensor_flags": (sensor_data.get("trend") or {}).get("flags", []),
+                "diagnosis": diagnosis,
+            }
+
+        tasks = [asyncio.create_task(diagnose_machine(eid)) for eid in equipment_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away (generator closed): don't keep paying for LLM calls
+            for task in tasks:
+                task.cancel()
+
+    async def _gather_evidence(self, tasks: dict) -> dict:
+        """
+        Await every evidence task within min(its budget, the shared deadline).
+
+        Returns:
+            {name: {"status": "ok" | "timed_out" | "error", "result": ...}}; for
+            missing evidence the result is an explicit placeholder, not None
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + DIAGNOSE_EVIDENCE_DEADLINE
+
+        async def run(name, task):
+            started = loop.time()
+            budget = min(AGENT_BUDGETS.get(name, DIAGNOSE_EVIDENCE_DEADLINE), DIAGNOSE_EVIDENCE_DEADLINE)
+            try:
+                result = await asyncio.wait_for(task, timeout=max(0.0, min(started + budget, deadline) - loop.time()))
+                # Agents report their own failures as {"error": ...}
+                status = "error" if isinstance(result, dict) and "error" in result else "ok"
+            except asyncio.TimeoutError:
+                status = "timed_out"
+                result = {"status": "timed_out", "budget_s": budget}
+            except Exception as e:
+                status = "error"
+                result = {"status": "error", "error": str(e)}
+            agent_metrics.record(name, status, (loop.time() - started) * 1000)
+            return name, {"status": status, "result": result}
+
+        results = await asyncio.gather(*(run(name, task) for name, task in tasks.items()))
+        return dict(results)
@@ -0,0 +1,38 @@
+from typing import Dict
+
+
+class AgentMetrics:
+    """Per-agent latency and outcome counters for the /diagnose fan-out."""
+
+    def __init__(self):
+        self._agents: Dict[str, dict] = {}
+
+    def _entry(self, name: str) -> dict:
+        return self._agents.setdefault(name, {
+            "calls": 0, "ok": 0, "timeouts": 0, "errors": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "last_ms": None, "last_status": None,
+        })
+
+    def record(self, name: str, status: str, elapsed_ms: float):
+        """status: 'ok', 'timed_out' or 'error'"""
+        entry = self._entry(name)
+        entry["calls"] += 1
+        entry["ok" if status == "ok" else "timeouts" if status == "timed_out" else "errors"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        entry["last_ms"] = round(elapsed_ms, 1)
+        entry["last_status"] = status
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            name: {
+                **{k: v for k, v in entry.items() if k != "total_ms"},
+                "avg_ms": round(entry["total_ms"] / entry["calls"], 1) if entry["calls"] else None,
+                "max_ms": round(entry["max_ms"], 1),
+            }
+            for name, entry in self._agents.items()
+        }
+
+
+agent_metrics = AgentMetrics()
+
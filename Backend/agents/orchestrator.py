@@ -3,14 +3,38 @@ import os
 import json
 from dotenv import load_dotenv
 
+from .executor import run_llm
+from .intent_classifier import get_intent_classifier
+
 load_dotenv()
 
 class Orchestrator:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, client=None):
+        self.client = client or Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "openai/gpt-oss-120b" # Using the same model as main.py
+        self.classifier = get_intent_classifier()
+
+    def classify_local(self, query: str):
+        """
+        Local classifier only. Returns (label, confident, similarity per label);
+        callers should ask detect_intent_llm when confident is False.
+        """
+        try:
+            label, confident, scores = self.classifier.predict(query)
+        except Exception as e:
+            print(f"Intent classifier error: {e}")
+            return "other", False, {}
+        self.classifier.stats["local" if confident else "llm_fallback"] += 1
+        return label, confident, scores
 
     async def detect_intent(self, query: str) -> str:
+        # Local embedding classifier first; the LLM only decides low-confidence queries
+        label, confident, _ = self.classify_local(query)
+        if confident:
+            return label
+        return await self.detect_intent_llm(query)
+
+    async def detect_intent_llm(self, query: str) -> str:
         prompt = f"""
         You are an intelligent orchestrator for a manufacturing support system.
         Analyze the user's input and classify the intent into one of the following categories:
@@ -26,7 +50,8 @@ class Orchestrator:
         """
 
         try:
-            response = self.client.chat.completions.create(
+            response = await run_llm(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+import motor.motor_asyncio
+from groq import Groq
+from dotenv import load_dotenv
+
+from .orchestrator import Orchestrator
+from .symptom_agent import SymptomAgent
+from .sensor_agent import SensorAgent, MONGO_URI, MONGO_DB
+from .retrieval_agent import RetrievalAgent
+from .history_agent import HistoryAgent
+from .master_agent import MasterAgent
+from .compliance_agent import ComplianceAgent
+from .training_agent import TrainingAgent
+from .metrics import agent_metrics
+from .executor import shutdown_agent_executors, get_executor_stats
+from .equipment_catalog import EquipmentCatalog, ensure_indexes, MONGO_ENSURE_INDEXES
+from .sensor_cache import SensorSnapshotCache, SENSOR_CACHE_ENABLED
+from .alarm_stats import AlarmStats, ALARM_STATS_ENABLED
+
+load_dotenv()
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+CATALOG_WARM_TIMEOUT = float(os.getenv("EQUIPMENT_CATALOG_WARM_TIMEOUT", "5"))
+
+
+class AgentRegistry:
+    """
+    Application-scoped agents for /diagnose.
+
+    Created once in the FastAPI lifespan: one Groq client and one pooled
+    Motor client are shared by every agent, instead of each request building
+    its own agents, LLM clients and Mongo connection pools.
+    """
+
+    def __init__(self):
+        self.llm_client = None
+        self.mongo_client = None
+        self.catalog = None
+        self.sensor_cache = None
+        self.alarm_stats = None
+        self._owns_llm_client = False
+        self.setup_ms = None
+        self._warm_task: Optional[asyncio.Task] = None
+
+    def start(self, llm_client: Optional[Groq] = None):
+        """Create the shared clients and agents. An existing LLM client can be passed in and is reused."""
+        started = time.perf_counter()
+
+        self._owns_llm_client = llm_client is None
+        self.llm_client = llm_client or Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.mongo_client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+
+        self.orchestrator = Orchestrator(client=self.llm_client)
+        self.symptom_agent = SymptomAgent(client=self.llm_client)
+        self.catalog = EquipmentCatalog(self.mongo_client[MONGO_DB])
+        self.sensor_cache = SensorSnapshotCache(self.mongo_client[MONGO_DB]) if SENSOR_CACHE_ENABLED else None
+        self.sensor_agent = SensorAgent(mongo_client=self.mongo_client, catalog=self.catalog, cache=self.sensor_cache)
+        self.retrieval_agent = RetrievalAgent()
+        self.alarm_stats = AlarmStats(self.mongo_client[MONGO_DB]) if ALARM_STATS_ENABLED else None
+        self.history_agent = HistoryAgent(mongo_client=self.mongo_client, catalog=self.catalog, alarm_stats=self.alarm_stats)
+        self.master_agent = MasterAgent(
+            client=self.llm_client,
+            symptom_agent=self.symptom_agent,
+            sensor_agent=self.sensor_agent,
+            retrieval_agent=self.retrieval_agent,
+            history_agent=self.history_agent,
+        )
+        self.compliance_agent = ComplianceAgent(client=self.llm_client, retrieval_agent=self.retrieval_agent)
+        self.training_agent = TrainingAgent(client=self.llm_client, retrieval_agent=self.retrieval_agent)
+
+        self.setup_ms = (time.perf_counter() - started) * 1000
+        print(f"✅ Agent registry ready in {self.setup_ms:.1f} ms")
+
+    async def warm(self):
+        """
+        Start loading the equipment catalog, sensor snapshot cache and alarm stats
+        (and optionally creating the equipment indexes; the caches check their own
+        polling indexes) in the background, and keep them current. Returns at
+        once, so an unreachable Mongo doesn't hold up app startup: until the data
+        loads the agents fall back to regex filters and direct queries.
+        """
+        if self._warm_task is None:
+            self._warm_task = asyncio.create_task(self._warm_catalog())
+        if self.sensor_cache is not None:
+            await self.sensor_cache.start()
+        if self.alarm_stats is not None:
+            await self.alarm_stats.start()
+
+    async def _warm_catalog(self):
+        db = self.mongo_client[MONGO_DB]
+        try:
+            if MONGO_ENSURE_INDEXES:
+                created = await asyncio.wait_for(ensure_indexes(db), timeout=CATALOG_WARM_TIMEOUT)
+                print(f"✅ Equipment indexes ready: {created}")
+            await asyncio.wait_for(self.catalog.refresh(), timeout=CATALOG_WARM_TIMEOUT)
+            print(f"✅ Equipment catalog loaded: {self.catalog.get_stats()['names']} machines")
+        except Exception as e:
+            print(f"⚠️ Equipment catalog warm-up failed: {e!r}")
+        self.catalog.start_refresh_loop()
+
+    def close(self):
+        """Stop the background jobs and close the shared clients; a client failing to close doesn't skip the rest."""
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+            self._warm_task = None
+        if self.catalog is not None:
+            self.catalog.stop_refresh_loop()
+        if self.sensor_cache is not None:
+            self.sensor_cache.stop()
+        if self.alarm_stats is not None:
+            self.alarm_stats.stop()
+        if self.mongo_client is not None:
+            try:
+                self.mongo_client.close()
+            except Exception as e:
+                print(f"⚠️ Closing the Mongo client failed: {e!r}")
+            self.mongo_client = None
+        if self.llm_client is not None and self._owns_llm_client:
+            try:
+                self.llm_client.close()
+            except Exception as e:
+                print(f"⚠️ Closing the LLM client failed: {e!r}")
+        self.llm_client = None
+        shutdown_agent_executors()
+
+    async def get_stats(self) -> dict:
+        stats = {
+            "registry_setup_ms": self.setup_ms,
+            "llm_clients": 1 if self.llm_client is not None else 0,
+            "mongo_clients": 1 if self.mongo_client is not None else 0,
+            "mongo_max_pool_size": MONGO_MAX_POOL_SIZE,
+            "intent": self.orchestrator.classifier.stats if hasattr(self, "orchestrator") else None,
+            "agents": agent_metrics.snapshot(),
+            "executors": get_executor_stats(),
+            "equipment_catalog": self.catalog.get_stats() if self.catalog is not None else None,
+            "sensor_cache": self.sensor_cache.get_stats() if self.sensor_cache is not None else None,
+            "alarm_stats": self.alarm_stats.get_stats() if self.alarm_stats is not None else None,
+        }
+
+        # Server-side view of open connections (all clients, not only this process)
+        if self.mongo_client is not None:
+            try:
+                status = await asyncio.wait_for(self.mongo_client[MONGO_DB].command("serverStatus"), timeout=2.0)
+                stats["mongo_server_connections"] = status.get("connections", {})
+            except Exception as e:
+                stats["mongo_server_connections"] = {"error": str(e)}
+
+        return stats
@@ -9,6 +9,8 @@ if parent_dir not in sys.path:
 
 from rag_docling import search_chunks
 
+from .executor import run_cpu
+
 class RetrievalAgent:
     def __init__(self):
         pass
@@ -20,7 +22,9 @@ class RetrievalAgent:
         try:
             # Search for relevant chunks
             # We don't filter by doc_id here to search all user's documents
-            chunks = search_chunks(
+            # search_chunks is sync (embedding + Chroma query): run it in the CPU executor
+            chunks = await run_cpu(
+                search_chunks,
                 query=query,
                 user_id=user_id,
                 doc_id=None,
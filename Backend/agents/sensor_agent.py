@@ -1,12 +1,93 @@
+import asyncio
 import os
 import motor.motor_asyncio
 from datetime import datetime
 
+from .equipment_catalog import EquipmentCatalog, equipment_filter
+from .sensor_cache import CACHED_SIGNALS
+from .sensor_analytics import SENSOR_ANALYTICS_ENABLED, fetch_window, analyze_window
+from .executor import run_cpu
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://172.18.7.91:27017/")
+MONGO_DB = os.getenv("MONGO_DB", "mtlinki")
+
 class SensorAgent:
-    def __init__(self):
-        self.mongo_uri = "mongodb://172.18.7.91:27017/"
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongo_uri)
-        self.db = self.client["mtlinki"]  # Assuming database name is 'mtlinki' based on collection names
+    def __init__(self, mongo_client=None, catalog=None, cache=None):
+        # A shared client/catalog can be injected (see AgentRegistry); otherwise this agent opens its own
+        self.mongo_uri = MONGO_URI
+        self.client = mongo_client or motor.motor_asyncio.AsyncIOMotorClient(self.mongo_uri)
+        self.db = self.client[MONGO_DB]  # Assuming database name is 'mtlinki' based on collection names
+        self.catalog = catalog or EquipmentCatalog(self.db)
+        # Optional SensorSnapshotCache; without one (or when it is stale) every call queries Mongo
+        self.cache = cache
+
+    async def _latest_doc(self, collection: str, names, l1_filter):
+        """
+        Latest document for the equipment in a collection: from the snapshot cache
+        when it is fresh, otherwise a direct sorted query.
+
+        Returns:
+            (doc or None, source) where source is 'cache' or 'mongo'
+        """
+        if self.cache is not None and names is not None:
+            fresh, doc = self.cache.latest(collection, names)
+            if fresh:
+                return doc, "cache"
+
+        cursor = self.db[collection].find(
+            {"L1Name": l1_filter, "signalname": CACHED_SIGNALS[collection]}
+        ).sort("updatedate", -1).limit(1)
+        docs = await cursor.to_list(length=1)
+        return (docs[0] if docs else None), "mongo"
+
+    async def _servo_trend(self, l1_filter, until) -> dict:
+        """Windowed servo-load analytics ending at the latest reading (see sensor_analytics)."""
+        try:
+            docs = await fetch_window(self.db, "july_a4_servo", l1_filter, CACHED_SIGNALS["july_a4_servo"], until)
+            return await run_cpu(analyze_window, docs)
+        except Exception as e:
+            # Trend is extra context; the latest reading is still reported
+            return {"status": "unavailable", "reason": str(e)}
+        
+    def _sensor_report(self, equipment_id: str, names, status_doc, servo_doc, source: str) -> dict:
+        """Shape the latest status/servo documents into the sensor evidence dict."""
+        status = "UNKNOWN"
+        if status_doc:
+            # Logic to determine status from 'value' or existence
+            # The example shows value: null, but let's assume existence implies connection
+            status = "ACTIVE" if status_doc else "INACTIVE"
+
+        sensor_data = {
+            "equipment_id": equipment_id,
+            "l1_names": names,
+            "timestamp": datetime.now().isoformat(),
+            "status": status,
+            "readings": {},
+            "source": source
+        }
+        
+        if servo_doc:
+            doc = servo_doc
+            val = doc.get("value")
+            upper = doc.get("upperlimit")
+            lower = doc.get("lowerlimit")
+            
+            reading_status = "NORMAL"
+            if val is not None and upper is not None and val > upper:
+                reading_status = "WARNING_HIGH"
+            elif val is not None and lower is not None and val < lower:
+                reading_status = "WARNING_LOW"
+                
+            sensor_data["readings"]["servo_load"] = {
+                "value": val,
+                "unit": "%", # Assumption
+                "status": reading_status,
+                "last_updated": doc.get("updatedate").isoformat() if doc.get("updatedate") else None
+            }
+        else:
+             sensor_data["readings"]["servo_load"] = {"status": "NO_DATA"}
+
+        return sensor_data
         
     async def get_sensor_data(self, equipment_id: str):
         """
@@ -14,57 +95,90 @@ class SensorAgent:
         Queries 'L1Single_Pool' for status and 'july_a4_servo' for servo load.
         """
         try:
+            # Resolve the equipment text to exact L1Name values (indexed $in instead of a regex scan)
+            names = await self.catalog.resolve(equipment_id)
+            l1_filter = equipment_filter(names, equipment_id)
+            
             # 1. Get Operation Status from L1Single_Pool
             # Assuming 'L1Name' matches the equipment_id (e.g., 'H_OP100')
-            status_cursor = self.db["L1Single_Pool"].find(
-                {"L1Name": {"$regex": equipment_id, "$options": "i"}, "signalname": "OPERATE"}
-            ).sort("updatedate", -1).limit(1)
-            
-            status_doc = await status_cursor.to_list(length=1)
-            status = "UNKNOWN"
-            if status_doc:
-                # Logic to determine status from 'value' or existence
-                # The example shows value: null, but let's assume existence implies connection
-                status = "ACTIVE" if status_doc[0] else "INACTIVE"
+            status_doc, status_source = await self._latest_doc("L1Single_Pool", names, l1_filter)
 
             # 2. Get Servo Load from july_a4_servo (or similar collection)
             # We might need to check multiple collections or know the specific one.
             # For now, we query 'july_a4_servo' as requested.
-            servo_cursor = self.db["july_a4_servo"].find(
-                {"L1Name": {"$regex": equipment_id, "$options": "i"}, "signalname": {"$regex": "ServoLoad", "$options": "i"}}
-            ).sort("updatedate", -1).limit(1)
-            
-            servo_doc = await servo_cursor.to_list(length=1)
-            
-            sensor_data = {
-                "equipment_id": equipment_id,
-                "timestamp": datetime.now().isoformat(),
-                "status": status,
-                "readings": {}
-            }
+            servo_doc, servo_source = await self._latest_doc("july_a4_servo", names, l1_filter)
             
-            if servo_doc:
-                doc = servo_doc[0]
-                val = doc.get("value")
-                upper = doc.get("upperlimit")
-                lower = doc.get("lowerlimit")
-                
-                reading_status = "NORMAL"
-                if val is not None and upper is not None and val > upper:
-                    reading_status = "WARNING_HIGH"
-                elif val is not None and lower is not None and val < lower:
-                    reading_status = "WARNING_LOW"
-                    
-                sensor_data["readings"]["servo_load"] = {
-                    "value": val,
-                    "unit": "%", # Assumption
-                    "status": reading_status,
-                    "last_updated": doc.get("updatedate").isoformat() if doc.get("updatedate") else None
-                }
-            else:
-                 sensor_data["readings"]["servo_load"] = {"status": "NO_DATA"}
+            source = "cache" if status_source == servo_source == "cache" else "mongo"
+            sensor_data = self._sensor_report(equipment_id, names, status_doc, servo_doc, source)
+
+            # 3. Trend over the last window of servo readings (slope, anomalies, limit excursions)
+            if SENSOR_ANALYTICS_ENABLED and servo_doc and servo_doc.get("updatedate"):
+                sensor_data["trend"] = await self._servo_trend(l1_filter, servo_doc["updatedate"])
 
             return sensor_data
 
         except Exception as e:
             return {"error": f"Failed to fetch sensor data: {str(e)}"}
+
+    async def _latest_docs_bulk(self, collection: str, names_by_id: dict):
+        """
+        Latest document per equipment id for many machines: the snapshot cache when
+        fresh, otherwise one $in aggregation for all of them.
+
+        Returns:
+            ({equipment_id: doc or None}, source)
+        """
+        if self.cache is not None and self.cache.is_fresh():
+            return {eid: self.cache.latest(collection, names)[1] for eid, names in names_by_id.items()}, "cache"
+
+        all_names = sorted({name for names in names_by_id.values() for name in names})
+        pipeline = [
+            {"$match": {"L1Name": {"$in": all_names}, "signalname": CACHED_SIGNALS[collection]}},
+            {"$sort": {"L1Name": 1, "updatedate": -1}},
+            {"$group": {"_id": "$L1Name", "doc": {"$first": "$$ROOT"}}},
+        ]
+        latest_by_name = {row["_id"]: row["doc"] async for row in self.db[collection].aggregate(pipeline)}
+
+        latest = {}
+        for eid, names in names_by_id.items():
+            docs = [latest_by_name[name] for name in names if name in latest_by_name]
+            latest[eid] = max(docs, key=lambda d: d.get("updatedate") or datetime.min) if docs else None
+        return latest, "mongo"
+
+    async def get_sensor_data_bulk(self, equipment_ids: list) -> dict:
+        """
+        get_sensor_data for many machines at once (batch diagnosis): one catalog
+        resolution each, then a single $in query per collection instead of N.
+        Trend windows stay per machine (indexed, bounded) and run concurrently.
+
+        Returns:
+            {equipment_id: sensor_data}
+        """
+        try:
+            names_by_id = {eid: await self.catalog.resolve(eid) for eid in equipment_ids}
+            if any(names is None for names in names_by_id.values()):
+                # Catalog never loaded: no exact names to batch on, use the per-machine path
+                results = await asyncio.gather(*(self.get_sensor_data(eid) for eid in equipment_ids))
+                return dict(zip(equipment_ids, results))
+
+            status_docs, status_source = await self._latest_docs_bulk("L1Single_Pool", names_by_id)
+            servo_docs, servo_source = await self._latest_docs_bulk("july_a4_servo", names_by_id)
+            source = "cache" if status_source == servo_source == "cache" else "mongo"
+
+            reports = {
+                eid: self._sensor_report(eid, names_by_id[eid], status_docs[eid], servo_docs[eid], source)
+                for eid in equipment_ids
+            }
+
+            if SENSOR_ANALYTICS_ENABLED:
+                with_servo = [eid for eid in equipment_ids if servo_docs[eid] and servo_docs[eid].get("updatedate")]
+                trends = await asyncio.gather(*(
+                    self._servo_trend({"$in": names_by_id[eid]}, servo_docs[eid]["updatedate"]) for eid in with_servo
+                ))
+                for eid, trend in zip(with_servo, trends):
+                    reports[eid]["trend"] = trend
+
+            return reports
+
+        except Exception as e:
+            return {"error": f"Failed to fetch sensor data: {str(e)}"}
@@ -0,0 +1,279 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from .equipment_catalog import MONGO_ENSURE_INDEXES, ensure_index
+
+# ----- Configuration -----
+SENSOR_CACHE_ENABLED = os.getenv("SENSOR_CACHE_ENABLED", "true").lower() == "true"
+SENSOR_CACHE_MODE = os.getenv("SENSOR_CACHE_MODE", "auto")           # auto | change_stream | poll
+SENSOR_CACHE_MAX_STALENESS = float(os.getenv("SENSOR_CACHE_MAX_STALENESS", "30"))  # seconds since last sync
+SENSOR_CACHE_POLL_INTERVAL = float(os.getenv("SENSOR_CACHE_POLL_INTERVAL", "2"))
+SENSOR_CACHE_POLL_BATCH = 5000
+SENSOR_CACHE_PRIME_TIMEOUT = float(os.getenv("SENSOR_CACHE_PRIME_TIMEOUT", "20"))
+SENSOR_CACHE_REPRIME_SECONDS = float(os.getenv("SENSOR_CACHE_REPRIME_SECONDS", "30"))  # Retry delay for the prime and index check
+
+# Signals SensorAgent reads, per collection; only these are cached
+CACHED_SIGNALS = {
+    "L1Single_Pool": "OPERATE",
+    "july_a4_servo": {"$regex": "ServoLoad", "$options": "i"},
+}
+CACHED_FIELDS = ("L1Name", "signalname", "value", "upperlimit", "lowerlimit", "updatedate")
+
+# Incremental polling reads an updatedate range sorted by updatedate, which the L1Name-prefixed
+# indexes can't serve; without this index every poll is a sorted collection scan
+POLL_INDEX = [("updatedate", 1)]
+
+
+class SensorSnapshotCache:
+    """
+    Latest value per (collection, L1Name, signalname), kept in process memory.
+
+    Primed with one $group per collection, then kept current by a change stream
+    (replica sets) or by polling for documents newer than the updatedate
+    high-water mark. latest() reports whether the cache has been primed and
+    synced within SENSOR_CACHE_MAX_STALENESS; when it hasn't, callers query
+    Mongo directly.
+    """
+
+    def __init__(self, db, mode: str = SENSOR_CACHE_MODE, max_staleness: float = SENSOR_CACHE_MAX_STALENESS,
+                 poll_interval: float = SENSOR_CACHE_POLL_INTERVAL):
+        self.db = db
+        self.mode = mode
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self._latest: Dict[str, Dict[str, Dict[str, dict]]] = {c: {} for c in CACHED_SIGNALS}
+        self._high_water: Dict[str, object] = {c: None for c in CACHED_SIGNALS}
+        self.synced_at: Optional[float] = None
+        self.primed = False            # Updates alone never make the cache trustworthy, only a full prime
+        self.disabled_reason: Optional[str] = None
+        self.active_mode: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"hits": 0, "stale": 0, "updates": 0, "sync_errors": 0}
+
+    # ----- Reads -----
+
+    def is_fresh(self) -> bool:
+        return self.primed and self.disabled_reason is None and self.synced_at is not None and time.time() - self.synced_at <= self.max_staleness
+
+    def latest(self, collection: str, names: List[str]) -> Tuple[bool, Optional[dict]]:
+        """
+        Newest cached document for any of the L1Names in a collection.
+
+        Returns (fresh, doc). When fresh is False the cache can't be trusted and
+        doc is None; when fresh is True a None doc means there is no data.
+        """
+        if not self.is_fresh():
+            self.stats["stale"] += 1
+            return False, None
+
+        self.stats["hits"] += 1
+        newest = None
+        by_name = self._latest[collection]
+        for name in names:
+            for doc in by_name.get(name, {}).values():
+                if newest is None or _newer(doc, newest):
+                    newest = doc
+        return True, newest
+
+    # ----- Writes -----
+
+    def _apply(self, collection: str, doc: dict):
+        name, signal = doc.get("L1Name"), doc.get("signalname")
+        if not isinstance(name, str) or signal is None:
+            return
+        signals = self._latest[collection].setdefault(name, {})
+        current = signals.get(signal)
+        if current is None or not _newer(current, doc):
+            signals[signal] = {k: doc.get(k) for k in CACHED_FIELDS}
+            self.stats["updates"] += 1
+
+        updated = doc.get("updatedate")
+        high_water = self._high_water[collection]
+        if updated is not None and (high_water is None or updated > high_water):
+            self._high_water[collection] = updated
+
+    async def prime(self):
+        """Load the latest document per (L1Name, signalname) for every cached collection."""
+        for collection, signal in CACHED_SIGNALS.items():
+            pipeline = [
+                {"$match": {"signalname": signal}},
+                {"$sort": {"L1Name": 1, "signalname": 1, "updatedate": -1}},
+                {"$group": {
+                    "_id": {"L1Name": "$L1Name", "signalname": "$signalname"},
+                    **{field: {"$first": f"${field}"} for field in CACHED_FIELDS},
+                }},
+            ]
+            async for doc in self.db[collection].aggregate(pipeline, allowDiskUse=True):
+                self._apply(collection, doc)
+        self.primed = True
+        self.synced_at = time.time()
+
+    async def _prime_until_ready(self):
+        """Retry the prime until it succeeds; until then is_fresh() stays False and callers query Mongo."""
+        while not self.primed:
+            try:
+                await asyncio.wait_for(self.prime(), timeout=SENSOR_CACHE_PRIME_TIMEOUT)
+                print(f"✅ Sensor cache primed: {self.size()} signals")
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                print(f"⚠️ Sensor cache prime failed: {e!r}; retrying in {SENSOR_CACHE_REPRIME_SECONDS:g}s")
+                await asyncio.sleep(SENSOR_CACHE_REPRIME_SECONDS)
+
+    async def poll_once(self):
+        """Apply documents at or after each collection's high-water mark."""
+        for collection, signal in CACHED_SIGNALS.items():
+            while True:
+                query = {"signalname": signal}
+                if self._high_water[collection] is not None:
+                    query["updatedate"] = {"$gte": self._high_water[collection]}
+                before = self._high_water[collection]
+                docs = await self.db[collection].find(
+                    query, {field: 1 for field in CACHED_FIELDS}
+                ).sort("updatedate", 1).limit(SENSOR_CACHE_POLL_BATCH).to_list(length=SENSOR_CACHE_POLL_BATCH)
+                for doc in docs:
+                    self._apply(collection, doc)
+                # Full batch with a moving mark means more to read; otherwise caught up
+                if len(docs) < SENSOR_CACHE_POLL_BATCH or self._high_water[collection] == before:
+                    break
+        self.synced_at = time.time()
+
+    # ----- Sync loops -----
+
+    async def _watch(self, collection: str, opened: asyncio.Event):
+        pipeline = [{"$match": {
+            "operationType": {"$in": ["insert", "replace", "update"]},
+            "fullDocument.signalname": CACHED_SIGNALS[collection],
+        }}]
+        async with self.db[collection].watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+            opened.set()
+            while stream.alive:
+                change = await stream.try_next()
+                # try_next returns None after an empty await, which still proves the stream is current
+                self.synced_at = time.time()
+                if change and change.get("fullDocument"):
+                    self._apply(collection, change["fullDocument"])
+
+    async def _run_change_streams(self):
+        opened = {c: asyncio.Event() for c in CACHED_SIGNALS}
+        watches = [asyncio.create_task(self._watch(c, opened[c])) for c in CACHED_SIGNALS]
+
+        async def wait_all_open():
+            for event in opened.values():
+                await event.wait()
+
+        # A plain task (not a gather) so cancelling it leaves no unretrieved exception behind
+        all_open = asyncio.create_task(wait_all_open())
+        try:
+            done, _ = await asyncio.wait([all_open, *watches], return_when=asyncio.FIRST_COMPLETED)
+            if all_open not in done:
+                for watch in done:
+                    watch.result()  # A stream failed to open: raise so _sync falls back to polling
+
+            # Prime only once the streams are open, so nothing written in between is missed
+            await self._prime_until_ready()
+            await asyncio.gather(*watches)
+        finally:
+            all_open.cancel()
+            for watch in watches:
+                watch.cancel()
+
+    async def _wait_for_poll_index(self):
+        """
+        Return once every cached collection has the poll index (created when
+        MONGO_ENSURE_INDEXES is set). Until then the cache is disabled and the
+        check is retried every SENSOR_CACHE_REPRIME_SECONDS, so a transient
+        failure or an index added later doesn't leave it off for good.
+        """
+        while True:
+            try:
+                reasons = []
+                for collection in CACHED_SIGNALS:
+                    reason = await asyncio.wait_for(
+                        ensure_index(self.db[collection], POLL_INDEX, create=MONGO_ENSURE_INDEXES),
+                        timeout=SENSOR_CACHE_PRIME_TIMEOUT,
+                    )
+                    if reason:
+                        reasons.append(reason)
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                reasons = [f"index check failed: {e!r}"]
+            if not reasons:
+                self.disabled_reason = None
+                return
+            # Scanning every 2s would cost more than the per-request queries the cache replaces
+            reason = f"polling needs an updatedate index: {'; '.join(reasons)}"
+            if reason != self.disabled_reason:
+                print(f"⚠️ Sensor cache disabled, {reason}; rechecking every {SENSOR_CACHE_REPRIME_SECONDS:g}s")
+            self.disabled_reason = reason
+            self.active_mode = "disabled"
+            await asyncio.sleep(SENSOR_CACHE_REPRIME_SECONDS)
+
+    async def _run_polling(self):
+        while True:
+            try:
+                await self.poll_once()
+            except PyMongoError as e:
+                self.stats["sync_errors"] += 1
+                print(f"Sensor cache poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _sync(self):
+        if self.mode in ("auto", "change_stream"):
+            try:
+                self.active_mode = "change_stream"
+                await self._run_change_streams()
+            except Exception as e:
+                # Standalone servers (no replica set) reject watch(); poll from the high-water mark instead
+                self.stats["sync_errors"] += 1
+                print(f"Sensor cache change stream unavailable ({e}); falling back to polling")
+                if self.mode == "change_stream":
+                    self.active_mode = None
+                    return
+        await self._wait_for_poll_index()
+        self.active_mode = "poll"
+        # Polling from an unset high-water mark would read whole collections
+        await self._prime_until_ready()
+        await self._run_polling()
+
+    async def start(self):
+        """
+        Start syncing in the background and return at once. The sync task primes
+        only after the change streams are open (or the poll index check has
+        passed), so no write can land between the prime and the first update;
+        callers query Mongo until the prime succeeds.
+        """
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._sync()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def size(self) -> int:
+        return sum(len(signals) for by_name in self._latest.values() for signals in by_name.values())
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "mode": self.active_mode,
+            "primed": self.primed,
+            "disabled_reason": self.disabled_reason,
+            "fresh": self.is_fresh(),
+            "age_s": round(time.time() - self.synced_at, 1) if self.synced_at else None,
+            "max_staleness_s": self.max_staleness,
+            "signals": self.size(),
+        }
+
+
+def _newer(a: dict, b: dict) -> bool:
+    """True when a is strictly newer than b (documents without updatedate count as oldest)."""
+    a_date, b_date = a.get("updatedate"), b.get("updatedate")
+    if a_date is None:
+        return False
+    return b_date is None or a_date > b_date
+
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from .compliance_agent import ComplianceAgent
+from .training_agent import TrainingAgent
+
+
+class SpeculativePrefetch:
+    """
+    Intent-independent work started while the LLM is still deciding the intent.
+
+    For every candidate intent the retrieval its agent will need is started
+    right away (and symptom extraction for "diagnostic"). Once the intent is
+    known the matching tasks are handed to the agent and the rest are
+    cancelled. Work already running in a thread finishes there, but its
+    result is dropped.
+    """
+
+    def __init__(self, query: str, user_id: int, symptom_agent, retrieval_agent):
+        self.query = query
+        self.user_id = user_id
+        self.symptom_agent = symptom_agent
+        self.retrieval_agent = retrieval_agent
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.used: List[str] = []
+
+    def _start(self, name: str, coro):
+        if name not in self.tasks:
+            self.tasks[name] = asyncio.create_task(coro)
+
+    def start(self, intents: List[str]):
+        for intent in intents:
+            if intent == "diagnostic":
+                self._start("symptoms", self.symptom_agent.extract_symptoms(self.query))
+                self._start("docs:diagnostic", self.retrieval_agent.retrieve_docs(self.query, self.user_id))
+            elif intent == "compliance":
+                self._start("docs:compliance", self.retrieval_agent.retrieve_docs(
+                    ComplianceAgent.search_query(self.query), self.user_id))
+            elif intent == "training":
+                self._start("docs:training", self.retrieval_agent.retrieve_docs(
+                    TrainingAgent.search_query(self.query), self.user_id))
+
+    def take(self, name: str) -> Optional[asyncio.Task]:
+        """Hand a prefetched task to its consumer (None if it was never started)."""
+        task = self.tasks.pop(name, None)
+        if task is not None:
+            self.used.append(name)
+        return task
+
+    def cancel_unused(self) -> List[str]:
+        cancelled = list(self.tasks)
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+        return cancelled
@@ -3,11 +3,13 @@ import os
 import json
 from dotenv import load_dotenv
 
+from .executor import run_llm
+
 load_dotenv()
 
 class SymptomAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, client=None):
+        self.client = client or Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "openai/gpt-oss-120b"
 
     async def extract_symptoms(self, query: str) -> dict:
@@ -36,7 +38,9 @@ class SymptomAgent:
         """
 
         try:
-            response = self.client.chat.completions.create(
+            # Sync Groq client: run it off the event loop so other agents keep going
+            response = await run_llm(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1
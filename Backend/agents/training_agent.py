@@ -3,22 +3,33 @@ import json
 from groq import Groq
 from dotenv import load_dotenv
 from .retrieval_agent import RetrievalAgent
+from .executor import run_llm
 
 load_dotenv()
 
+SEARCH_SUFFIX = "procedure manual instructions training"
+
 class TrainingAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    def __init__(self, client=None, retrieval_agent=None):
+        self.client = client or Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "openai/gpt-oss-120b"
-        self.retrieval_agent = RetrievalAgent()
+        self.retrieval_agent = retrieval_agent or RetrievalAgent()
+
+    @staticmethod
+    def search_query(query: str) -> str:
+        return f"{query} {SEARCH_SUFFIX}"
 
-    async def generate_training(self, query: str, user_id: int) -> dict:
+    async def generate_training(self, query: str, user_id: int, prefetched_docs=None) -> dict:
         """
         Generates a training module based on the query by retrieving relevant documents.
+        
+        prefetched_docs: optional awaitable already retrieving search_query(query)
         """
         # 1. Retrieve relevant documents
-        search_query = f"{query} procedure manual instructions training"
-        docs = await self.retrieval_agent.retrieve_docs(search_query, user_id)
+        if prefetched_docs is not None:
+            docs = await prefetched_docs
+        else:
+            docs = await self.retrieval_agent.retrieve_docs(self.search_query(query), user_id)
         
         # 2. Generate Training Content
         prompt = f"""
@@ -49,7 +60,8 @@ class TrainingAgent:
         """
         
         try:
-            response = self.client.chat.completions.create(
+            response = await run_llm(
+                self.client.chat.completions.create,
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.3,
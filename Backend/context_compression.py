@@ -0,0 +1,154 @@
+"""
+Extractive Context Compression
+==============================
+
+Shrinks retrieved chunks before they are sent to the LLM.
+
+Every sentence of the retrieved chunks is scored against the question with the
+same MiniLM model used for retrieval. The best sentences (plus their immediate
+neighbours, so the kept text still reads naturally) are kept until the
+character budget is spent. Everything runs locally on CPU.
+
+Chunk metadata (page, section, filename, ...) is preserved so citations keep
+working after compression.
+"""
+
+import logging
+import math
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from rag_docling import embed_model, split_sentences
+
+logger = logging.getLogger(__name__)
+
+# ----- Configuration -----
+KEEP_RATIO = 0.4          # Fraction of the original characters to keep
+NEIGHBOUR_WINDOW = 1      # Sentences kept on each side of a selected sentence
+MIN_SENTENCES = 3         # Chunks with fewer sentences are passed through untouched
+GAP_MARKER = "…"
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)."""
+    return math.ceil(len(text) / 4)
+
+
+def _is_table_chunk(chunk: Dict[str, Any]) -> bool:
+    return "table" in str(chunk.get("content_types", "")).lower()
+
+
+def compress_chunks(query: str, chunks: List[Dict[str, Any]],
+                    keep_ratio: float = KEEP_RATIO,
+                    window: int = NEIGHBOUR_WINDOW) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compress retrieved chunks down to the sentences most relevant to the query.
+
+    Args:
+        query: User question
+        chunks: Chunks as returned by search_chunks (must have a 'text' key)
+        keep_ratio: Target fraction of characters to keep
+        window: Number of neighbouring sentences kept around each selected one
+
+    Returns:
+        Tuple of (compressed chunks, compression statistics)
+    """
+    original_chars = sum(len(c.get("text", "")) for c in chunks)
+
+    # Collect sentences of every compressible chunk so they are embedded in one batch
+    chunk_sentences: List[List[str]] = []
+    owners: List[Tuple[int, int]] = []  # (chunk index, sentence index)
+    all_sentences: List[str] = []
+
+    for c_idx, chunk in enumerate(chunks):
+        sentences = [] if _is_table_chunk(chunk) else split_sentences(chunk.get("text", ""))
+        if len(sentences) < MIN_SENTENCES:
+            sentences = []
+        chunk_sentences.append(sentences)
+        for s_idx, sentence in enumerate(sentences):
+            owners.append((c_idx, s_idx))
+            all_sentences.append(sentence)
+
+    kept: List[set] = [set() for _ in chunks]
+
+    if all_sentences:
+        vectors = embed_model.encode(
+            [query] + all_sentences,
+            show_progress_bar=False,
+            normalize_embeddings=True
+        )
+        scores = vectors[1:] @ vectors[0]
+        order = np.argsort(-scores)
+
+        # Text that is passed through untouched still counts towards the budget
+        passthrough_chars = sum(
+            len(c.get("text", "")) for c, s in zip(chunks, chunk_sentences) if not s
+        )
+        budget = max(0.0, keep_ratio * original_chars - passthrough_chars)
+        used = 0
+
+        # Always keep the best sentence of every chunk so each citation survives
+        best_per_chunk: Dict[int, int] = {}
+        for flat_idx in order:
+            c_idx, s_idx = owners[flat_idx]
+            if c_idx not in best_per_chunk:
+                best_per_chunk[c_idx] = s_idx
+        for c_idx, s_idx in best_per_chunk.items():
+            kept[c_idx].add(s_idx)
+            used += len(chunk_sentences[c_idx][s_idx])
+
+        # Spend the remaining budget on the globally best sentences plus neighbours
+        for flat_idx in order:
+            if used >= budget:
+                break
+            c_idx, s_idx = owners[flat_idx]
+            sentences = chunk_sentences[c_idx]
+            lo = max(0, s_idx - window)
+            hi = min(len(sentences), s_idx + window + 1)
+            for i in range(lo, hi):
+                if i not in kept[c_idx]:
+                    kept[c_idx].add(i)
+                    used += len(sentences[i])
+
+    compressed = []
+    sentences_kept = 0
+    for c_idx, chunk in enumerate(chunks):
+        sentences = chunk_sentences[c_idx]
+        if not sentences:
+            compressed.append(dict(chunk))
+            continue
+
+        parts = []
+        previous = None
+        for i in sorted(kept[c_idx]):
+            if previous is not None and i != previous + 1:
+                parts.append(GAP_MARKER)
+            parts.append(sentences[i])
+            previous = i
+        sentences_kept += len(kept[c_idx])
+
+        compressed_chunk = dict(chunk)
+        compressed_chunk["text"] = " ".join(parts)
+        compressed_chunk["original_length"] = len(chunk.get("text", ""))
+        compressed.append(compressed_chunk)
+
+    compressed_chars = sum(len(c["text"]) for c in compressed)
+    original_tokens = sum(_estimate_tokens(c.get("text", "")) for c in chunks)
+    compressed_tokens = sum(_estimate_tokens(c["text"]) for c in compressed)
+
+    stats = {
+        "original_chars": original_chars,
+        "compressed_chars": compressed_chars,
+        "original_tokens_est": original_tokens,
+        "compressed_tokens_est": compressed_tokens,
+        "compression_ratio": round(compressed_chars / original_chars, 3) if original_chars else 1.0,
+        "sentences_total": len(all_sentences),
+        "sentences_kept": sentences_kept,
+    }
+
+    logger.info(
+        f"Compressed context {original_chars} → {compressed_chars} chars "
+        f"(ratio {stats['compression_ratio']})"
+    )
+    return compressed, stats
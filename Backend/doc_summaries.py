@@ -0,0 +1,342 @@
+"""
+Precomputed Document Outlines and Summaries
+===========================================
+
+Built in the background after ingestion so that "summarize this manual" or
+"what sections does it have" become lookups instead of RAG queries.
+
+- Outline: hierarchical tree built from the Docling heading path of every
+  stored chunk (`meta.headings`, stored as "A > B > C" in the section field)
+- Section summaries: one LLM call per section (map), cached by content hash
+- Document summary: one LLM call over the section summaries (reduce)
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from rag_docling import parent_store
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "doc_summaries.db"
+
+# ----- Configuration -----
+MAX_SECTION_CHARS = 6000      # Section text sent to the map step
+SHORT_SECTION_CHARS = 300     # Sections this short are used verbatim
+MAX_SUMMARY_WORKERS = 4       # Concurrent map-step LLM calls
+MAX_SUMMARY_CITATIONS = 8     # Top-level sections cited by a precomputed answer, across documents
+
+# Both patterns match the whole question, so only document-level requests ("summarize",
+# "give me an overview of this manual", "what sections does it have") are answered from the
+# precomputed data; scoped ones ("summarize the spindle lubrication procedure", "which sections
+# cover spindle lubrication?") go through retrieval.
+_LEAD_IN = r"^\s*(please\s+)?((can|could|would) you\s+)?"
+_DOCUMENT_REF = (
+    r"(\s+(of|for|in|on))?(\s+(this|the|these|that|those|my|each|both|all|selected|it))?"
+    r"(\s+(documents?|manuals?|files?|pdfs?|docs?))?(\s+please)?\s*[?.!]*\s*$"
+)
+_DOCUMENT = r"(this|the|these|that|my)\s+(documents?|manuals?|files?|pdfs?|docs?)"
+
+SUMMARY_QUESTION_RE = re.compile(
+    _LEAD_IN + r"((give|show|write)( me)?|provide|get)?\s*"
+    r"(an?\s+|the\s+)?((brief|short|quick|high[- ]level|overall)\s+)?"
+    r"(summar(y|ise|ize)|overview|gist|tl;?dr)" + _DOCUMENT_REF
+    + r"|^\s*what(\s+i|')s\s+" + _DOCUMENT + r"\s+about\s*[?.!]*\s*$",
+    re.IGNORECASE
+)
+OUTLINE_QUESTION_RE = re.compile(
+    _LEAD_IN + r"((give|show|list|get)( me)?|provide|what(\s+i|')s|what\s+are)?\s*"
+    r"(an?\s+|the\s+)?(outline|table of contents|toc|structure|sections|chapters|headings)" + _DOCUMENT_REF
+    + r"|^\s*(what|which)\s+(sections|chapters|topics|headings)\s+(does|do|are\s+in|is\s+in)\s+(it|" + _DOCUMENT + r")"
+    r"(\s+(have|contain|cover|include))?\s*[?.!]*\s*$",
+    re.IGNORECASE
+)
+
+class DocumentSummaryStore:
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._init_db()
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        # One row per document: build status, outline tree and overall summary
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS document_summaries (
+                doc_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                outline TEXT, -- JSON string
+                summary TEXT,
+                error TEXT,
+                updated_at TIMESTAMP
+            )
+        ''')
+
+        # Map-step cache, shared across documents with identical sections
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS section_summary_cache (
+                content_hash TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created_at TIMESTAMP
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def set_status(self, doc_id, user_id, status: str, error: Optional[str] = None):
+        now = datetime.now().isoformat()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''INSERT INTO document_summaries (doc_id, user_id, status, error, updated_at)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(doc_id) DO UPDATE SET status = excluded.status,
+                   error = excluded.error, updated_at = excluded.updated_at''',
+            (str(doc_id), str(user_id), status, error, now)
+        )
+        conn.commit()
+        conn.close()
+
+    def save(self, doc_id, user_id, outline: List[Dict[str, Any]], summary: str):
+        now = datetime.now().isoformat()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''INSERT OR REPLACE INTO document_summaries
+               (doc_id, user_id, status, outline, summary, error, updated_at)
+               VALUES (?, ?, 'ready', ?, ?, NULL, ?)''',
+            (str(doc_id), str(user_id), json.dumps(outline), summary, now)
+        )
+        conn.commit()
+        conn.close()
+
+    def get(self, doc_id) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT doc_id, status, outline, summary, error, updated_at FROM document_summaries WHERE doc_id = ?",
+            (str(doc_id),)
+        )
+        row = cursor.fetchone()
+        conn.close()
+
+        if not row:
+            return None
+        return {
+            "doc_id": row[0],
+            "status": row[1],
+            "outline": json.loads(row[2]) if row[2] else [],
+            "summary": row[3] or "",
+            "error": row[4],
+            "updated_at": row[5],
+        }
+
+    def get_cached_section(self, content_hash: str) -> Optional[str]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT summary FROM section_summary_cache WHERE content_hash = ?", (content_hash,))
+        row = cursor.fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def cache_section(self, content_hash: str, summary: str):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT OR REPLACE INTO section_summary_cache (content_hash, summary, created_at) VALUES (?, ?, ?)",
+            (content_hash, summary, datetime.now().isoformat())
+        )
+        conn.commit()
+        conn.close()
+
+
+summary_store = DocumentSummaryStore()
+
+
+# ----- Outline -----
+
+def group_sections(parents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group parent chunks by heading path, in document order."""
+    sections: Dict[str, Dict[str, Any]] = {}
+    for parent in parents:
+        path = parent.get("section") or ""
+        section = sections.setdefault(path, {
+            "path": [h.strip() for h in path.split(" > ") if h.strip()],
+            "texts": [],
+            "pages": []
+        })
+        section["texts"].append(parent["text"])
+        if parent.get("page"):
+            section["pages"].append(parent["page"])
+    return [{"key": key, **value} for key, value in sections.items()]
+
+
+def build_outline(sections: List[Dict[str, Any]], section_summaries: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Build a heading tree from the sections' heading paths.
+
+    Every node has a title, the page range it covers, its own summary (if the
+    heading has content of its own) and its children.
+    """
+    root: List[Dict[str, Any]] = []
+
+    for section in sections:
+        level = root
+        node = None
+        for depth, title in enumerate(section["path"] or ["(Untitled)"]):
+            node = next((n for n in level if n["title"] == title), None)
+            if node is None:
+                node = {"title": title, "level": depth + 1, "pages": [], "summary": "", "children": []}
+                level.append(node)
+            node["pages"].extend(section["pages"])
+            level = node["children"]
+        node["summary"] = section_summaries.get(section["key"], "")
+
+    def finalize(nodes):
+        for n in nodes:
+            pages = n.pop("pages")
+            n["page_start"] = min(pages) if pages else None
+            n["page_end"] = max(pages) if pages else None
+            finalize(n["children"])
+
+    finalize(root)
+    return root
+
+
+def render_outline(nodes: List[Dict[str, Any]], depth: int = 0) -> List[str]:
+    """Render the outline tree as nested Markdown bullets."""
+    lines = []
+    for node in nodes:
+        pages = ""
+        if node.get("page_start"):
+            pages = f" (p. {node['page_start']}" + (f"–{node['page_end']}" if node["page_end"] != node["page_start"] else "") + ")"
+        lines.append(f"{'  ' * depth}- **{node['title']}**{pages}")
+        lines.extend(render_outline(node["children"], depth + 1))
+    return lines
+
+
+# ----- Map-Reduce Summaries -----
+
+def _complete(llm_client, model: str, prompt: str) -> str:
+    response = llm_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2
+    )
+    return response.choices[0].message.content.strip()
+
+
+def summarize_section(section: Dict[str, Any], llm_client, model: str) -> str:
+    """Map step: summarize one section, reusing the cached summary when the text is unchanged."""
+    text = "\n\n".join(section["texts"])
+    if len(text) <= SHORT_SECTION_CHARS:
+        return text
+
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cached = summary_store.get_cached_section(content_hash)
+    if cached:
+        return cached
+
+    title = " > ".join(section["path"]) or "(Untitled)"
+    prompt = f"""Summarize the following section of a technical document in 2-4 sentences.
+Keep specific values, part names, procedures and warnings. Return only the summary text.
+
+Section: {title}
+
+{text[:MAX_SECTION_CHARS]}
+"""
+    summary = _complete(llm_client, model, prompt)
+    summary_store.cache_section(content_hash, summary)
+    return summary
+
+
+def build_document_summaries(doc_id, user_id, llm_client, model: str) -> Optional[Dict[str, Any]]:
+    """
+    Build and store the outline and map-reduce summary of an ingested document.
+
+    Meant to run as a background task after ingestion; failures are recorded
+    in the store instead of being raised.
+    """
+    summary_store.set_status(doc_id, user_id, "building")
+
+    try:
+        parents = parent_store.get_document_parents(doc_id)
+        if not parents:
+            summary_store.set_status(doc_id, user_id, "error", "No stored chunks for document")
+            return None
+
+        sections = group_sections(parents)
+
+        # Map: one summary per section
+        with ThreadPoolExecutor(max_workers=MAX_SUMMARY_WORKERS) as pool:
+            summaries = list(pool.map(lambda s: summarize_section(s, llm_client, model), sections))
+        section_summaries = {s["key"]: summary for s, summary in zip(sections, summaries)}
+
+        # Reduce: overall summary from the section summaries
+        digest = "\n".join(
+            f"- {' > '.join(s['path']) or '(Untitled)'}: {section_summaries[s['key']]}" for s in sections
+        )
+        prompt = f"""Below are summaries of every section of a technical document, in order.
+Write an overview of the whole document in Markdown: one short paragraph on its purpose,
+then bullet points for the main topics. Return only the Markdown.
+
+{digest[:MAX_SECTION_CHARS * 2]}
+"""
+        document_summary = _complete(llm_client, model, prompt)
+
+        outline = build_outline(sections, section_summaries)
+        summary_store.save(doc_id, user_id, outline, document_summary)
+
+        logger.info(f"✅ Built outline ({len(sections)} sections) and summary for document {doc_id}")
+        return summary_store.get(doc_id)
+
+    except Exception as e:
+        logger.error(f"Summary build failed for document {doc_id}: {str(e)}", exc_info=True)
+        summary_store.set_status(doc_id, user_id, "error", str(e))
+        return None
+
+
+# ----- Query Routing -----
+
+def classify_summary_question(question: str) -> Optional[str]:
+    """Return 'outline' or 'summary' for questions answerable from the precomputed data, else None."""
+    if OUTLINE_QUESTION_RE.search(question):
+        return "outline"
+    if SUMMARY_QUESTION_RE.search(question):
+        return "summary"
+    return None
+
+
+def answer_from_summaries(kind: str, records: List[Dict[str, Any]], filenames: Dict[str, str]) -> Dict[str, Any]:
+    """Format precomputed outlines/summaries as a /query response."""
+    parts = []
+    for record in records:
+        filename = filenames.get(record["doc_id"], f"Document {record['doc_id']}")
+        if len(records) > 1:
+            parts.append(f"## {filename}")
+        if kind == "outline":
+            parts.append("\n".join(render_outline(record["outline"])) or "_No headings found in this document._")
+        else:
+            parts.append(record["summary"])
+
+    # Top-level sections only, with an even share of MAX_SUMMARY_CITATIONS per document
+    per_document = max(1, MAX_SUMMARY_CITATIONS // len(records)) if records else 0
+    citations = [
+        {"page": node.get("page_start"), "section": node["title"], "snippet": node.get("summary", "")[:200],
+         "filename": filenames.get(record["doc_id"], "")}
+        for record in records for node in record["outline"][:per_document]
+    ]
+
+    return {"answer": "\n\n".join(parts), "citations": citations}
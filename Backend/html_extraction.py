@@ -0,0 +1,242 @@
+"""
+HTML Text Extraction in a Process Pool
+======================================
+
+Trafilatura extraction and BeautifulSoup parsing are CPU-bound. On the
+event loop or in the default thread pool the GIL serializes them, so they run
+here in a dedicated process pool instead. Plain text (e.g. Jina Reader output)
+only needs the regex cleaning and is handled in-process.
+
+- Every input is capped at MAX_HTML_BYTES, before it is shipped to a worker
+- A single-pass pre-strip drops <script>, <style>, comments and similar
+  non-content blocks before the real parser sees the page
+- Workers use the 'spawn' start method so they don't inherit the parent's
+  model weights and threads
+
+Benchmark over a folder of saved pages:
+    python html_extraction.py path/to/html_pages [--workers N] [--concurrency N]
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# ----- Configuration -----
+MAX_HTML_BYTES = int(os.getenv('MAX_HTML_BYTES', str(2 * 1024 * 1024)))
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))
+
+_NON_CONTENT_RE = re.compile(
+    r'<!--.*?-->|<(script|style|noscript|svg|template|iframe)\b[^>]*>.*?</\1\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+# ============================================================================
+# WORKER FUNCTIONS (module level so they can be pickled)
+# ============================================================================
+
+def clean_text(text: str) -> str:
+    """Clean and normalize text"""
+    if not text:
+        return ""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'!\[.*?\]\(.*?\)', '', text)
+    return text.strip()
+
+
+def cap_size(page: Union[str, bytes]) -> Union[str, bytes]:
+    """Truncate a page to MAX_HTML_BYTES (characters for str)."""
+    return page[:MAX_HTML_BYTES]
+
+
+def _to_text(html: Union[str, bytes]) -> str:
+    """Cap the input size and decode bytes (Trafilatura's charset detection when available)."""
+    html = cap_size(html)
+    if isinstance(html, bytes):
+        try:
+            from trafilatura.utils import decode_file
+            return decode_file(html)
+        except ImportError:
+            return html.decode('utf-8', errors='replace')
+    return html
+
+
+def strip_non_content(html: str) -> str:
+    """Drop script/style/comment/svg blocks in one pass before full parsing."""
+    return _NON_CONTENT_RE.sub(' ', html)
+
+
+def extract_main_text(html: Union[str, bytes], method: str = 'trafilatura') -> Optional[str]:
+    """
+    Extract the cleaned main text of a page.
+
+    Args:
+        html: Raw page (str or bytes); plain text for method='text'
+        method: 'trafilatura', 'soup' (BeautifulSoup main/article/body text)
+            or 'text' (regex cleaning only, cheap enough to run in-process)
+    """
+    if method == 'text':
+        text = cap_size(html)
+        return clean_text(text if isinstance(text, str) else text.decode('utf-8', errors='replace'))
+
+    page = strip_non_content(_to_text(html))
+
+    if method == 'trafilatura':
+        from trafilatura import extract
+        text = extract(page, include_comments=False, include_tables=True)
+        return clean_text(text) if text else None
+
+    if method == 'soup':
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(page, 'html.parser')
+        for tag in soup(['nav', 'footer', 'header']):
+            tag.decompose()
+        main = soup.find('main') or soup.find('article') or soup.find('body')
+        return clean_text(main.get_text(separator=' ', strip=True)) if main else None
+
+    raise ValueError(f"Unknown extraction method: {method}")
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+# ============================================================================
+# POOL MANAGEMENT
+# ============================================================================
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_extraction_pool(workers: int = EXTRACTION_WORKERS) -> ProcessPoolExecutor:
+    """Create the process pool and start its workers ahead of the first request."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        for _ in range(workers):
+            _pool.submit(_warmup)
+        logger.info(f"⚙️  HTML extraction pool started with {workers} workers")
+    return _pool
+
+
+def shutdown_extraction_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def extract_in_pool(html: Union[str, bytes], method: str = 'trafilatura') -> Optional[str]:
+    """
+    Run extract_main_text in the process pool (restarting it once if a worker died).
+
+    Only HTML parsing goes to a worker, and only the first MAX_HTML_BYTES of
+    the page are pickled; plain text (method='text') is cleaned in-process.
+    """
+    global _pool
+    if method == 'text':
+        return extract_main_text(html, 'text')
+    html = cap_size(html)
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        try:
+            return await loop.run_in_executor(start_extraction_pool(), extract_main_text, html, method)
+        except BrokenProcessPool:
+            logger.warning("⚠️  HTML extraction pool broken, restarting")
+            _pool = None
+            if attempt:
+                raise
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+async def _benchmark(folder: str, workers: int, concurrency: int):
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    pages = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(('.html', '.htm')):
+            with open(os.path.join(folder, name), 'rb') as f:
+                pages.append(f.read())
+    if not pages:
+        print(f"No .html files found in {folder}")
+        return
+
+    total_mb = sum(len(p) for p in pages) / (1024 * 1024)
+    print(f"\n{len(pages)} pages, {total_mb:.1f} MB, concurrency {concurrency}\n")
+
+    def current_path(page: bytes) -> Optional[str]:
+        # What ContentEnhancer did before: full page straight into Trafilatura, then clean
+        from trafilatura import extract
+        text = extract(page, include_comments=False, include_tables=True)
+        return clean_text(text) if text else None
+
+    async def run(label: str, submit):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(page):
+            async with semaphore:
+                return await submit(page)
+
+        # Longest event loop stall while the batch runs (what other requests would feel)
+        max_lag = 0.0
+        done = asyncio.Event()
+
+        async def watch_loop():
+            nonlocal max_lag
+            while not done.is_set():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.01)
+                max_lag = max(max_lag, time.perf_counter() - tick - 0.01)
+
+        watcher = asyncio.create_task(watch_loop())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(p) for p in pages))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await watcher
+        extracted = sum(1 for r in results if r)
+        print(f"{label:<28} {elapsed:7.2f}s  {len(pages) / elapsed:7.1f} pages/s  "
+              f"{total_mb / elapsed:6.2f} MB/s  max loop stall {max_lag * 1000:7.1f} ms  ({extracted} extracted)")
+
+    loop = asyncio.get_running_loop()
+    threads = ThreadPoolExecutor(max_workers=workers)
+
+    async def inline(page):
+        return current_path(page)
+
+    async def in_threads(page):
+        return await loop.run_in_executor(threads, current_path, page)
+
+    start_extraction_pool(workers)
+    await asyncio.sleep(1)  # let the spawned workers finish importing
+
+    await run("current (event loop)", inline)
+    await run(f"current (threads x{workers})", in_threads)
+    await run(f"process pool x{workers}", lambda page: extract_in_pool(page, 'trafilatura'))
+
+    threads.shutdown()
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction paths over saved pages")
+    parser.add_argument("folder", help="Folder with saved .html pages")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    asyncio.run(_benchmark(args.folder, args.workers, args.concurrency))
@@ -1,7 +1,7 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Form
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, status, Form, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from dotenv import load_dotenv
 from groq import Groq
 import os
@@ -9,25 +9,34 @@ import json
 import shutil
 import sqlite3
 from datetime import timedelta
-from typing import Optional
+from typing import Optional, List
 # import logging
 
-from rag_docling import process_document, search_chunks, detect_format
+from rag_docling import process_document, search_chunks, search_chunks_multi, detect_format
+from context_compression import compress_chunks
+from doc_summaries import (
+    summary_store, build_document_summaries, classify_summary_question, answer_from_summaries
+)
 from auth import (
     init_db, create_user, get_user, verify_password, create_access_token,
     get_current_user, Token, ACCESS_TOKEN_EXPIRE_MINUTES, create_document,
     get_user_documents, get_document_owner, DB_NAME
 )
-from web_search import process_web_search, find_relevant_chunks
-from agents.orchestrator import Orchestrator
-from agents.master_agent import MasterAgent
-from agents.compliance_agent import ComplianceAgent
-from agents.training_agent import TrainingAgent
+from web_search import (
+    process_web_search, search_events, find_relevant_chunks, startup_web_clients, shutdown_web_clients,
+    get_provider_latency_stats, provider_cache, page_cache, web_index
+)
+from agents.registry import AgentRegistry
+from agents.speculation import SpeculativePrefetch
+from agents.master_agent import BATCH_MAX_MACHINES
 from chat_history import ChatHistoryManager
 from gtts import gTTS
 import tempfile
 import base64
 import uuid
+import time
+import asyncio
+from contextlib import asynccontextmanager
 
 load_dotenv()
 
@@ -47,7 +56,26 @@ chat_history_manager = ChatHistoryManager()
 # Use Groq client
 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-app = FastAPI()
+# /diagnose agents, created once in the lifespan and sharing one LLM and one Mongo client
+agent_registry = AgentRegistry()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        # Shared HTTP connection pool and warm browser pool for web content enhancement
+        await startup_web_clients(warm_browser=os.getenv("WARM_BROWSER_POOL", "true").lower() == "true")
+        agent_registry.start(llm_client=client)
+        await agent_registry.warm()
+        yield
+    finally:
+        # The web clients are closed even if the registry fails to close
+        try:
+            agent_registry.close()
+        except Exception as e:
+            print(f"⚠️ Agent registry shutdown failed: {e!r}")
+        await shutdown_web_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -59,6 +87,7 @@ app.add_middleware(
 )
 
 LLM_MODEL = "openai/gpt-oss-120b"
+SPECULATIVE_INTENTS = 2  # /diagnose: intents prefetched for while the LLM detects the intent
 
 UPLOAD_DIR = "uploads"
 if not os.path.exists(UPLOAD_DIR):
@@ -87,7 +116,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/ingest")
-async def ingest(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+async def ingest(background_tasks: BackgroundTasks, file: UploadFile = File(...),
+                 current_user: dict = Depends(get_current_user)):
     """
     Ingest documents using Docling.
     
@@ -105,6 +135,7 @@ async def ingest(file: UploadFile = File(...), current_user: dict = Depends(get_
     - Image classification
     - Intelligent chunking
     - Rich metadata extraction
+    - Background outline + summary build (see /documents/{doc_id}/summary)
     """
     try:
         # Detect format
@@ -126,6 +157,13 @@ async def ingest(file: UploadFile = File(...), current_user: dict = Depends(get_
             doc_id=doc_id
         )
         
+        # Build outline and section summaries after the response is sent
+        if stats.get("status") == "success":
+            summary_store.set_status(doc_id, current_user["id"], "pending")
+            background_tasks.add_task(
+                build_document_summaries, doc_id, current_user["id"], client, LLM_MODEL
+            )
+        
         return {
             "status": "success",
             "message": f"Document processed successfully using Docling",
@@ -178,13 +216,27 @@ async def get_document_file(doc_id: int, current_user: dict = Depends(get_curren
     
     return FileResponse(file_path, media_type=media_type, filename=filename)
 
+@app.get("/documents/{doc_id}/summary")
+async def get_document_summary(doc_id: int, current_user: dict = Depends(get_current_user)):
+    """Precomputed outline and summary of a document (built in the background after ingest)"""
+    owner_id = get_document_owner(doc_id)
+    if owner_id != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    record = summary_store.get(doc_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="No summary available for this document")
+    
+    return record
+
 @app.get("/documents")
 async def get_documents(current_user: dict = Depends(get_current_user)):
     """List all documents for current user"""
     return get_user_documents(current_user["id"])
 
 @app.post("/query")
-async def query(question: str, doc_id: Optional[int] = None, current_user: dict = Depends(get_current_user)):
+async def query(question: str, doc_id: Optional[int] = None, doc_ids: Optional[List[int]] = Query(None),
+                diversify: bool = True, current_user: dict = Depends(get_current_user)):
     """
     Query documents using RAG with Docling-processed content.
     
@@ -192,20 +244,51 @@ async def query(question: str, doc_id: Optional[int] = None, current_user: dict
     - Richer context from better document understanding
     - Metadata like page numbers, sections, and content types
     - Better handling of tables, images, and complex layouts
+    - Optional MMR diversification so near-duplicate chunks don't crowd the context
+    - Several documents at once (repeat doc_ids), searched in parallel with a
+      fair per-document share of the context
     """
-    # Verify document ownership if doc_id provided
-    if doc_id:
-        owner_id = get_document_owner(doc_id)
+    selected_doc_ids = list(dict.fromkeys((doc_ids or []) + ([doc_id] if doc_id else [])))
+    
+    # Verify document ownership for every selected document
+    for selected_id in selected_doc_ids:
+        owner_id = get_document_owner(selected_id)
         if owner_id != current_user["id"]:
             raise HTTPException(status_code=403, detail="Not authorized to access this document")
     
+    # Summary/outline questions about selected documents are answered from the precomputed data
+    summary_kind = classify_summary_question(question) if selected_doc_ids else None
+    if summary_kind:
+        records = [summary_store.get(selected_id) for selected_id in selected_doc_ids]
+        if all(record and record["status"] == "ready" for record in records):
+            filenames = {str(d["id"]): d["filename"] for d in get_user_documents(current_user["id"])}
+            return {
+                "response": answer_from_summaries(summary_kind, records, filenames),
+                "chunks_used": [],
+                "metadata": {
+                    "source": f"precomputed_{summary_kind}",
+                    "document_specific": True,
+                    "doc_ids": selected_doc_ids
+                }
+            }
+    
     # Search for relevant chunks
-    top_chunks = search_chunks(
-        query=question,
-        user_id=current_user["id"],
-        doc_id=doc_id,
-        k=5
-    )
+    if len(selected_doc_ids) > 1:
+        top_chunks = search_chunks_multi(
+            query=question,
+            user_id=current_user["id"],
+            doc_ids=selected_doc_ids,
+            k=6,
+            diversify=diversify
+        )
+    else:
+        top_chunks = search_chunks(
+            query=question,
+            user_id=current_user["id"],
+            doc_id=selected_doc_ids[0] if selected_doc_ids else None,
+            k=5,
+            diversify=diversify
+        )
     
     if not top_chunks:
         return {
@@ -216,20 +299,30 @@ async def query(question: str, doc_id: Optional[int] = None, current_user: dict
             "chunks_used": []
         }
     
+    # Keep only the sentences relevant to the question (metadata is preserved)
+    compressed_chunks, compression_stats = compress_chunks(question, top_chunks)
+    
     # Build context with enhanced metadata
     context_parts = []
-    for chunk in top_chunks:
+    multi_document = len(selected_doc_ids) > 1
+    for chunk in compressed_chunks:
         section_info = f" [{chunk['section']}]" if chunk['section'] else ""
         page_info = f"Page {chunk['page']}"
+        if multi_document:
+            page_info = f"{chunk['filename']} - {page_info}"
         context_parts.append(f"{page_info}{section_info}:\n{chunk['text']}")
     
     context = "\n\n---\n\n".join(context_parts)
+    document_note = (
+        "\nThe context comes from several documents; name the document (filename) in each citation and compare them where relevant.\n"
+        if multi_document else ""
+    )
     
     # Enhanced prompt with metadata awareness and markdown formatting
     prompt = f"""You are a RAG assistant with access to document content that has been carefully extracted and structured.
 
 The context below includes page numbers and section headings for precise citations.
-
+{document_note}
 Context:
 {context}
 
@@ -257,8 +350,8 @@ Return your response as JSON in this exact format:
 {{
   "answer": "your detailed markdown-formatted answer here",
   "citations": [
-    {{"page": 1, "section": "Introduction", "snippet": "relevant text"}},
-    {{"page": 3, "section": "Methods", "snippet": "relevant text"}}
+    {{"page": 1, "section": "Introduction", "snippet": "relevant text", "filename": "manual.pdf"}},
+    {{"page": 3, "section": "Methods", "snippet": "relevant text", "filename": "manual.pdf"}}
   ]
 }}
 """
@@ -281,11 +374,14 @@ Return your response as JSON in this exact format:
         
         return {
             "response": data,
-            "chunks_used": top_chunks,
+            "chunks_used": compressed_chunks,
             "metadata": {
                 "model": LLM_MODEL,
                 "chunks_retrieved": len(top_chunks),
-                "document_specific": doc_id is not None
+                "document_specific": bool(selected_doc_ids),
+                "doc_ids": selected_doc_ids,
+                "diversified": diversify,
+                "compression": compression_stats
             }
         }
         
@@ -301,78 +397,92 @@ Return your response as JSON in this exact format:
 
         
 
-@app.post("/web-query")
-async def web_query(question: str, current_user: dict = Depends(get_current_user)):
+NO_WEB_RESULTS_ANSWER = "I couldn't find relevant information on the web for your query. This might be because:\n- The search didn't return accessible results\n- Websites blocked scraping\n- The query might be too specific or misspelled\n\nPlease try rephrasing your question."
+
+
+def build_web_context(relevant_chunks):
+    """LLM context with numbered source references, plus one citation per unique URL."""
+    context_parts = []
+    sources_map = {}
+    
+    for i, chunk_data in enumerate(relevant_chunks):
+        source = chunk_data['source']
+        url = source['url']
+        
+        # Track unique sources
+        if url not in sources_map:
+            snippet = source.get('snippet') or chunk_data['text'][:200]
+            sources_map[url] = {
+                'url': url,
+                'title': source['title'],
+                'domain': source['domain'],
+                'snippet': snippet
+            }
+        
+        # Add context with source reference
+        context_parts.append(
+            f"[Source {i+1}] {source['title']} ({source['domain']}):\n{chunk_data['text']}\n"
+        )
+    
+    return "\n---\n\n".join(context_parts), sources_map
+
+
+async def stream_web_query(question: str):
     """
-    Query the web using DuckDuckGo search with intelligent scraping.
-    Returns structured response with citations similar to Perplexity.
+    NDJSON event stream for /web-query?stream=true.
     
-    Features:
-    - Free web search via DuckDuckGo (no API key required)
-    - Reliable web scraping with quality filtering
-    - Semantic search for relevant content
-    - Structured citations with URLs
+    Events (one JSON object per line, each with t_ms since the request started):
+    - sources: source cards as soon as provider results arrive (status pending/ready)
+    - source_update: a pending source finished enhancing or timed out
+    - snippets: the relevance-ranked snippets the answer is based on
+    - token: a piece of the Markdown answer
+    - done: citations, stats and per-stage timings
+    - error: nothing usable was found, or the pipeline failed
     """
+    started = time.perf_counter()
+    timings = {}
+    
+    def elapsed_ms():
+        return round((time.perf_counter() - started) * 1000, 1)
+    
+    def event(payload):
+        return json.dumps({**payload, "t_ms": elapsed_ms()}, default=str) + "\n"
+    
     try:
-        # Step 1: Search web and extract content
-        web_data = await process_web_search(query=question, num_results=6)
+        web_data = None
+        events = search_events(question, num_results=6)
+        try:
+            async for item in events:
+                if item['type'] == 'result':
+                    web_data = item['result']
+                else:
+                    yield event(item)
+        finally:
+            await events.aclose()
+        timings.update({f"search.{k}": v for k, v in web_data.get('timings', {}).items()})
         
         if 'error' in web_data or not web_data['chunks']:
-            return {
-                "response": {
-                    "answer": "I couldn't find relevant information on the web for your query. This might be because:\n- The search didn't return accessible results\n- Websites blocked scraping\n- The query might be too specific or misspelled\n\nPlease try rephrasing your question.",
-                    "citations": []
-                },
-                "sources_used": 0,
-                "metadata": {
-                    "error": web_data.get('error', 'Unknown error')
-                }
-            }
+            yield event({"type": "error", "answer": NO_WEB_RESULTS_ANSWER, "error": web_data.get('error', 'Unknown error')})
+            return
         
-        # Step 2: Find most relevant chunks
         relevant_chunks = find_relevant_chunks(
             query=question,
             chunks=web_data['chunks'],
             sources=web_data['sources'],
-            embeddings=web_data['embeddings'],
-            k=8  # Get more chunks for better context
+            scorer=web_data['scorer'],
+            k=8
         )
-        
-        if not relevant_chunks:
-            return {
-                "response": {
-                    "answer": "No relevant information found in the scraped content.",
-                    "citations": []
-                },
-                "sources_used": 0
-            }
-        
-        # Step 3: Build context for LLM
-        context_parts = []
-        sources_map = {}
-        
-        for i, chunk_data in enumerate(relevant_chunks):
-            source = chunk_data['source']
-            url = source['url']
-            
-            # Track unique sources
-            if url not in sources_map:
-                snippet = source.get('snippet') or chunk_data['text'][:200]
-                sources_map[url] = {
-                    'url': url,
-                    'title': source['title'],
-                    'domain': source['domain'],
-                    'snippet': snippet
-                }
-            
-            # Add context with source reference
-            context_parts.append(
-                f"[Source {i+1}] {source['title']} ({source['domain']}):\n{chunk_data['text']}\n"
-            )
-        
-        context = "\n---\n\n".join(context_parts)
-        
-        # Step 4: Generate response with LLM
+        timings["rank"] = elapsed_ms()
+        yield event({
+            "type": "snippets",
+            "snippets": [
+                {"url": c['source']['url'], "title": c['source']['title'], "text": c['text'][:300],
+                 "similarity": c['similarity']}
+                for c in relevant_chunks
+            ]
+        })
+        
+        context, sources_map = build_web_context(relevant_chunks)
         prompt = f"""You are a helpful AI search assistant. Answer the user's question based on the web search results provided below.
 
 USER QUESTION:
@@ -384,122 +494,53 @@ WEB SEARCH RESULTS:
 INSTRUCTIONS:
 1. Provide a comprehensive, well-structured answer based on the search results
 2. Synthesize information from multiple sources when possible
-3. Be accurate and cite your sources naturally in the text
+3. Be accurate and cite your sources naturally in the text (e.g. "According to [source title]...")
 4. If the search results don't fully answer the question, acknowledge this
 5. Use clear, concise language
-6. Format your answer using Markdown syntax for better readability:
-   - Use **bold** for emphasis and key points
-   - Use *italic* for subtle emphasis
-   - Use bullet points (- or *) for lists
-   - Use numbered lists (1., 2., etc.) for ordered items
-   - Use code blocks (```language) for code snippets or technical examples
-   - Use `inline code` for technical terms, product names, or specific values
-   - Use ## for section headings to organize longer answers
-   - Use > for blockquotes when citing specific information
-   - Use tables when presenting structured data or comparisons
-   - Use horizontal rules (---) to separate major sections
 
-IMPORTANT: Return your answer in Markdown format. Make it well-structured, visually appealing, and easy to read.
-
-Return ONLY a JSON object with this EXACT structure:
-{{
-  "answer": "Your detailed markdown-formatted answer here. Reference sources like 'According to [source title]...' naturally in your text.",
-  "key_sources": [
-    {{"url": "https://example.com", "title": "Page Title", "relevance": "Brief note on what this source contributed"}}
-  ]
-}}"""
+Return ONLY the answer, formatted in Markdown."""
         
-        response = client.chat.completions.create(
+        # The Groq client is synchronous: open the stream and pull each chunk off the event loop
+        stream = await asyncio.to_thread(
+            client.chat.completions.create,
             model=LLM_MODEL,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3  # Lower temperature for more factual responses
+            temperature=0.3,
+            stream=True
         )
-        
-        raw_output = response.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        try:
-            # Remove markdown code blocks if present
-            if raw_output.startswith('```'):
-                raw_output = raw_output.split('```')[1]
-                if raw_output.startswith('json'):
-                    raw_output = raw_output[4:]
-                raw_output = raw_output.strip()
-            
-            data = json.loads(raw_output)
-        except json.JSONDecodeError as e:
-            print(f"JSON parse error: {e}\nRaw output: {raw_output}")
-            # Fallback: return raw text
-            return {
-                "response": {
-                    "answer": raw_output,
-                    "citations": list(sources_map.values())[:3]
-                },
-                "sources_used": len(sources_map),
-                "metadata": {
-                    "warning": "LLM returned non-JSON response"
-                }
-            }
-        
-        # Enrich citations
-        key_sources = data.get('key_sources', [])
-        enriched_citations = []
-        
-        for citation in key_sources[:5]:  # Limit to top 5 sources
-            url = citation.get('url', '')
-            if url in sources_map:
-                enriched_citations.append({
-                    **sources_map[url],
-                    'relevance': citation.get('relevance', '')
-                })
-        
-        # If no key sources, use top 3 from sources_map
-        if not enriched_citations:
-            enriched_citations = list(sources_map.values())[:3]
-        
-        return {
-            "response": {
-                "answer": data.get('answer', ''),
-                "citations": enriched_citations
-            },
+        chunks = iter(stream)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                if "first_token" not in timings:
+                    timings["first_token"] = elapsed_ms()
+                yield event({"type": "token", "text": text})
+        timings["answer"] = elapsed_ms()
+        
+        yield event({
+            "type": "done",
+            "citations": list(sources_map.values())[:5],
             "sources_used": len(sources_map),
             "chunks_analyzed": len(relevant_chunks),
             "metadata": {
                 "model": LLM_MODEL,
-                "search_engine": "DuckDuckGo",
-            }
-        }
-        try:
-            data = json.loads(raw_output)
-        except:
-            # Clean up markdown code blocks
-            cleaned = raw_output.replace("```json", "").replace("```", "").strip()
-            data = json.loads(cleaned)
-        
-        return {
-            "response": data,
-            "chunks_used": top_chunks,
-            "metadata": {
-                "model": LLM_MODEL,
-                "chunks_retrieved": len(top_chunks),
-                "document_specific": doc_id is not None
+                "search_method": web_data.get('search_method'),
+                "cache": web_data.get('cache'),
+                "dedup": web_data.get('dedup_stats'),
+                "timings": timings
             }
-        }
-        
+        })
+    
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating response: {str(e)}"
-        )
-
-
+        print(f"Web query stream error: {str(e)}")
+        yield event({"type": "error", "error": f"Error processing web query: {str(e)}"})
 
 
-
-        
-
 @app.post("/web-query")
-async def web_query(question: str, current_user: dict = Depends(get_current_user)):
+async def web_query(question: str, stream: bool = False, current_user: dict = Depends(get_current_user)):
     """
     Query the web using DuckDuckGo search with intelligent scraping.
     Returns structured response with citations similar to Perplexity.
@@ -509,7 +550,12 @@ async def web_query(question: str, current_user: dict = Depends(get_current_user
     - Reliable web scraping with quality filtering
     - Semantic search for relevant content
     - Structured citations with URLs
+    - stream=true: NDJSON progress events (sources, snippets, answer tokens)
+      instead of a single response, see stream_web_query
     """
+    if stream:
+        return StreamingResponse(stream_web_query(question), media_type="application/x-ndjson")
+    
     try:
         # Step 1: Search web and extract content
         web_data = await process_web_search(query=question, num_results=6)
@@ -517,7 +563,7 @@ async def web_query(question: str, current_user: dict = Depends(get_current_user
         if 'error' in web_data or not web_data['chunks']:
             return {
                 "response": {
-                    "answer": "I couldn't find relevant information on the web for your query. This might be because:\n- The search didn't return accessible results\n- Websites blocked scraping\n- The query might be too specific or misspelled\n\nPlease try rephrasing your question.",
+                    "answer": NO_WEB_RESULTS_ANSWER,
                     "citations": []
                 },
                 "sources_used": 0,
@@ -531,7 +577,7 @@ async def web_query(question: str, current_user: dict = Depends(get_current_user
             query=question,
             chunks=web_data['chunks'],
             sources=web_data['sources'],
-            embeddings=web_data['embeddings'],
+            scorer=web_data['scorer'],
             k=8  # Get more chunks for better context
         )
         
@@ -545,29 +591,7 @@ async def web_query(question: str, current_user: dict = Depends(get_current_user
             }
         
         # Step 3: Build context for LLM
-        context_parts = []
-        sources_map = {}
-        
-        for i, chunk_data in enumerate(relevant_chunks):
-            source = chunk_data['source']
-            url = source['url']
-            
-            # Track unique sources
-            if url not in sources_map:
-                snippet = source.get('snippet') or chunk_data['text'][:200]
-                sources_map[url] = {
-                    'url': url,
-                    'title': source['title'],
-                    'domain': source['domain'],
-                    'snippet': snippet
-                }
-            
-            # Add context with source reference
-            context_parts.append(
-                f"[Source {i+1}] {source['title']} ({source['domain']}):\n{chunk_data['text']}\n"
-            )
-        
-        context = "\n---\n\n".join(context_parts)
+        context, sources_map = build_web_context(relevant_chunks)
         
         # Step 4: Generate response with LLM
         prompt = f"""You are a helpful AI search assistant. Answer the user's question based on the web search results provided below.
@@ -665,7 +689,9 @@ Return ONLY a JSON object with this EXACT structure:
                 "model": LLM_MODEL,
                 "search_engine": "DuckDuckGo",
                 "total_sources_found": web_data.get('total_sources', 0),
-                "successful_crawls": web_data.get('successful_crawls', 0)
+                "successful_crawls": web_data.get('successful_crawls', 0),
+                "dedup": web_data.get('dedup_stats'),
+                "timings": web_data.get('timings')
             }
         }
         
@@ -676,13 +702,25 @@ Return ONLY a JSON object with this EXACT structure:
             detail=f"Error processing web query: {str(e)}"
         )
 
+@app.get("/web-search/stats")
+async def web_search_stats(current_user: dict = Depends(get_current_user)):
+    """Per-provider search latency histograms (used to pick the hedge delay) and cache counters"""
+    return {
+        "providers": get_provider_latency_stats(),
+        "provider_cache": provider_cache.get_stats(),
+        "page_cache": page_cache.get_stats(),
+        "web_index": web_index.get_stats()
+    }
+
 @app.post("/diagnose")
 async def diagnose(question: str, current_user: dict = Depends(get_current_user)):
     """
     Multi-Agent Diagnostic Endpoint.
     
     Orchestrates multiple specialized AI agents to provide a comprehensive diagnosis:
-    1. Intent Detection (Orchestrator)
+    1. Intent Detection (Orchestrator); when the local classifier is unsure,
+       retrieval/symptom extraction for the likeliest intents starts
+       speculatively during the LLM call
     2. Parallel Execution:
        - Symptom Extraction
        - Sensor Data Analysis (Real-time/Mock)
@@ -691,54 +729,134 @@ async def diagnose(question: str, current_user: dict = Depends(get_current_user)
     3. Synthesis (Master Agent)
     """
     try:
-        # Initialize Orchestrator
-        orchestrator = Orchestrator()
+        agents = agent_registry
+        orchestrator = agents.orchestrator
+        speculation = None
+        
+        # Step 1: Detect Intent (local classifier; the LLM only for low-confidence queries)
+        intent, confident, scores = orchestrator.classify_local(question)
+        if not confident:
+            # While the LLM decides, start the retrieval (and symptom extraction)
+            # the most likely intents will need
+            candidates = [label for label in sorted(scores, key=scores.get, reverse=True) if label != "other"]
+            speculation = SpeculativePrefetch(question, current_user["id"], agents.symptom_agent, agents.retrieval_agent)
+            speculation.start(candidates[:SPECULATIVE_INTENTS] or ["diagnostic", "compliance", "training"])
+            intent = await orchestrator.detect_intent_llm(question)
+        
+        def prefetched(name):
+            return speculation.take(name) if speculation else None
         
-        # Step 1: Detect Intent
-        intent = await orchestrator.detect_intent(question)
+        try:
+            if intent == "diagnostic":
+                # Step 2: Run Master Diagnostic Agent
+                diagnosis = await agents.master_agent.diagnose(
+                    question, current_user["id"],
+                    prefetched_symptoms=prefetched("symptoms"),
+                    prefetched_docs=prefetched("docs:diagnostic")
+                )
+                response = {
+                    "type": "diagnostic",
+                    "result": diagnosis
+                }
+                
+            elif intent == "compliance":
+                # Run Compliance Agent
+                report = await agents.compliance_agent.check_compliance(
+                    question, current_user["id"], prefetched_docs=prefetched("docs:compliance")
+                )
+                response = {
+                    "type": "compliance",
+                    "result": report
+                }
+                
+            elif intent == "training":
+                # Run Training Agent
+                module = await agents.training_agent.generate_training(
+                    question, current_user["id"], prefetched_docs=prefetched("docs:training")
+                )
+                response = {
+                    "type": "training",
+                    "result": module
+                }
+                
+            else:
+                # Fallback to standard RAG or generic response
+                response = {
+                    "type": "general",
+                    "message": "Query classified as general. Please use the standard query endpoint for general questions."
+                }
+        finally:
+            cancelled = speculation.cancel_unused() if speculation else []
         
-        if intent == "diagnostic":
-            # Step 2: Run Master Diagnostic Agent
-            master_agent = MasterAgent()
-            diagnosis = await master_agent.diagnose(question, current_user["id"])
-            
-            return {
-                "type": "diagnostic",
-                "result": diagnosis
-            }
-            
-        elif intent == "compliance":
-            # Run Compliance Agent
-            compliance_agent = ComplianceAgent()
-            report = await compliance_agent.check_compliance(question, current_user["id"])
-            
-            return {
-                "type": "compliance",
-                "result": report
-            }
-            
-        elif intent == "training":
-            # Run Training Agent
-            training_agent = TrainingAgent()
-            module = await training_agent.generate_training(question, current_user["id"])
-            
-            return {
-                "type": "training",
-                "result": module
-            }
-            
-        else:
-            # Fallback to standard RAG or generic response
-            return {
-                "type": "general",
-                "message": "Query classified as general. Please use the standard query endpoint for general questions."
-            }
+        response["metadata"] = {
+            "intent_source": "local" if confident else "llm",
+            "speculative_used": speculation.used if speculation else [],
+            "speculative_cancelled": cancelled
+        }
+        return response
             
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error in diagnostic process: {str(e)}"
         )
+
+
+async def stream_batch_diagnosis(equipment_ids: List[str], user_id: int, question: Optional[str]):
+    """
+    NDJSON event stream for /diagnose/batch.
+
+    Events (one JSON object per line, each with t_ms since the request started):
+    - evidence: bulk sensor/history/retrieval status and the L1Names each id resolved to
+    - machine: one machine's diagnosis (or status unknown_equipment), in completion order
+    - done: machine counts
+    - error: the batch failed
+    """
+    started = time.perf_counter()
+
+    def event(payload):
+        return json.dumps({**payload, "t_ms": round((time.perf_counter() - started) * 1000, 1)}, default=str) + "\n"
+
+    completed = 0
+    try:
+        results = agent_registry.master_agent.diagnose_batch(equipment_ids, user_id, question)
+        try:
+            async for item in results:
+                completed += item["type"] == "machine"
+                yield event(item)
+        finally:
+            await results.aclose()
+        yield event({"type": "done", "machines": len(equipment_ids), "completed": completed})
+    except Exception as e:
+        yield event({"type": "error", "error": str(e), "completed": completed})
+
+@app.post("/diagnose/batch")
+async def diagnose_batch(equipment_ids: List[str] = Query(...), question: Optional[str] = None,
+                         current_user: dict = Depends(get_current_user)):
+    """
+    Batch health check across many machines (e.g. a morning report for a line).
+
+    Sensor and alarm history are fetched for all machines with bulk $in queries,
+    document retrieval runs once for the batch, and per-machine synthesis is
+    limited to BATCH_LLM_CONCURRENCY concurrent LLM calls. Results stream as
+    NDJSON, one line per machine as it completes (see stream_batch_diagnosis).
+    """
+    equipment_ids = list(dict.fromkeys(e.strip() for e in equipment_ids if e.strip()))
+    if not equipment_ids:
+        raise HTTPException(status_code=400, detail="No equipment ids given")
+    if len(equipment_ids) > BATCH_MAX_MACHINES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_MACHINES} machines per batch")
+
+    return StreamingResponse(
+        stream_batch_diagnosis(equipment_ids, current_user["id"], question),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/diagnose/stats")
+async def diagnose_stats(current_user: dict = Depends(get_current_user)):
+    """Shared agent registry: client counts, Mongo connections, setup times and per-agent latency/timeout counters"""
+    return await agent_registry.get_stats()
+
 # ----- Chat History Endpoints -----
 
 @app.get("/history/sessions")
@@ -0,0 +1,158 @@
+"""
+Near-Duplicate Detection for Web Chunks
+=======================================
+
+Search results often include syndicated or mirrored copies of the same
+article. MinHash signatures over word shingles estimate the Jaccard
+similarity of two chunks, and LSH banding limits the comparisons to chunks
+that share at least one band, so duplicates can be dropped before they are
+embedded and sent to the LLM.
+
+Chunks are processed in order and the first occurrence wins, so the copy
+from the best-ranked search result is the one that is kept.
+"""
+
+import logging
+import re
+import zlib
+from typing import List, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ----- Configuration -----
+NEAR_DUP_THRESHOLD = 0.8     # Estimated Jaccard similarity above which a chunk is a duplicate
+NUM_PERMUTATIONS = 128       # MinHash signature length
+LSH_BANDS = 32               # NUM_PERMUTATIONS / LSH_BANDS rows per band
+SHINGLE_SIZE = 5             # Words per shingle
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE = re.compile(r'\w+')
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+class MinHashDeduplicator:
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_perm: int = NUM_PERMUTATIONS,
+                 bands: int = LSH_BANDS, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        """32-bit hashes of the word shingles of a text."""
+        words = _WORD_RE.findall(text.lower())
+        if not words:
+            return np.zeros(1, dtype=np.uint64)
+        if len(words) < self.shingle_size:
+            return np.array([zlib.crc32(' '.join(words).encode('utf-8'))], dtype=np.uint64)
+
+        shingles = {' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature: minimum of every permutation (a*h + b mod p) over the shingle hashes."""
+        hashes = self._shingle_hashes(text)
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=1)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.num_perm), dtype=np.uint64)
+        return np.stack([self.signature(t) for t in texts])
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def deduplicate(self, texts: List[str],
+                    reference_texts: Optional[List[str]] = None) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """
+        Find near-duplicates among texts, in order.
+
+        Args:
+            texts: Candidate chunks; earlier ones win
+            reference_texts: Chunks that are already kept elsewhere (e.g. the
+                web knowledge index); a candidate matching one of them is dropped
+
+        Returns:
+            (indices of texts to keep, duplicates) where every duplicate is a
+            dict with index, matched ('text' or 'reference'), matched_index and
+            similarity
+        """
+        reference_texts = reference_texts or []
+        all_signatures = self.signatures(list(reference_texts) + list(texts))
+        n_ref = len(reference_texts)
+
+        buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        keep, duplicates = [], []
+
+        for row, signature in enumerate(all_signatures):
+            keys = self._band_keys(signature)
+            candidates = {other for band, key in enumerate(keys) for other in buckets.get((band, key), ())}
+
+            match, best = None, 0.0
+            for other in candidates:
+                similarity = float(np.mean(all_signatures[other] == signature))
+                if similarity >= self.threshold and similarity > best:
+                    match, best = other, similarity
+
+            if row >= n_ref and match is not None:
+                duplicates.append({
+                    'index': row - n_ref,
+                    'matched': 'reference' if match < n_ref else 'text',
+                    'matched_index': match if match < n_ref else match - n_ref,
+                    'similarity': best
+                })
+                continue
+
+            if row >= n_ref:
+                keep.append(row - n_ref)
+            for band, key in enumerate(keys):
+                buckets.setdefault((band, key), []).append(row)
+
+        return keep, duplicates
+
+
+_deduplicator = MinHashDeduplicator()
+
+
+def dedupe_chunks(chunks: List[str], sources: List[Dict[str, Any]],
+                  reference_texts: Optional[List[str]] = None) -> Tuple[List[str], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Drop near-duplicate chunks (and their sources) before embedding.
+
+    Returns:
+        (chunks, sources, stats) with chunks_in/chunks_out, duplicates dropped
+        within the query and against the reference set, and chunks/tokens saved
+    """
+    keep, duplicates = _deduplicator.deduplicate(chunks, reference_texts)
+
+    kept_chunks = [chunks[i] for i in keep]
+    kept_sources = [sources[i] for i in keep]
+    dropped = [chunks[d['index']] for d in duplicates]
+
+    stats = {
+        'chunks_in': len(chunks),
+        'chunks_out': len(kept_chunks),
+        'duplicates_in_query': sum(1 for d in duplicates if d['matched'] == 'text'),
+        'duplicates_of_index': sum(1 for d in duplicates if d['matched'] == 'reference'),
+        'chunks_saved': len(dropped),
+        'tokens_saved_est': sum(_estimate_tokens(t) for t in dropped)
+    }
+    if dropped:
+        logger.info(f"🧬 Dropped {len(dropped)} near-duplicate chunks (~{stats['tokens_saved_est']} tokens)")
+
+    return kept_chunks, kept_sources, stats
@@ -0,0 +1,118 @@
+import sqlite3
+import zlib
+from typing import List, Dict, Any
+
+DB_PATH = "parent_chunks.db"
+
+class ParentChunkStore:
+    """
+    Compact on-disk store for parent chunk text.
+
+    Only the small child chunks live in the vector index; the larger parent
+    chunks they expand to at answer time are kept here, zlib-compressed and
+    keyed by parent id.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._init_db()
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS parent_chunks (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                chunk_index INTEGER,
+                page INTEGER,
+                section TEXT,
+                text BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_parent_chunks_doc ON parent_chunks (doc_id)')
+
+        conn.commit()
+        conn.close()
+
+    def add_parents(self, parents: List[Dict[str, Any]]):
+        """Insert or replace parent chunks (dicts with id, user_id, doc_id, chunk_index, page, section, text)."""
+        if not parents:
+            return
+
+        rows = [
+            (
+                p["id"],
+                str(p["user_id"]),
+                str(p["doc_id"]),
+                p.get("chunk_index", 0),
+                p.get("page", 0),
+                p.get("section", ""),
+                zlib.compress(p["text"].encode("utf-8")),
+            )
+            for p in parents
+        ]
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT OR REPLACE INTO parent_chunks (id, user_id, doc_id, chunk_index, page, section, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        conn.close()
+
+    def get_parents(self, parent_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch parent chunks by id. Unknown ids are simply missing from the result."""
+        if not parent_ids:
+            return {}
+
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        placeholders = ",".join("?" for _ in parent_ids)
+        cursor.execute(
+            f"SELECT id, doc_id, chunk_index, page, section, text FROM parent_chunks WHERE id IN ({placeholders})",
+            list(parent_ids)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        return {row[0]: self._row_to_dict(row) for row in rows}
+
+    def get_document_parents(self, doc_id) -> List[Dict[str, Any]]:
+        """All parent chunks of a document, in document order."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, doc_id, chunk_index, page, section, text FROM parent_chunks "
+            "WHERE doc_id = ? ORDER BY chunk_index ASC",
+            (str(doc_id),)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [self._row_to_dict(row) for row in rows]
+
+    def delete_document(self, doc_id):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM parent_chunks WHERE doc_id = ?", (str(doc_id),))
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "doc_id": row[1],
+            "chunk_index": row[2],
+            "page": row[3],
+            "section": row[4] or "",
+            "text": zlib.decompress(row[5]).decode("utf-8"),
+        }
@@ -25,9 +25,13 @@ from sentence_transformers import SentenceTransformer
 from transformers import AutoTokenizer
 import logging
 import re
-from typing import List, Dict, Any
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from pdf2image import convert_from_path
 
+from parent_store import ParentChunkStore
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,6 +42,19 @@ MAX_CHUNK_TOKENS = 512
 FALLBACK_CHUNK_SIZE = 800
 FALLBACK_OVERLAP = 100
 
+# Parent-child index: small child chunks are embedded and searched,
+# their parent chunk is returned to the LLM
+CHILD_SENTENCES = 3
+CHILD_MAX_CHARS = 400
+CHILD_OVERFETCH = 4  # Children fetched per requested parent
+
+# Maximal-marginal-relevance diversification
+MMR_LAMBDA = 0.5     # 1.0 = pure relevance, 0.0 = pure diversity
+MMR_FETCH_K = 40     # Candidates fetched before diversifying
+
+# Multi-document retrieval
+MAX_PARALLEL_DOC_SEARCHES = 4
+
 # ----- Embedding Model -----
 embed_model = SentenceTransformer(EMBED_MODEL_ID)
 
@@ -54,6 +71,9 @@ collection = chroma_client.get_or_create_collection(
     metadata={"hnsw:space": "cosine"}
 )
 
+# ----- Parent Chunk Store -----
+parent_store = ParentChunkStore()
+
 # ----- Document Converter Setup -----
 def get_document_converter() -> DocumentConverter:
     """
@@ -256,6 +276,44 @@ def fallback_text_chunking(text: str, chunk_size: int = FALLBACK_CHUNK_SIZE,
     
     return chunks
 
+# ----- Child Chunking -----
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])|\n+')
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences (and lines, which covers lists and headings)."""
+    if not text:
+        return []
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s and s.strip()]
+
+def build_child_chunks(text: str, max_sentences: int = CHILD_SENTENCES,
+                       max_chars: int = CHILD_MAX_CHARS) -> List[str]:
+    """
+    Split a parent chunk into small sentence groups for precise retrieval.
+    
+    Groups close when they reach max_sentences or max_chars, whichever comes first.
+    """
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    
+    children = []
+    current = []
+    current_length = 0
+    
+    for sentence in sentences:
+        if current and (len(current) >= max_sentences or current_length + len(sentence) > max_chars):
+            children.append(' '.join(current))
+            current = []
+            current_length = 0
+        current.append(sentence)
+        current_length += len(sentence) + 1
+    
+    if current:
+        children.append(' '.join(current))
+    
+    return children
+
 # ----- Main Processing Function -----
 
 def process_document(file_path: str, filename: str, user_id: str, doc_id: str) -> Dict[str, Any]:
@@ -325,12 +383,13 @@ def process_document(file_path: str, filename: str, user_id: str, doc_id: str) -
                 }
             
             # Store fallback chunks
-            store_fallback_chunks(text_chunks, user_id, doc_id, filename)
+            child_count = store_fallback_chunks(text_chunks, user_id, doc_id, filename)
             
             return {
                 "filename": filename,
                 "doc_id": doc_id,
                 "total_chunks": len(text_chunks),
+                "child_chunks": child_count,
                 "format": result.input.format.name if hasattr(result.input, 'format') else "unknown",
                 "chunking_method": "fallback",
                 "text_length": len(full_text),
@@ -338,12 +397,13 @@ def process_document(file_path: str, filename: str, user_id: str, doc_id: str) -
             }
         
         # Step 5: Store HybridChunker chunks with rich metadata
-        store_chunks_with_metadata(chunks, user_id, doc_id, filename)
+        child_count = store_chunks_with_metadata(chunks, user_id, doc_id, filename)
         
         return {
             "filename": filename,
             "doc_id": doc_id,
             "total_chunks": len(chunks),
+            "child_chunks": child_count,
             "format": result.input.format.name if hasattr(result.input, 'format') else "unknown",
             "chunking_method": "hybrid",
             "text_length": len(full_text),
@@ -364,8 +424,70 @@ def process_document(file_path: str, filename: str, user_id: str, doc_id: str) -
 
 # ----- Storage Functions -----
 
-def store_fallback_chunks(text_chunks: List[str], user_id: str, doc_id: str, filename: str):
-    """Store fallback text chunks with basic metadata."""
+def index_parent_chunks(ids: List[str], docs: List[str], metadata_list: List[Dict[str, Any]]) -> int:
+    """
+    Store parent chunks on disk and index their child chunks in ChromaDB.
+    
+    Each child carries its parent's metadata plus the parent id, so a child hit
+    can be expanded to the full parent text at answer time.
+    
+    Returns:
+        Number of child chunks indexed
+    """
+    child_ids = []
+    child_docs = []
+    child_metadata = []
+    parents = []
+    
+    for parent_id, parent_text, meta in zip(ids, docs, metadata_list):
+        parents.append({
+            "id": parent_id,
+            "user_id": meta["user_id"],
+            "doc_id": meta["doc_id"],
+            "chunk_index": meta.get("chunk_index", 0),
+            "page": meta.get("page", 0),
+            "section": meta.get("section", ""),
+            "text": parent_text
+        })
+        
+        children = build_child_chunks(parent_text) or [parent_text]
+        for child_idx, child_text in enumerate(children):
+            child_ids.append(f"{parent_id}_child_{child_idx}")
+            child_docs.append(child_text)
+            child_metadata.append({**meta, "parent_id": parent_id, "child_index": child_idx})
+    
+    # Children first, in batches Chroma accepts; parents only once every child is stored,
+    # so a failure leaves neither orphan parents nor half a document in the index
+    # (until then a child hit simply falls back to its own text)
+    added = []
+    try:
+        embeddings = embed(child_docs)
+        
+        batch_size = chroma_client.get_max_batch_size()
+        for start in range(0, len(child_ids), batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=child_ids[start:end],
+                documents=child_docs[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=child_metadata[start:end]
+            )
+            added.extend(child_ids[start:end])
+        
+        parent_store.add_parents(parents)
+    except Exception as e:
+        logger.error(f"ChromaDB storage error: {str(e)}", exc_info=True)
+        if added:
+            try:
+                collection.delete(ids=added)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove {len(added)} partially indexed child chunks: {cleanup_error}")
+        raise
+    
+    return len(child_docs)
+
+def store_fallback_chunks(text_chunks: List[str], user_id: str, doc_id: str, filename: str) -> int:
+    """Store fallback text chunks with basic metadata. Returns the number of child chunks indexed."""
     ids = []
     docs = []
     metadata_list = []
@@ -394,25 +516,14 @@ def store_fallback_chunks(text_chunks: List[str], user_id: str, doc_id: str, fil
     
     if not docs:
         logger.warning(f"No valid fallback chunks for {filename}")
-        return
+        return 0
     
-    try:
-        embeddings = embed(docs)
-        
-        collection.add(
-            ids=ids,
-            documents=docs,
-            embeddings=embeddings,
-            metadatas=metadata_list
-        )
-        
-        logger.info(f"✅ Stored {len(docs)} fallback chunks in ChromaDB")
-    except Exception as e:
-        logger.error(f"ChromaDB storage error: {str(e)}", exc_info=True)
-        raise
+    child_count = index_parent_chunks(ids, docs, metadata_list)
+    logger.info(f"✅ Stored {len(docs)} fallback chunks ({child_count} child chunks) in ChromaDB")
+    return child_count
 
-def store_chunks_with_metadata(chunks, user_id: str, doc_id: str, filename: str):
-    """Store HybridChunker chunks with rich metadata."""
+def store_chunks_with_metadata(chunks, user_id: str, doc_id: str, filename: str) -> int:
+    """Store HybridChunker chunks with rich metadata. Returns the number of child chunks indexed."""
     ids = []
     docs = []
     metadata_list = []
@@ -478,34 +589,72 @@ def store_chunks_with_metadata(chunks, user_id: str, doc_id: str, filename: str)
     
     if not docs:
         logger.warning(f"No valid chunks with metadata for {filename}")
-        return
+        return 0
     
-    try:
-        embeddings = embed(docs)
-        
-        collection.add(
-            ids=ids,
-            documents=docs,
-            embeddings=embeddings,
-            metadatas=metadata_list
-        )
-        
-        logger.info(f"✅ Stored {len(docs)} hybrid chunks in ChromaDB")
-    except Exception as e:
-        logger.error(f"ChromaDB storage error: {str(e)}", exc_info=True)
-        raise
+    child_count = index_parent_chunks(ids, docs, metadata_list)
+    logger.info(f"✅ Stored {len(docs)} hybrid chunks ({child_count} child chunks) in ChromaDB")
+    return child_count
 
 # ----- Search Function -----
 
-def search_chunks(query: str, user_id: str, doc_id: str = None, k: int = 5) -> List[Dict[str, Any]]:
+def mmr_select(query_embedding, candidate_embeddings, k: int,
+               lambda_mult: float = MMR_LAMBDA) -> List[int]:
+    """
+    Select k diverse candidates with maximal marginal relevance.
+    
+    Similarities are computed once as two matrix products; each selection step
+    only updates the running max-similarity vector, so ~100 candidates take
+    well under a millisecond.
+    
+    Returns:
+        Indices into candidate_embeddings, in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or k <= 0:
+        return []
+    
+    query = np.asarray(query_embedding, dtype=np.float32).ravel()
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    
+    relevance = candidates @ query
+    pairwise = candidates @ candidates.T
+    
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    max_similarity = pairwise[selected[0]].copy()
+    
+    for _ in range(1, k):
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        idx = int(np.argmax(scores))
+        selected.append(idx)
+        np.maximum(max_similarity, pairwise[idx], out=max_similarity)
+    
+    return selected
+
+def search_chunks(query: str, user_id: str, doc_id: str = None, k: int = 5,
+                  expand_parents: bool = True, diversify: bool = False,
+                  mmr_lambda: float = MMR_LAMBDA, fetch_k: int = MMR_FETCH_K,
+                  query_embedding: Optional[List[List[float]]] = None) -> List[Dict[str, Any]]:
     """
     Search for relevant chunks with optional document filtering.
     
+    Small child chunks are matched against the query; each hit is then expanded
+    to its parent chunk so the LLM gets coherent context. Several children of
+    the same parent collapse into a single result.
+    
     Args:
         query: Search query
         user_id: User ID for filtering
         doc_id: Optional document ID for filtering
         k: Number of results to return
+        expand_parents: Return parent text instead of the matched child text
+        diversify: Re-rank an over-fetched candidate set with MMR so that
+            near-duplicate chunks (e.g. repeated warning boxes) are not all returned
+        mmr_lambda: Relevance/diversity trade-off used when diversify is set
+        fetch_k: Number of candidates fetched when diversify is set
+        query_embedding: Precomputed query embedding (skips re-embedding the query)
     
     Returns:
         List of relevant chunks with metadata
@@ -513,7 +662,8 @@ def search_chunks(query: str, user_id: str, doc_id: str = None, k: int = 5) -> L
     if not query.strip():
         return []
     
-    query_embedding = embed([query])
+    if query_embedding is None:
+        query_embedding = embed([query])
     
     # Build filter
     if doc_id:
@@ -526,24 +676,59 @@ def search_chunks(query: str, user_id: str, doc_id: str = None, k: int = 5) -> L
     else:
         where_clause = {"user_id": user_id}
     
+    include = ["documents", "metadatas"]
+    n_results = k * CHILD_OVERFETCH
+    if diversify:
+        include.append("embeddings")
+        n_results = max(n_results, fetch_k)
+    
     try:
         results = collection.query(
             query_embeddings=query_embedding,
-            n_results=k,
-            where=where_clause
+            n_results=n_results,
+            where=where_clause,
+            include=include
         )
         
-        chunks = []
+        # Collapse child hits onto their parents, keeping rank order
+        hits = []
+        seen_parents = set()
         if results["documents"] and results["metadatas"]:
-            for text, meta in zip(results["documents"][0], results["metadatas"][0]):
-                chunk_info = {
-                    "text": text,
-                    "page": meta.get("page", "N/A"),
-                    "section": meta.get("section", ""),
-                    "content_types": meta.get("content_types", ""),
-                    "filename": meta.get("filename", ""),
-                }
-                chunks.append(chunk_info)
+            embeddings = results.get("embeddings")
+            embeddings = embeddings[0] if embeddings is not None else None
+            
+            for idx, (text, meta) in enumerate(zip(results["documents"][0], results["metadatas"][0])):
+                parent_id = meta.get("parent_id")
+                if parent_id:
+                    if parent_id in seen_parents:
+                        continue
+                    seen_parents.add(parent_id)
+                hits.append((text, meta, embeddings[idx] if embeddings is not None else None))
+                if not diversify and len(hits) >= k:
+                    break
+        
+        if diversify and len(hits) > k:
+            order = mmr_select(query_embedding[0], [h[2] for h in hits], k, mmr_lambda)
+            hits = [hits[i] for i in order]
+        hits = hits[:k]
+        
+        parents = {}
+        if expand_parents:
+            parents = parent_store.get_parents([meta["parent_id"] for _, meta, _ in hits if meta.get("parent_id")])
+        
+        chunks = []
+        for text, meta, _ in hits:
+            parent = parents.get(meta.get("parent_id"))
+            chunk_info = {
+                "text": parent["text"] if parent else text,
+                "matched_text": text,
+                "page": meta.get("page", "N/A"),
+                "section": meta.get("section", ""),
+                "content_types": meta.get("content_types", ""),
+                "filename": meta.get("filename", ""),
+                "doc_id": meta.get("doc_id"),
+            }
+            chunks.append(chunk_info)
         
         logger.info(f"Found {len(chunks)} relevant chunks for query")
         return chunks
@@ -552,6 +737,53 @@ def search_chunks(query: str, user_id: str, doc_id: str = None, k: int = 5) -> L
         logger.error(f"Search error: {str(e)}", exc_info=True)
         return []
 
+_search_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOC_SEARCHES, thread_name_prefix="doc-search")
+
+def search_chunks_multi(query: str, user_id: str, doc_ids: List, k: int = 5,
+                        **search_kwargs) -> List[Dict[str, Any]]:
+    """
+    Search several documents concurrently and merge with a fair per-document quota.
+    
+    The query is embedded once and each document is searched on its own, so a
+    single long manual cannot crowd the others out. Results are interleaved
+    rank by rank (best of each document first, then second best, ...) until k
+    chunks are collected; documents with few hits leave their share to the rest.
+    
+    Args:
+        query: Search query
+        user_id: User ID for filtering
+        doc_ids: Documents to search
+        k: Total number of results to return
+        **search_kwargs: Passed through to search_chunks (e.g. diversify)
+    
+    Returns:
+        List of relevant chunks with metadata
+    """
+    if not query.strip() or not doc_ids:
+        return []
+    
+    query_embedding = embed([query])
+    
+    futures = [
+        _search_executor.submit(
+            search_chunks, query, user_id, doc_id, k,
+            query_embedding=query_embedding, **search_kwargs
+        )
+        for doc_id in doc_ids
+    ]
+    per_doc_results = [future.result() for future in futures]
+    
+    merged = []
+    for rank in range(k):
+        for results in per_doc_results:
+            if rank < len(results):
+                merged.append(results[rank])
+        if len(merged) >= k:
+            break
+    
+    logger.info(f"Merged {len(merged[:k])} chunks from {len(doc_ids)} documents")
+    return merged[:k]
+
 # ----- Utility Functions -----
 
 def detect_format(filename: str) -> str:
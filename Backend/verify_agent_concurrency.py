@@ -0,0 +1,103 @@
+import sys
+import os
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import master_agent, symptom_agent, retrieval_agent
+from agents.master_agent import MasterAgent
+from agents.symptom_agent import SymptomAgent
+from agents.retrieval_agent import RetrievalAgent
+
+# Simulated latencies (seconds) of the blocking calls inside the agents
+LLM_LATENCY = 1.0        # Sync Groq call (symptom extraction, synthesis)
+SEARCH_LATENCY = 0.6     # Sync search_chunks (encode + Chroma query)
+MONGO_LATENCY = 0.4      # Async Motor queries (sensor, history)
+
+
+class BlockingLLM:
+    """Stand-in for the sync Groq client: blocks its thread like a real HTTP call."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        time.sleep(LLM_LATENCY)
+        content = json.dumps({"symptom": "noise", "equipment": "pump", "likely_causes": [], "confidence": 0.5})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def blocking_search_chunks(**kwargs):
+    time.sleep(SEARCH_LATENCY)
+    return [{"text": "Check the impeller for wear.", "page": 3}]
+
+
+class FakeSensorAgent:
+    async def get_sensor_data(self, equipment_id):
+        await asyncio.sleep(MONGO_LATENCY)
+        return {"equipment_id": equipment_id, "readings": {}}
+
+
+class FakeHistoryAgent:
+    async def check_history(self, symptoms, equipment):
+        await asyncio.sleep(MONGO_LATENCY)
+        return {"equipment": equipment, "frequent_issues": []}
+
+
+async def inline(fn, *args, **kwargs):
+    """What the agents did before: call the blocking function on the event loop."""
+    return fn(*args, **kwargs)
+
+
+async def run_fan_out(label: str):
+    llm = BlockingLLM()
+    agent = MasterAgent(
+        client=llm,
+        symptom_agent=SymptomAgent(client=llm),
+        sensor_agent=FakeSensorAgent(),
+        retrieval_agent=RetrievalAgent(),
+        history_agent=FakeHistoryAgent(),
+    )
+
+    started = time.perf_counter()
+    evidence = await agent._gather_evidence({
+        "symptoms": asyncio.create_task(agent.symptom_agent.extract_symptoms("pump makes a grinding noise")),
+        "sensor": asyncio.create_task(agent.sensor_agent.get_sensor_data("pump")),
+        "retrieval": asyncio.create_task(agent.retrieval_agent.retrieve_docs("pump makes a grinding noise", 1)),
+        "history": asyncio.create_task(agent.history_agent.check_history([], "pump")),
+    })
+    wall = time.perf_counter() - started
+
+    slowest = max(LLM_LATENCY, SEARCH_LATENCY, MONGO_LATENCY)
+    total = LLM_LATENCY + SEARCH_LATENCY + 2 * MONGO_LATENCY
+    print(f"{label:<28} wall {wall:5.2f}s   slowest agent {slowest:.2f}s   sum of agents {total:.2f}s   "
+          f"statuses {[e['status'] for e in evidence.values()]}")
+    return wall, slowest
+
+
+async def test():
+    # Before: blocking calls run on the event loop, so the agents serialize
+    originals = (symptom_agent.run_llm, retrieval_agent.run_cpu)
+    symptom_agent.run_llm, retrieval_agent.run_cpu = inline, inline
+    await run_fan_out("blocking calls on the loop")
+    symptom_agent.run_llm, retrieval_agent.run_cpu = originals
+
+    # After: blocking calls go to the agent executors
+    wall, slowest = await run_fan_out("agent executors")
+
+    if wall < slowest * 1.25:
+        print("Verification successful: fan-out wall time tracks the slowest agent.")
+    else:
+        print("Verification FAILED: agents are still running one after another.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    retrieval_agent.search_chunks = blocking_search_chunks
+    master_agent.AGENT_BUDGETS.update({name: 10.0 for name in master_agent.AGENT_BUDGETS})
+    asyncio.run(test())
@@ -0,0 +1,182 @@
+import sys
+import os
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.equipment_catalog import EquipmentCatalog, ensure_index
+from agents.history_agent import HistoryAgent
+from agents import alarm_stats
+from agents.alarm_stats import AlarmStats, ALARM_COLLECTION, ALARM_POLL_INDEX
+from pymongo.errors import AutoReconnect
+
+# Usage:
+#   python Backend/verify_alarm_stats.py              -> scratch db on MONGO_URI (local mongod)
+#   python Backend/verify_alarm_stats.py --mongomock  -> in-memory
+SCRATCH_DB = os.getenv("VERIFY_DB", "verify_alarm_stats")
+MACHINES = 40
+ALARMS = 40_000
+READ_RUNS = 20
+
+
+def seed_alarms(start, count):
+    rng = random.Random(0)
+    return [
+        {
+            "L1Name": f"H_OP{100 + rng.randrange(MACHINES)}",
+            "signalname": f"ALM{rng.choice([1, 1, 1, 2, 2, 3, 4, 5, 6])}",
+            "updatedate": start + timedelta(minutes=rng.randrange(60 * 24 * 90)),
+        }
+        for _ in range(count)
+    ]
+
+
+class FlakyIndexDB:
+    """Database whose first index_information() call fails, like a Mongo blip at startup."""
+
+    def __init__(self, db):
+        self.db = db
+        self.failures = 1
+
+    def __getitem__(self, name):
+        outer, collection = self, self.db[name]
+
+        class Collection:
+            def __getattr__(self, attr):
+                return getattr(collection, attr)
+
+            async def index_information(self):
+                if outer.failures:
+                    outer.failures -= 1
+                    raise AutoReconnect("connection refused")
+                return await collection.index_information()
+        return Collection()
+
+
+async def wait_until(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    return condition()
+
+
+def comparable(history):
+    return [(i["issue"], i["frequency"], i["last_seen"]) for i in history["frequent_issues"]]
+
+
+async def average_ms(agent, equipment, runs=READ_RUNS):
+    started = time.perf_counter()
+    for _ in range(runs):
+        result = await agent.check_history([], equipment)
+    return (time.perf_counter() - started) * 1000 / runs, result
+
+
+async def test(use_mongomock: bool):
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+
+    db = client[SCRATCH_DB]
+    start = datetime(2025, 4, 1)
+    await db["Alarm History"].delete_many({})
+    # mongomock aggregates in pure Python, so keep its data set small
+    await db["Alarm History"].insert_many(seed_alarms(start, ALARMS // 10 if use_mongomock else ALARMS))
+
+    catalog = EquipmentCatalog(db)
+    stats = AlarmStats(db, refresh_interval=3600)
+    direct = HistoryAgent(mongo_client=client, catalog=catalog)
+    materialized = HistoryAgent(mongo_client=client, catalog=catalog, alarm_stats=stats)
+    direct.db = materialized.db = db
+
+    checks = {}
+    try:
+        await catalog.refresh()
+
+        # Without the updatedate index the summary refuses to prime or poll; aggregation serves reads.
+        # start() returns at once and the background task rechecks until the index exists.
+        alarm_stats.ALARM_STATS_REPRIME_SECONDS = 0.1
+        await db[ALARM_COLLECTION].drop_indexes()
+        unindexed = AlarmStats(db, refresh_interval=3600)
+        start_started = time.perf_counter()
+        await unindexed.start()
+        checks["start does not block"] = (time.perf_counter() - start_started) * 1000 < 50
+        await asyncio.sleep(0.2)
+        checks["no poll index disables the summary"] = (
+            unindexed.disabled_reason is not None and not unindexed.primed and not unindexed.is_fresh()
+        )
+        print(f"  disabled: {unindexed.disabled_reason}")
+
+        # An unprimed summary never polls from an empty high-water mark (a full collection read)
+        await stats.poll_once()
+        checks["unprimed poll reads nothing"] = stats.stats["alarms_applied"] == 0 and not stats.is_fresh()
+
+        await ensure_index(db[ALARM_COLLECTION], ALARM_POLL_INDEX, create=True)
+        checks["summary recovers once the index exists"] = await wait_until(unindexed.is_fresh)
+        unindexed.stop()
+
+        # A failed index check is retried, not treated as a missing index for good
+        flaky = AlarmStats(FlakyIndexDB(db), refresh_interval=3600)
+        await flaky.start()
+        checks["transient index check failure retried"] = (
+            await wait_until(flaky.is_fresh) and flaky.stats["sync_errors"] == 1
+        )
+        flaky.stop()
+
+        prime_started = time.perf_counter()
+        await stats.prime()
+        print(f"Prime (one-off): {(time.perf_counter() - prime_started) * 1000:8.1f} ms")
+
+        direct_ms, direct_result = await average_ms(direct, "H_OP120")
+        stats_ms, stats_result = await average_ms(materialized, "H_OP120")
+        print(f"Aggregation    : {direct_ms:8.3f} ms/call")
+        print(f"Materialized   : {stats_ms:8.3f} ms/call   ({direct_ms / max(stats_ms, 1e-6):.0f}x)")
+        checks["same top alarms as aggregation"] = comparable(stats_result) == comparable(direct_result)
+        checks["served from summary"] = stats_result["source"] == "materialized"
+        checks["recent counts and trend present"] = all(
+            "last_7d" in i and len(i["daily_trend"]) == 7 for i in stats_result["frequent_issues"]
+        )
+
+        # New alarms, including one tied with the high-water mark, are counted exactly once
+        tied = {"L1Name": "H_OP120", "signalname": "ALM9", "updatedate": stats.high_water}
+        newer = [{"L1Name": "H_OP120", "signalname": "ALM9", "updatedate": stats.high_water + timedelta(minutes=m)}
+                 for m in range(1, 4)]
+        await db["Alarm History"].insert_many([tied] + newer)
+        await stats.poll_once()
+        await stats.poll_once()
+        _, issues = stats.top_alarms(["H_OP120"], limit=10)
+        alm9 = next((i for i in issues if i["issue"] == "ALM9"), None)
+        checks["incremental poll counts new alarms once"] = alm9 is not None and alm9["frequency"] == 4
+        direct_all = await direct.db["Alarm History"].count_documents({"L1Name": "H_OP120"})
+        checks["totals match collection"] = sum(i["frequency"] for i in issues) == direct_all
+
+        # Stale summary falls back to the aggregation
+        stats.synced_at = time.time() - stats.max_staleness - 1
+        fallback = await materialized.check_history([], "H_OP120")
+        checks["stale summary falls back to aggregation"] = fallback["source"] == "aggregation"
+    finally:
+        stats.stop()
+        if not use_mongomock:
+            await client.drop_database(SCRATCH_DB)
+        client.close()
+
+    for label, ok in checks.items():
+        print(f"  {'✅' if ok else '❌'} {label}")
+    print(f"  alarm stats: {stats.get_stats()}")
+
+    if checks and all(checks.values()):
+        print("Verification successful: alarm history served from the materialized summary.")
+    else:
+        print("Verification FAILED.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(test("--mongomock" in sys.argv))
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from doc_summaries import classify_summary_question, answer_from_summaries, MAX_SUMMARY_CITATIONS
+
+# Usage: python Backend/verify_doc_summaries.py   (no LLM or database needed)
+
+# Document-level questions: answered from the precomputed outline/summary
+ROUTED = {
+    "summarize": "summary",
+    "Summarize.": "summary",
+    "summary of this document": "summary",
+    "Give me a brief summary of the manual?": "summary",
+    "can you summarize these documents please": "summary",
+    "tl;dr": "summary",
+    "what is this manual about?": "summary",
+    "outline": "outline",
+    "Show me the outline of this manual": "outline",
+    "table of contents": "outline",
+    "what sections does this manual have?": "outline",
+    "which chapters are in the document": "outline",
+    "what topics does this document cover": "outline",
+    "what's the structure of this manual": "outline",
+}
+
+# Scoped questions: must go through normal retrieval
+NOT_ROUTED = [
+    "summarize the lubrication procedure for the spindle",
+    "give me an overview of alarm codes",
+    "summary of spindle maintenance",
+    "what is the gist of section 4",
+    "how do I reset the overview screen",
+    "Which sections cover spindle lubrication?",
+    "Show the structure of the hydraulic circuit",
+    "What topics does alarm 414 troubleshooting relate to?",
+    "outline the steps to replace the drive belt",
+    "list the chapters about safety",
+]
+
+
+def test():
+    failures = []
+    for question, kind in ROUTED.items():
+        if classify_summary_question(question) != kind:
+            failures.append(f"{question!r} -> {classify_summary_question(question)}, expected {kind}")
+    for question in NOT_ROUTED:
+        if classify_summary_question(question) is not None:
+            failures.append(f"{question!r} -> {classify_summary_question(question)}, expected retrieval")
+
+    records = [
+        {"doc_id": str(d), "summary": "...", "outline": [{"title": f"Section {i}", "summary": ""} for i in range(30)]}
+        for d in range(3)
+    ]
+    citations = answer_from_summaries("summary", records, {})["citations"]
+    if not 0 < len(citations) <= MAX_SUMMARY_CITATIONS:
+        failures.append(f"{len(citations)} citations for 3 documents of 30 sections (cap {MAX_SUMMARY_CITATIONS})")
+
+    print(f"{len(ROUTED)} document-level and {len(NOT_ROUTED)} scoped questions, {len(citations)} citations")
+    for failure in failures:
+        print(f"  ❌ {failure}")
+
+    if not failures:
+        print("Verification successful: only document-level questions use the precomputed summaries.")
+    else:
+        print("Verification FAILED.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    test()
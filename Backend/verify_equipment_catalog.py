@@ -0,0 +1,141 @@
+import sys
+import os
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.equipment_catalog import EquipmentCatalog, equipment_filter, ensure_indexes
+from agents.sensor_agent import SensorAgent
+from agents.history_agent import HistoryAgent
+
+# Usage:
+#   python Backend/verify_equipment_catalog.py              -> seeds a scratch db on MONGO_URI (local mongod),
+#                                                              compares query plans and latency
+#   python Backend/verify_equipment_catalog.py --mongomock  -> in-memory correctness check only
+SCRATCH_DB = os.getenv("VERIFY_DB", "verify_equipment_catalog")
+MACHINES = 200
+DOCS_PER_MACHINE = 250
+QUERY_RUNS = 20
+
+
+def seed_documents():
+    start = datetime(2025, 7, 1)
+    machines = [f"H_OP{100 + i}" for i in range(MACHINES)]
+    pool, servo, alarms = [], [], []
+    for name in machines:
+        for j in range(DOCS_PER_MACHINE):
+            ts = start + timedelta(minutes=j)
+            pool.append({"L1Name": name, "signalname": "OPERATE" if j % 5 == 0 else "SPINDLE", "value": j % 2, "updatedate": ts})
+            servo.append({"L1Name": name, "signalname": f"ServoLoad_{j % 3}", "value": random.random() * 100, "updatedate": ts})
+            if j % 25 == 0:
+                alarms.append({"L1Name": name, "signalname": f"ALM{j % 4}", "updatedate": ts})
+    return machines, {"L1Single_Pool": pool, "july_a4_servo": servo, "Alarm History": alarms}
+
+
+def plan_stage(explain: dict) -> str:
+    """Leaf stage of the winning plan (COLLSCAN / IXSCAN)."""
+    stage = explain["queryPlanner"]["winningPlan"]
+    while "inputStage" in stage:
+        stage = stage["inputStage"]
+    return stage.get("stage", "?")
+
+
+async def timed_find(collection, query, runs=QUERY_RUNS):
+    started = time.perf_counter()
+    for _ in range(runs):
+        await collection.find(query).sort("updatedate", -1).limit(1).to_list(length=1)
+    return (time.perf_counter() - started) * 1000 / runs
+
+
+async def check_correctness(db, machines):
+    catalog = EquipmentCatalog(db)
+    sensor = SensorAgent(mongo_client=db.client, catalog=catalog)
+    history = HistoryAgent(mongo_client=db.client, catalog=catalog)
+    sensor.db = history.db = db
+
+    await catalog.refresh()
+    checks = {
+        "exact (case-insensitive)": (await catalog.resolve("h_op150")) == ["H_OP150"],
+        "token inside text": "H_OP150" in (await catalog.resolve("spindle noise on H_OP150 today")),
+        "fuzzy typo": "H_OP150" in (await catalog.resolve("H_0P150")),
+        "unknown -> no names": (await catalog.resolve("compressor")) == [],
+        "regex fallback escapes": equipment_filter(None, "H_OP1+")["$regex"] == r"H_OP1\+",
+    }
+
+    data = await sensor.get_sensor_data("h_op150")
+    checks["sensor agent uses resolved name"] = data.get("l1_names") == ["H_OP150"] and data.get("status") != "Unknown"
+    hist = await history.check_history([], "H_OP150")
+    checks["history agent uses resolved name"] = bool(hist.get("frequent_issues"))
+
+    for label, ok in checks.items():
+        print(f"  {'✅' if ok else '❌'} {label}")
+    print(f"  catalog: {catalog.get_stats()}")
+    return all(checks.values())
+
+
+async def compare_plans(db, machines):
+    target = machines[MACHINES // 2]
+    catalog = EquipmentCatalog(db)
+    await catalog.refresh()
+    names = await catalog.resolve(target)
+
+    old_query = {"L1Name": {"$regex": target, "$options": "i"}, "signalname": "OPERATE"}
+    new_query = {"L1Name": equipment_filter(names, target), "signalname": "OPERATE"}
+    collection = db["L1Single_Pool"]
+
+    old_plan = plan_stage(await collection.find(old_query).sort("updatedate", -1).limit(1).explain())
+    new_plan = plan_stage(await collection.find(new_query).sort("updatedate", -1).limit(1).explain())
+    old_ms = await timed_find(collection, old_query)
+    new_ms = await timed_find(collection, new_query)
+
+    print(f"  regex filter : plan {old_plan:<9} {old_ms:7.2f} ms/query")
+    print(f"  $in filter   : plan {new_plan:<9} {new_ms:7.2f} ms/query   (names={names})")
+    return new_plan == "IXSCAN"
+
+
+async def test(use_mongomock: bool):
+    machines, collections = seed_documents()
+
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+
+    db = client[SCRATCH_DB]
+    for name, docs in collections.items():
+        await db[name].delete_many({})
+        await db[name].insert_many(docs)
+    print(f"Seeded {sum(len(d) for d in collections.values())} documents for {MACHINES} machines")
+
+    try:
+        ok = True
+        if not use_mongomock:
+            print("Before indexes:")
+            await compare_plans(db, machines)
+            print(f"Indexes: {await ensure_indexes(db)}")
+            print("After indexes:")
+            ok = await compare_plans(db, machines)
+
+        print("Resolution:")
+        ok = await check_correctness(db, machines) and ok
+    finally:
+        if not use_mongomock:
+            await client.drop_database(SCRATCH_DB)
+        client.close()
+
+    if ok:
+        print("Verification successful: equipment names resolve to exact L1Name values.")
+    else:
+        print("Verification FAILED.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(test("--mongomock" in sys.argv))
@@ -0,0 +1,156 @@
+import sys
+import os
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import sensor_agent, sensor_cache
+from agents.equipment_catalog import EquipmentCatalog
+from agents.sensor_agent import SensorAgent
+from agents.sensor_cache import SensorSnapshotCache, CACHED_SIGNALS, POLL_INDEX
+from agents.equipment_catalog import ensure_index
+
+# Usage:
+#   python Backend/verify_sensor_cache.py              -> scratch db on MONGO_URI (local mongod or replica set)
+#   python Backend/verify_sensor_cache.py --mongomock  -> in-memory, polling mode only
+SCRATCH_DB = os.getenv("VERIFY_DB", "verify_sensor_cache")
+MACHINES = 50
+DOCS_PER_MACHINE = 200
+READ_RUNS = 200
+
+
+def seed_documents(start):
+    pool, servo = [], []
+    for i in range(MACHINES):
+        name = f"H_OP{100 + i}"
+        for j in range(DOCS_PER_MACHINE):
+            ts = start + timedelta(seconds=j)
+            pool.append({"L1Name": name, "signalname": "OPERATE", "value": j % 2, "updatedate": ts})
+            servo.append({"L1Name": name, "signalname": f"ServoLoad_{j % 3}", "value": float(j % 100),
+                          "upperlimit": 90, "lowerlimit": 0, "updatedate": ts})
+    return {"L1Single_Pool": pool, "july_a4_servo": servo}
+
+
+async def average_ms(agent, equipment, runs=READ_RUNS):
+    started = time.perf_counter()
+    for _ in range(runs):
+        data = await agent.get_sensor_data(equipment)
+    return (time.perf_counter() - started) * 1000 / runs, data
+
+
+async def wait_until(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    return condition()
+
+
+async def test(use_mongomock: bool):
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        import motor.motor_asyncio
+        client = motor.motor_asyncio.AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+
+    db = client[SCRATCH_DB]
+    start = datetime(2025, 7, 1)
+    for name, docs in seed_documents(start).items():
+        await db[name].delete_many({})
+        await db[name].insert_many(docs)
+
+    # Compare the latest-value reads only; the trend window is benchmarked in sensor_analytics
+    sensor_agent.SENSOR_ANALYTICS_ENABLED = False
+
+    catalog = EquipmentCatalog(db)
+    cache = SensorSnapshotCache(db, mode="poll" if use_mongomock else "auto", poll_interval=0.2)
+    direct = SensorAgent(mongo_client=client, catalog=catalog)
+    cached = SensorAgent(mongo_client=client, catalog=catalog, cache=cache)
+    direct.db = cached.db = db
+
+    checks = {}
+    try:
+        await catalog.refresh()
+
+        # Polling without the updatedate index would scan every cycle: the cache must refuse
+        # (without priming first), then recover once the index exists
+        unindexed = None
+        if use_mongomock:
+            sensor_cache.SENSOR_CACHE_REPRIME_SECONDS = 0.1
+            unindexed = SensorSnapshotCache(db, mode="poll")
+            await unindexed.start()
+            await asyncio.sleep(0.2)
+            checks["no poll index disables the cache"] = (
+                unindexed.active_mode == "disabled" and not unindexed.primed and not unindexed.is_fresh()
+            )
+            print(f"  unindexed: {unindexed.disabled_reason}")
+        for collection in CACHED_SIGNALS:
+            await ensure_index(db[collection], POLL_INDEX, create=True)
+        if unindexed is not None:
+            checks["cache recovers once the index exists"] = await wait_until(unindexed.is_fresh)
+            unindexed.stop()
+
+        # start() returns at once; the background sync primes the cache
+        start_started = time.perf_counter()
+        await cache.start()
+        start_ms = (time.perf_counter() - start_started) * 1000
+        checks["start does not block"] = start_ms < 50
+        checks["primed in the background"] = await wait_until(cache.is_fresh)
+
+        # Cached reads first: mongomock never yields, so a long direct run would starve the sync loop
+        runs = 20 if use_mongomock else READ_RUNS
+        cached_ms, cached_data = await average_ms(cached, "H_OP120", runs)
+        direct_ms, direct_data = await average_ms(direct, "H_OP120", runs)
+        await asyncio.sleep(0.5)
+        print(f"Direct queries : {direct_ms:8.3f} ms/call")
+        print(f"Snapshot cache : {cached_ms:8.3f} ms/call   ({direct_ms / max(cached_ms, 1e-6):.0f}x)")
+        checks["cache matches direct query"] = (
+            cached_data["readings"] == direct_data["readings"] and cached_data["status"] == direct_data["status"]
+        )
+        checks["served from cache"] = cached_data["source"] == "cache"
+
+        # New reading arrives; the sync loop must pick it up
+        newest = start + timedelta(days=1)
+        await db["july_a4_servo"].insert_one({"L1Name": "H_OP120", "signalname": "ServoLoad_1", "value": 99.0,
+                                             "upperlimit": 90, "lowerlimit": 0, "updatedate": newest})
+        await asyncio.sleep(1.5)
+        data = await cached.get_sensor_data("H_OP120")
+        checks["new reading synced"] = data["readings"]["servo_load"]["value"] == 99.0
+        checks["limit excursion flagged"] = data["readings"]["servo_load"]["status"] == "WARNING_HIGH"
+
+        # Stale cache falls back to Mongo
+        cache.stop()
+        cache.synced_at = time.time() - cache.max_staleness - 1
+        data = await cached.get_sensor_data("H_OP120")
+        checks["stale cache falls back to query"] = data["source"] == "mongo" and data["readings"]["servo_load"]["value"] == 99.0
+
+        # A cache that never primed is not trusted, even while a stream keeps it "synced"
+        unprimed = SensorSnapshotCache(db, mode="poll")
+        unprimed.synced_at = time.time()
+        unprimed_agent = SensorAgent(mongo_client=client, catalog=catalog, cache=unprimed)
+        unprimed_agent.db = db
+        data = await unprimed_agent.get_sensor_data("H_OP120")
+        checks["unprimed cache falls back to query"] = data["source"] == "mongo" and data["status"] != "UNKNOWN"
+    finally:
+        cache.stop()
+        if not use_mongomock:
+            await client.drop_database(SCRATCH_DB)
+        client.close()
+
+    for label, ok in checks.items():
+        print(f"  {'✅' if ok else '❌'} {label}")
+    print(f"  cache: {cache.get_stats()}")
+
+    if checks and all(checks.values()):
+        print("Verification successful: sensor snapshots served from memory and kept current.")
+    else:
+        print("Verification FAILED.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(test("--mongomock" in sys.argv))
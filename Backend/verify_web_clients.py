@@ -0,0 +1,106 @@
+import sys
+import os
+import asyncio
+import time
+
+# Add Backend to path
+sys.path.append(os.path.join(os.getcwd(), "Backend"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import web_search
+from web_search import hedged_search, get_search_engine, provider_latency
+
+# Usage: python Backend/verify_web_clients.py   (offline: stub engines via the providers= argument)
+HEDGE_DELAY = 0.2
+
+
+class StubEngine:
+    """Search engine stand-in: answers (or raises) after a fixed latency and records what happened."""
+
+    def __init__(self, name, latency, fail=False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.started_at = None
+        self.cancelled = False
+        self.calls = 0
+
+    async def search(self, query, num_results):
+        self.calls += 1
+        self.started_at = time.perf_counter()
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return {'success': True, 'results': [{'url': f"https://{self.name}.example/1", 'title': query}]}
+
+
+async def run(providers):
+    started = time.perf_counter()
+    name, response = await hedged_search("spindle alarm 410", 5, [(e.name, e) for e in providers])
+    elapsed = time.perf_counter() - started
+    # Let cancelled losers observe their CancelledError
+    await asyncio.sleep(0.05)
+    return name, response, elapsed, started
+
+
+async def test():
+    # Fixed hedge delay: the stub providers have no latency history yet
+    web_search.HEDGE_DEFAULT_DELAY = HEDGE_DELAY
+    checks = {}
+
+    # Slow primary: the secondary fires after the hedge delay and wins; the primary is cancelled
+    slow, fast = StubEngine("stub-slow", 2.0), StubEngine("stub-fast", 0.05)
+    name, response, elapsed, started = await run([slow, fast])
+    hedged_after = fast.started_at - started
+    print(f"Slow primary   : {name} won after {elapsed * 1000:.0f} ms (hedge fired at {hedged_after * 1000:.0f} ms)")
+    checks["slow primary hedged to secondary"] = name == "stub-fast" and bool(response['results'])
+    checks["hedge waits for the delay"] = HEDGE_DELAY * 0.9 <= hedged_after < HEDGE_DELAY + 0.1
+    checks["answer well before the slow primary"] = elapsed < slow.latency / 2
+    checks["losing request cancelled"] = slow.cancelled and not fast.cancelled
+    loser = provider_latency["stub-slow"]
+    checks["cancelled loser not a latency or error sample"] = (
+        loser.cancelled == 1 and loser.count == 0 and loser.errors == 0 and not loser.recent
+    )
+
+    # Fast primary: no hedge at all
+    quick, spare = StubEngine("stub-quick", 0.02), StubEngine("stub-spare", 0.02)
+    name, _, elapsed, _ = await run([quick, spare])
+    print(f"Fast primary   : {name} won after {elapsed * 1000:.0f} ms")
+    checks["fast primary not hedged"] = name == "stub-quick" and spare.calls == 0
+
+    # Failing primary: fail over at once instead of waiting for the hedge delay
+    web_search.HEDGE_DEFAULT_DELAY = 2.0
+    broken, backup = StubEngine("stub-broken", 0.01, fail=True), StubEngine("stub-backup", 0.05)
+    name, _, elapsed, _ = await run([broken, backup])
+    print(f"Failing primary: {name} won after {elapsed * 1000:.0f} ms")
+    checks["failing provider falls over"] = name == "stub-backup" and elapsed < 0.5
+
+    # Every provider failing: no winner, last error returned
+    name, response, _, _ = await run([StubEngine("stub-down-1", 0.01, fail=True), StubEngine("stub-down-2", 0.01, fail=True)])
+    checks["all failing returns no winner"] = name is None and "stub-down-2" in response.get('error', '')
+
+    checks["latency recorded per provider"] = provider_latency["stub-broken"].errors == 1 and provider_latency["stub-fast"].count == 1
+
+    # Engines are long-lived: one per (provider, key); unknown providers are rejected
+    try:
+        get_search_engine("bing")
+        checks["unknown provider rejected"] = False
+    except ValueError:
+        checks["unknown provider rejected"] = True
+
+    for label, ok in checks.items():
+        print(f"  {'✅' if ok else '❌'} {label}")
+
+    if all(checks.values()):
+        print("Verification successful: hedged search hedges, cancels and fails over.")
+    else:
+        print("Verification FAILED.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(test())
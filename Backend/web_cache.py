@@ -0,0 +1,338 @@
+"""
+Web Search Caches
+=================
+
+ProviderResponseCache: TTL + LRU cache of Tavily/Exa responses keyed by
+(provider, normalized query, num_results), with stale-while-revalidate and
+optional SQLite persistence so popular queries survive restarts.
+
+PageContentCache: size-bounded on-disk store of cleaned page text keyed by
+URL, revalidated with conditional GETs.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ----- Configuration -----
+PROVIDER_CACHE_TTL = float(os.getenv('WEB_CACHE_TTL', '900'))              # Served as fresh
+PROVIDER_CACHE_STALE_TTL = float(os.getenv('WEB_CACHE_STALE_TTL', '3600'))  # Served stale + refreshed
+PROVIDER_CACHE_MAX_ENTRIES = int(os.getenv('WEB_CACHE_MAX_ENTRIES', '500'))
+PROVIDER_CACHE_DB = os.getenv('WEB_CACHE_DB', 'web_cache.db')               # Empty disables persistence
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    query = re.sub(r'\s+', ' ', query.strip().lower())
+    return query.rstrip('?!. ')
+
+
+class ProviderResponseCache:
+    """
+    Size-bounded LRU cache of search provider responses.
+
+    Entries younger than ttl are fresh. Entries younger than stale_ttl are
+    returned as stale: the caller serves them immediately and refreshes in
+    the background. Older entries are dropped.
+    """
+
+    def __init__(self, ttl: float = PROVIDER_CACHE_TTL, stale_ttl: float = PROVIDER_CACHE_STALE_TTL,
+                 max_entries: int = PROVIDER_CACHE_MAX_ENTRIES, db_path: Optional[str] = PROVIDER_CACHE_DB):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.db_path = db_path or None
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'evictions': 0}
+
+        if self.db_path:
+            self._init_db()
+            self._load()
+
+    @staticmethod
+    def make_key(provider: str, query: str, num_results: int) -> str:
+        return f"{provider}|{num_results}|{normalize_query(query)}"
+
+    # ----- Persistence -----
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS provider_responses (
+                cache_key TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,
+                response TEXT NOT NULL -- JSON string
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def _load(self):
+        """Load the most recent non-expired entries from disk."""
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM provider_responses WHERE stored_at < ?", (time.time() - self.stale_ttl,))
+            cursor.execute(
+                "SELECT cache_key, stored_at, response FROM provider_responses ORDER BY stored_at DESC LIMIT ?",
+                (self.max_entries,)
+            )
+            rows = cursor.fetchall()
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Provider cache load failed: {str(e)[:100]}")
+            return
+
+        for key, stored_at, response in reversed(rows):
+            self._entries[key] = (stored_at, json.loads(response))
+        logger.info(f"🗄️  Loaded {len(rows)} cached provider responses")
+
+    def _persist(self, key: str, stored_at: float, response: Dict):
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR REPLACE INTO provider_responses (cache_key, stored_at, response) VALUES (?, ?, ?)",
+                (key, stored_at, json.dumps(response, default=str))
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Provider cache write failed: {str(e)[:100]}")
+
+    def _delete(self, keys: List[str]):
+        if not self.db_path or not keys:
+            return
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.executemany("DELETE FROM provider_responses WHERE cache_key = ?", [(k,) for k in keys])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Provider cache delete failed: {str(e)[:100]}")
+
+    # ----- Cache API -----
+
+    def get(self, provider: str, query: str, num_results: int) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        Returns:
+            (response, 'fresh' | 'stale') or (None, None) on a miss
+        """
+        key = self.make_key(provider, query, num_results)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+
+        stored_at, response = entry
+        age = time.time() - stored_at
+        if age > self.stale_ttl:
+            del self._entries[key]
+            self._delete([key])
+            return None, None
+
+        self._entries.move_to_end(key)
+        return response, ('fresh' if age <= self.ttl else 'stale')
+
+    def lookup(self, providers: List[str], query: str, num_results: int) -> Tuple[Optional[str], Optional[Dict], Optional[str]]:
+        """
+        Find the best cached response across providers (in preference order).
+
+        A fresh entry from any provider beats a stale one.
+
+        Returns:
+            (provider, response, 'fresh' | 'stale') or (None, None, None)
+        """
+        stale = (None, None, None)
+        for provider in providers:
+            response, state = self.get(provider, query, num_results)
+            if state == 'fresh':
+                self.stats['hits'] += 1
+                return provider, response, state
+            if state == 'stale' and stale[0] is None:
+                stale = (provider, response, state)
+
+        if stale[0] is not None:
+            self.stats['stale_hits'] += 1
+        else:
+            self.stats['misses'] += 1
+        return stale
+
+    def put(self, provider: str, query: str, num_results: int, response: Dict):
+        key = self.make_key(provider, query, num_results)
+        stored_at = time.time()
+        self._entries[key] = (stored_at, response)
+        self._entries.move_to_end(key)
+
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            evicted.append(old_key)
+        self.stats['evictions'] += len(evicted)
+
+        if self.db_path:
+            self._persist(key, stored_at, response)
+            self._delete(evicted)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'entries': len(self._entries), 'persistent': bool(self.db_path)}
+
+
+# ============================================================================
+# CLEANED PAGE CONTENT
+# ============================================================================
+
+PAGE_CACHE_DB = os.getenv('PAGE_CACHE_DB', 'page_cache.db')
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+PAGE_CACHE_REVALIDATE_AFTER = float(os.getenv('PAGE_CACHE_REVALIDATE_AFTER', '3600'))
+
+
+class PageContentCache:
+    """
+    On-disk store of cleaned page text keyed by URL.
+
+    Alongside the text it keeps the extraction method, the ETag/Last-Modified
+    validators and a hash of the raw page, so a stale entry can be revalidated
+    with a conditional GET and only re-parsed when the page really changed.
+    Pages extracted without the origin body (Jina Reader, Playwright) have no
+    validators: they are TTL-only and simply re-extracted once stale.
+    Total stored text is bounded; least recently used pages are evicted first.
+    """
+
+    def __init__(self, db_path: str = PAGE_CACHE_DB, max_bytes: int = PAGE_CACHE_MAX_BYTES,
+                 revalidate_after: float = PAGE_CACHE_REVALIDATE_AFTER):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.stats = {'hits': 0, 'revalidated': 0, 'changed': 0, 'misses': 0, 'evictions': 0}
+        self._init_db()
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_content (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                method TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT, -- sha256 of the raw page body
+                size INTEGER NOT NULL,
+                validated_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_page_content_access ON page_content (last_access)')
+        conn.commit()
+        conn.close()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """
+        Cached entry, or None. Extra flags: 'fresh' (no revalidation needed) and
+        'revalidatable' (has validators; otherwise a stale entry is TTL-only).
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT text, method, etag, last_modified, content_hash, validated_at FROM page_content WHERE url = ?",
+            (url,)
+        )
+        row = cursor.fetchone()
+        if row:
+            cursor.execute("UPDATE page_content SET last_access = ? WHERE url = ?", (time.time(), url))
+            conn.commit()
+        conn.close()
+
+        if not row:
+            self.stats['misses'] += 1
+            return None
+
+        return {
+            'url': url,
+            'text': row[0],
+            'method': row[1],
+            'etag': row[2],
+            'last_modified': row[3],
+            'content_hash': row[4],
+            'fresh': time.time() - row[5] <= self.revalidate_after,
+            'revalidatable': bool(row[2] or row[3] or row[4])
+        }
+
+    def record(self, outcome: str):
+        """Count how a cached entry was served: 'hits', 'revalidated' or 'changed'."""
+        if outcome not in ('hits', 'revalidated', 'changed'):
+            raise ValueError(f"Unknown page cache outcome: {outcome}")
+        self.stats[outcome] += 1
+
+    def put(self, url: str, text: str, method: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, content_hash: Optional[str] = None):
+        now = time.time()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''INSERT OR REPLACE INTO page_content
+               (url, text, method, etag, last_modified, content_hash, size, validated_at, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (url, text, method, etag, last_modified, content_hash, len(text.encode('utf-8')), now, now)
+        )
+        conn.commit()
+        conn.close()
+        self._enforce_size()
+
+    def mark_validated(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Record a successful revalidation (304, or an unchanged body)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''UPDATE page_content SET validated_at = ?,
+                   etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)
+               WHERE url = ?''',
+            (time.time(), etag, last_modified, url)
+        )
+        conn.commit()
+        conn.close()
+
+    def _enforce_size(self):
+        """Evict least recently used pages until the stored text fits in max_bytes."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(SUM(size), 0) FROM page_content")
+        total = cursor.fetchone()[0]
+
+        if total > self.max_bytes:
+            cursor.execute("SELECT url, size FROM page_content ORDER BY last_access ASC")
+            evict = []
+            for url, size in cursor.fetchall():
+                if total <= self.max_bytes:
+                    break
+                evict.append((url,))
+                total -= size
+            cursor.executemany("DELETE FROM page_content WHERE url = ?", evict)
+            conn.commit()
+            self.stats['evictions'] += len(evict)
+
+        conn.close()
+
+    def get_stats(self) -> Dict:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM page_content")
+        count, total = cursor.fetchone()
+        conn.close()
+        return {**self.stats, 'pages': count, 'bytes': total, 'max_bytes': self.max_bytes}
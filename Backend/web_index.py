@@ -0,0 +1,146 @@
+"""
+Persistent Web Knowledge Index
+==============================
+
+Chunks scraped for /web-query are kept in a dedicated ChromaDB collection
+instead of being thrown away after one answer. Later queries search this
+index first and only call the live search providers when local coverage or
+freshness is insufficient.
+
+- Deduplicated: chunk ids are a hash of the normalized chunk text
+- Every chunk carries its source URL, fetch time and expiry time
+- Expired chunks are ignored by search and purged periodically
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import List, Dict, Any, Optional
+
+import chromadb
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ----- Configuration -----
+WEB_INDEX_PATH = os.getenv('WEB_INDEX_PATH', 'web_index')       # Empty keeps the index in memory
+WEB_CHUNK_TTL = float(os.getenv('WEB_CHUNK_TTL', str(7 * 24 * 3600)))
+LOCAL_MIN_SIMILARITY = 0.55     # Hits below this don't count as coverage
+LOCAL_MIN_HITS = 4              # Relevant chunks needed to skip the live search
+LOCAL_MIN_SOURCES = 2           # ... coming from at least this many URLs
+
+SOURCE_FIELDS = ('url', 'title', 'domain', 'score', 'favicon', 'author', 'published_date',
+                 'chunk_index', 'source_api')
+
+
+def chunk_id(text: str) -> str:
+    """Stable id for a chunk: hash of its normalized text (dedupes identical chunks)."""
+    normalized = re.sub(r'\s+', ' ', text.strip().lower())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class WebKnowledgeIndex:
+    def __init__(self, path: Optional[str] = WEB_INDEX_PATH, ttl: float = WEB_CHUNK_TTL):
+        self.ttl = ttl
+        client = chromadb.PersistentClient(path=path) if path else chromadb.Client()
+        self.collection = client.get_or_create_collection(
+            name="web_knowledge",
+            metadata={"hnsw:space": "cosine"}
+        )
+        self.stats = {'local_answers': 0, 'live_searches': 0, 'upserted': 0}
+
+    def upsert(self, chunks: List[str], sources: List[Dict[str, Any]], embeddings) -> int:
+        """Add or refresh web chunks. Returns the number of distinct chunks written."""
+        if not chunks:
+            return 0
+
+        now = time.time()
+        ids, docs, vectors, metadatas = [], [], [], []
+        seen = set()
+
+        for text, source, vector in zip(chunks, sources, embeddings):
+            cid = chunk_id(text)
+            if cid in seen:
+                continue
+            seen.add(cid)
+
+            meta = {field: source.get(field) for field in SOURCE_FIELDS}
+            # Chroma metadata values must be str/int/float/bool
+            meta = {k: (v if isinstance(v, (str, int, float, bool)) else str(v or '')) for k, v in meta.items()}
+            meta['fetched_at'] = now
+            meta['expires_at'] = now + self.ttl
+
+            ids.append(cid)
+            docs.append(text)
+            vectors.append(np.asarray(vector, dtype=np.float32).tolist())
+            metadatas.append(meta)
+
+        try:
+            self.collection.upsert(ids=ids, documents=docs, embeddings=vectors, metadatas=metadatas)
+            self.stats['upserted'] += len(ids)
+            logger.info(f"🗂️  Upserted {len(ids)} chunks into the web knowledge index")
+        except Exception as e:
+            logger.warning(f"⚠️  Web index upsert failed: {str(e)[:100]}")
+            return 0
+
+        return len(ids)
+
+    def search(self, query_embedding, k: int = 8) -> List[Dict[str, Any]]:
+        """Search unexpired chunks. Each hit has text, source, similarity and embedding."""
+        try:
+            if self.collection.count() == 0:
+                return []
+
+            results = self.collection.query(
+                query_embeddings=[np.asarray(query_embedding, dtype=np.float32).tolist()],
+                n_results=k,
+                where={"expires_at": {"$gt": time.time()}},
+                include=["documents", "metadatas", "distances", "embeddings"]
+            )
+        except Exception as e:
+            logger.warning(f"⚠️  Web index search failed: {str(e)[:100]}")
+            return []
+
+        hits = []
+        if results["documents"] and results["documents"][0]:
+            for text, meta, distance, vector in zip(results["documents"][0], results["metadatas"][0],
+                                                    results["distances"][0], results["embeddings"][0]):
+                source = {field: meta.get(field, '') for field in SOURCE_FIELDS}
+                source['snippet'] = text[:200]
+                source['fetched_at'] = meta.get('fetched_at')
+                hits.append({
+                    'text': text,
+                    'source': source,
+                    'similarity': 1.0 - float(distance),
+                    'embedding': np.asarray(vector, dtype=np.float32)
+                })
+        return hits
+
+    @staticmethod
+    def relevant_hits(hits: List[Dict[str, Any]], min_similarity: float = LOCAL_MIN_SIMILARITY) -> List[Dict[str, Any]]:
+        return [h for h in hits if h['similarity'] >= min_similarity]
+
+    def is_sufficient(self, hits: List[Dict[str, Any]]) -> bool:
+        """Enough relevant, fresh chunks from enough distinct sources to skip the live search."""
+        relevant = self.relevant_hits(hits)
+        return (len(relevant) >= LOCAL_MIN_HITS and
+                len({h['source']['url'] for h in relevant}) >= LOCAL_MIN_SOURCES)
+
+    def purge_expired(self) -> int:
+        try:
+            expired = self.collection.get(where={"expires_at": {"$lte": time.time()}}, include=[])
+            if expired["ids"]:
+                self.collection.delete(ids=expired["ids"])
+            return len(expired["ids"])
+        except Exception as e:
+            logger.warning(f"⚠️  Web index purge failed: {str(e)[:100]}")
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            count = self.collection.count()
+        except Exception:
+            count = None
+        return {**self.stats, 'chunks': count}
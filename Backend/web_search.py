@@ -1,19 +1,32 @@
 """
 Web Search Module - Premium Search APIs + Smart Crawling
-Uses Tavily (primary) → Exa AI (fallback) → Jina AI (enhancement)
+Uses Tavily (primary) → Exa AI (hedged secondary) → Jina AI (enhancement)
 """
 
 import asyncio
+import importlib.util
 import logging
 import os
-import re
-from typing import List, Dict, Optional
+import time
+import hashlib
+from bisect import bisect_left
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from urllib.parse import urlparse
 import aiohttp
 from sentence_transformers import SentenceTransformer
 import numpy as np
 from dotenv import load_dotenv
 
+from web_cache import ProviderResponseCache, PageContentCache
+from web_index import WebKnowledgeIndex, chunk_id
+from near_dedup import dedupe_chunks
+from vector_scoring import VectorScorer
+from html_extraction import (
+    clean_text, extract_main_text, extract_in_pool, start_extraction_pool, shutdown_extraction_pool
+)
+
 # Load environment variables
 load_dotenv()
 
@@ -32,12 +45,9 @@ except ImportError:
     EXA_AVAILABLE = False
     print("⚠️  Exa AI not available")
 
-# Content extraction fallbacks
-try:
-    from trafilatura import fetch_url, extract
-    TRAFILATURA_AVAILABLE = True
-except ImportError:
-    TRAFILATURA_AVAILABLE = False
+# Content extraction fallbacks (the extraction itself runs in html_extraction's process pool,
+# so the parent only needs to know Trafilatura is installed, not import it)
+TRAFILATURA_AVAILABLE = importlib.util.find_spec("trafilatura") is not None
 
 try:
     from playwright.async_api import async_playwright
@@ -58,6 +68,10 @@ def get_embedding_model():
         _embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
     return _embedding_model
 
+# Persistent index of previously scraped web chunks
+LOCAL_SEARCH_K = 12
+web_index = WebKnowledgeIndex()
+
 # Quality and blocked domains
 BLOCKED_DOMAINS = {
     'pinterest.com', 'instagram.com', 'facebook.com', 'twitter.com'
@@ -216,23 +230,440 @@ class ExaSearchEngine:
             return False
 
 
+# ============================================================================
+# PROVIDER CLIENTS + HEDGED SEARCH
+# ============================================================================
+
+HEDGE_DEFAULT_DELAY = 1.5   # Seconds before firing the secondary provider (few samples yet)
+HEDGE_MIN_DELAY = 0.3
+HEDGE_MAX_DELAY = 4.0
+HEDGE_MIN_SAMPLES = 20      # Samples needed before the p95 drives the hedge delay
+
+LATENCY_BUCKETS_MS = [50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 8000, 13000, 20000]
+
+
+class LatencyHistogram:
+    """
+    Per-provider latency histogram.
+    
+    Fixed buckets give a cheap long-run distribution; a window of recent
+    samples gives the percentiles used to pick the hedge delay.
+    """
+    
+    def __init__(self, window: int = 200):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.cancelled = 0      # Hedge losers: not latency or error samples
+    
+    def record(self, seconds: float, success: bool = True):
+        ms = seconds * 1000
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.recent.append(seconds)
+        self.count += 1
+        if not success:
+            self.errors += 1
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    
+    def snapshot(self) -> Dict:
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'buckets': dict(zip(labels, self.bucket_counts))
+        }
+
+
+provider_latency: Dict[str, LatencyHistogram] = {}
+_search_engines: Dict[Tuple[str, Optional[str]], object] = {}
+
+
+def get_search_engine(name: str, api_key: Optional[str] = None):
+    """Return the long-lived engine (and SDK client) for a provider, creating it once."""
+    key = (name, api_key)
+    if key not in _search_engines:
+        if name == 'tavily':
+            _search_engines[key] = TavilySearchEngine(api_key=api_key)
+        elif name == 'exa':
+            _search_engines[key] = ExaSearchEngine(api_key=api_key)
+        else:
+            raise ValueError(f"Unknown search provider: {name}")
+    return _search_engines[key]
+
+
+def get_default_providers(tavily_api_key: Optional[str] = None,
+                          exa_api_key: Optional[str] = None) -> List[Tuple[str, object]]:
+    """Available providers in preference order (Tavily primary, Exa secondary)."""
+    providers = []
+    for name, available, api_key in (('tavily', TAVILY_AVAILABLE, tavily_api_key),
+                                     ('exa', EXA_AVAILABLE, exa_api_key)):
+        if not available:
+            continue
+        try:
+            providers.append((name, get_search_engine(name, api_key)))
+        except Exception as e:
+            logger.warning(f"⚠️  {name} unavailable: {str(e)[:100]}")
+    return providers
+
+
+def get_provider_latency_stats() -> Dict:
+    """Latency histograms of every provider used so far."""
+    return {name: hist.snapshot() for name, hist in provider_latency.items()}
+
+
+def hedge_delay(provider: str) -> float:
+    """Seconds to wait for a provider before hedging: its recent p95, clamped."""
+    hist = provider_latency.get(provider)
+    if hist is None or len(hist.recent) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, hist.percentile(0.95)))
+
+
+async def _timed_search(name: str, engine, query: str, num_results: int) -> Dict:
+    """
+    Run one provider search and record its latency.
+    
+    A cancelled search (a hedge loser) is only counted, not recorded as a
+    sample: its truncated time would drag down the p95 the hedge delay is
+    derived from.
+    """
+    hist = provider_latency.setdefault(name, LatencyHistogram())
+    start = time.perf_counter()
+    try:
+        response = await engine.search(query, num_results)
+    except asyncio.CancelledError:
+        hist.cancelled += 1
+        raise
+    except Exception as e:
+        logger.warning(f"⚠️  {name} failed: {str(e)[:100]}")
+        response = {'results': [], 'success': False, 'error': str(e)}
+    hist.record(time.perf_counter() - start, bool(response.get('success') and response.get('results')))
+    return response
+
+
+async def hedged_search(query: str, num_results: int,
+                        providers: List[Tuple[str, object]]) -> Tuple[Optional[str], Dict]:
+    """
+    Query providers with hedging instead of sequential fallback.
+    
+    The primary starts immediately. The next provider is fired when the
+    previous one fails, or when it has not answered within its p95 latency.
+    The first successful response wins and the others are cancelled.
+    
+    Returns:
+        (winning provider name or None, its response)
+    """
+    if not providers:
+        return None, {'results': [], 'success': False}
+    
+    loop = asyncio.get_running_loop()
+    pending_providers = list(providers)
+    running: Dict[asyncio.Task, str] = {}
+    last_response: Dict = {'results': [], 'success': False}
+    
+    def launch_next():
+        name, engine = pending_providers.pop(0)
+        task = asyncio.create_task(_timed_search(name, engine, query, num_results))
+        running[task] = name
+        return loop.time() + hedge_delay(name)
+    
+    hedge_at = launch_next()
+    
+    try:
+        while running:
+            timeout = max(0.0, hedge_at - loop.time()) if pending_providers else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            
+            if not done:
+                # Slow primary: hedge with the next provider
+                logger.info(f"⏱️  {list(running.values())[-1]} slower than its p95, hedging")
+                hedge_at = launch_next()
+                continue
+            
+            for task in done:
+                name = running.pop(task)
+                response = task.result()
+                if response.get('success') and response.get('results'):
+                    return name, response
+                last_response = response
+            
+            # Failed fast: don't wait for the hedge delay
+            if pending_providers and not running:
+                hedge_at = launch_next()
+        
+        return None, last_response
+    finally:
+        for task in running:
+            task.cancel()
+
+
+provider_cache = ProviderResponseCache()
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _refresh_cached_search(query: str, num_results: int, providers: List[Tuple[str, object]]):
+    """Background revalidation of a stale cache entry."""
+    name, response = await hedged_search(query, num_results, providers)
+    if name:
+        provider_cache.put(name, query, num_results, response)
+        logger.info(f"🔄 Refreshed cached {name} results for: {query}")
+
+
+async def cached_search(query: str, num_results: int,
+                        providers: List[Tuple[str, object]]) -> Tuple[Optional[str], Dict, str]:
+    """
+    Hedged provider search behind the response cache (stale-while-revalidate).
+    
+    Returns:
+        (provider name or None, response, cache state: 'fresh' | 'stale' | 'miss')
+    """
+    names = [name for name, _ in providers]
+    name, response, state = provider_cache.lookup(names, query, num_results)
+    
+    if state == 'stale':
+        key = ProviderResponseCache.make_key('*', query, num_results)
+        if key not in _refresh_tasks or _refresh_tasks[key].done():
+            task = asyncio.create_task(_refresh_cached_search(query, num_results, providers))
+            _refresh_tasks[key] = task
+            task.add_done_callback(lambda t, k=key: _refresh_tasks.pop(k, None))
+    
+    if state:
+        logger.info(f"🗄️  {state} cache hit ({name}) for: {query}")
+        return name, response, state
+    
+    name, response = await hedged_search(query, num_results, providers)
+    if name:
+        provider_cache.put(name, query, num_results, response)
+    return name, response, 'miss'
+
+
+# ============================================================================
+# SHARED CONNECTION POOLS
+# ============================================================================
+
+HTTP_POOL_LIMIT = 100           # Total open connections
+HTTP_POOL_LIMIT_PER_HOST = 8    # Open connections per host
+HTTP_KEEPALIVE_TIMEOUT = 30     # Seconds an idle connection is kept
+HTTP_REQUEST_TIMEOUT = 10       # Seconds per request
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '3'))
+
+# Enhancement fan-out
+ENHANCE_CONCURRENCY = 8         # URLs enhanced at once, across all requests
+ENHANCE_PER_HOST = 2            # URLs enhanced at once per host
+ENHANCE_DEADLINE = 8.0          # Seconds allowed per URL for all strategies
+PLAYWRIGHT_HEDGE_DELAY = 2.0    # Playwright joins the race only after this long
+WEB_QUERY_BUDGET = 15.0         # Seconds for the whole search + enhancement step
+
+
+class HttpSessionPool:
+    """
+    Long-lived aiohttp session with a keep-alive connection pool.
+    
+    Created lazily on first use (so scripts work without the app lifespan)
+    and closed by the FastAPI lifespan on shutdown.
+    """
+    
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT),
+                headers={'User-Agent': 'Mozilla/5.0'}
+            )
+            logger.info(f"🌐 HTTP pool started (limit={self.limit}, per_host={self.limit_per_host})")
+        return self._session
+    
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class BrowserPool:
+    """
+    Warm headless Chromium shared by all Playwright extractions.
+    
+    One browser process is launched once; a fixed number of browser contexts
+    are handed out from a queue and reused, which also caps concurrent pages.
+    """
+    
+    def __init__(self, size: int = BROWSER_POOL_SIZE):
+        self.size = size
+        self._playwright = None
+        self._browser = None
+        self._contexts: Optional[asyncio.Queue] = None
+        self._lock = asyncio.Lock()
+    
+    @property
+    def started(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+    
+    async def start(self):
+        async with self._lock:
+            if self.started:
+                return
+            await self._close_unlocked()
+            
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._contexts = asyncio.Queue()
+            for _ in range(self.size):
+                self._contexts.put_nowait(await self._browser.new_context())
+            logger.info(f"🧭 Browser pool started with {self.size} contexts")
+    
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a context from the pool and yield a fresh page in it."""
+        if not self.started:
+            await self.start()
+        
+        context = await self._contexts.get()
+        page = None
+        try:
+            page = await context.new_page()
+            yield page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                    await context.clear_cookies()
+                except Exception:
+                    pass
+            self._contexts.put_nowait(context)
+    
+    async def close(self):
+        async with self._lock:
+            await self._close_unlocked()
+    
+    async def _close_unlocked(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+        self._browser = None
+        self._playwright = None
+        self._contexts = None
+
+
+http_pool = HttpSessionPool()
+browser_pool = BrowserPool() if PLAYWRIGHT_AVAILABLE else None
+
+
+async def startup_web_clients(warm_browser: bool = True):
+    """Open the shared HTTP pool, start the extraction process pool and warm the browser pool (FastAPI lifespan startup)."""
+    purged = web_index.purge_expired()
+    if purged:
+        logger.info(f"🗂️  Purged {purged} expired chunks from the web knowledge index")
+    await http_pool.get_session()
+    start_extraction_pool()
+    if warm_browser and browser_pool is not None:
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            logger.warning(f"⚠️  Browser pool not started: {str(e)[:100]}")
+
+
+async def shutdown_web_clients():
+    """
+    Close the extraction process pool, shared HTTP pool and browser pool (FastAPI lifespan shutdown).
+    
+    Each client is closed in its own step, so one failing (or the shutdown
+    being cancelled) doesn't leak the others; a cancellation is re-raised at
+    the end.
+    """
+    cancelled = None
+    steps = [('extraction pool', shutdown_extraction_pool), ('HTTP pool', http_pool.close)]
+    if browser_pool is not None:
+        steps.append(('browser pool', browser_pool.close))
+    for name, close in steps:
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        except asyncio.CancelledError as e:
+            cancelled = e
+        except Exception as e:
+            logger.warning(f"⚠️  Closing the {name} failed: {str(e)[:100]}")
+    if cancelled is not None:
+        raise cancelled
+
+
+page_cache = PageContentCache()
+
+_enhance_semaphore = asyncio.Semaphore(ENHANCE_CONCURRENCY)
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    """Per-host concurrency limit so one slow site can't take every slot."""
+    host = urlparse(url).netloc.lower()
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(ENHANCE_PER_HOST)
+    return _host_semaphores[host]
+
+
 class ContentEnhancer:
     """
     Enhance content using Jina AI, Trafilatura, or Playwright
     Only used when search APIs don't provide enough content
+    
+    Cleaned text is kept in the on-disk page cache. Recently validated pages
+    are served straight from it; older ones are revalidated with a conditional
+    GET and only re-extracted when the page body actually changed. Pages won
+    by Jina or Playwright carry no origin validators, so once stale they are
+    re-extracted like a miss instead of revalidated.
+    
+    On a cache miss the strategies race each other: Jina and Trafilatura start
+    together, Playwright joins if neither has produced content after a short
+    delay, and the first usable result wins.
     """
     
-    def __init__(self, jina_api_key: Optional[str] = None):
+    def __init__(self, jina_api_key: Optional[str] = None, cache: Optional[PageContentCache] = None):
         self.jina_api_key = jina_api_key
         self.jina_endpoint = "https://r.jina.ai/"
+        self.cache = cache or page_cache
+        self._validators: Dict[str, Dict] = {}  # url -> etag/last_modified/content_hash of the last origin fetch
         self.stats = {
+            'cache': 0,
             'jina': 0,
             'trafilatura': 0,
             'playwright': 0,
-            'skipped': 0
+            'skipped': 0,
+            'failed': 0,
+            'timed_out': 0
         }
     
-    async def enhance_if_needed(self, url: str, existing_content: str, min_length: int = 300) -> Optional[str]:
+    async def enhance_if_needed(self, url: str, existing_content: str, min_length: int = 300,
+                                deadline: float = ENHANCE_DEADLINE) -> Optional[str]:
         """
         Enhance content only if existing content is insufficient
         
@@ -240,6 +671,7 @@ class ContentEnhancer:
             url: URL to fetch content from
             existing_content: Content already provided by search API
             min_length: Minimum content length to skip enhancement
+            deadline: Seconds allowed for all extraction strategies
             
         Returns:
             Enhanced content or existing content if sufficient
@@ -249,83 +681,170 @@ class ContentEnhancer:
             self.stats['skipped'] += 1
             return existing_content
         
-        logger.info(f"📝 Enhancing content for: {url}")
+        cached = self.cache.get(url)
+        if cached and cached['fresh'] and len(cached['text']) > len(existing_content):
+            self.stats['cache'] += 1
+            self.cache.record('hits')
+            return cached['text']
         
-        # Try enhancement methods
-        enhanced = await self._enhance_with_jina(url)
-        if enhanced and len(enhanced) > len(existing_content):
-            self.stats['jina'] += 1
-            return enhanced
-        
-        if TRAFILATURA_AVAILABLE:
-            enhanced = await self._enhance_with_trafilatura(url)
-            if enhanced and len(enhanced) > len(existing_content):
-                self.stats['trafilatura'] += 1
-                return enhanced
+        # Per-host slot first: a URL waiting on a busy host must not hold a global slot
+        async with _host_semaphore(url), _enhance_semaphore:
+            if cached and cached['revalidatable']:
+                revalidated = await self._revalidate(url, cached)
+                if revalidated and len(revalidated) > len(existing_content):
+                    self.stats['cache'] += 1
+                    return revalidated
+            
+            logger.info(f"📝 Enhancing content for: {url}")
+            enhanced, method = await self._race_strategies(url, existing_content, deadline)
         
-        if PLAYWRIGHT_AVAILABLE:
-            enhanced = await self._enhance_with_playwright(url)
-            if enhanced and len(enhanced) > len(existing_content):
-                self.stats['playwright'] += 1
-                return enhanced
+        if enhanced:
+            self.stats[method] += 1
+            validators = self._validators.pop(url, {})
+            self.cache.put(url, enhanced, method, **(validators if method == 'trafilatura' else {}))
+            return enhanced
         
         # Return existing content if enhancement failed
+        self.stats['failed'] += 1
         return existing_content
     
+    async def _race_strategies(self, url: str, existing_content: str, deadline: float):
+        """Run the extraction strategies concurrently; return (content, method) of the first usable one."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        end = start + deadline
+        hedge_at = start + PLAYWRIGHT_HEDGE_DELAY
+        
+        tasks = {asyncio.create_task(self._enhance_with_jina(url)): 'jina'}
+        if TRAFILATURA_AVAILABLE:
+            tasks[asyncio.create_task(self._enhance_with_trafilatura(url))] = 'trafilatura'
+        playwright_pending = PLAYWRIGHT_AVAILABLE
+        
+        try:
+            while tasks or playwright_pending:
+                now = loop.time()
+                if now >= end:
+                    self.stats['timed_out'] += 1
+                    break
+                
+                if playwright_pending and (now >= hedge_at or not tasks):
+                    tasks[asyncio.create_task(self._enhance_with_playwright(url))] = 'playwright'
+                    playwright_pending = False
+                
+                wait_until = min(end, hedge_at) if playwright_pending else end
+                done, _ = await asyncio.wait(
+                    tasks, timeout=max(0.0, wait_until - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    method = tasks.pop(task)
+                    enhanced = task.result()
+                    if enhanced and len(enhanced) > len(existing_content):
+                        return enhanced, method
+            
+            return None, None
+        finally:
+            for task in tasks:
+                task.cancel()
+    
     async def _enhance_with_jina(self, url: str) -> Optional[str]:
         """Enhance using Jina AI Reader API"""
         try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
+            headers = {}
             if self.jina_api_key:
                 headers['Authorization'] = f'Bearer {self.jina_api_key}'
             
             jina_url = f"{self.jina_endpoint}{url}"
             
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(jina_url, headers=headers) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        return self._clean_text(content)
+            session = await http_pool.get_session()
+            async with session.get(jina_url, headers=headers) as response:
+                if response.status == 200:
+                    content = await response.text()
+                    # Plain text: regex cleaning only, no need for the process pool
+                    return extract_main_text(content, 'text')
         except:
             pass
         return None
     
+    async def _revalidate(self, url: str, cached: Dict) -> Optional[str]:
+        """
+        Conditional GET for a cached page.
+        
+        304, or a 200 whose body hashes to the stored hash, keeps the cached
+        text without re-parsing; a changed body is re-extracted and stored.
+        """
+        try:
+            headers = {}
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+            
+            session = await http_pool.get_session()
+            async with session.get(url, headers=headers) as response:
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                if response.status == 304:
+                    self.cache.mark_validated(url, etag, last_modified)
+                    self.cache.record('revalidated')
+                    return cached['text']
+                if response.status != 200:
+                    return None
+                body = await response.read()
+            
+            content_hash = hashlib.sha256(body).hexdigest()
+            if content_hash == cached.get('content_hash'):
+                self.cache.mark_validated(url, etag, last_modified)
+                self.cache.record('revalidated')
+                return cached['text']
+            
+            # Page changed: re-extract
+            if not TRAFILATURA_AVAILABLE:
+                return None
+            text = await self._extract_html(body)
+            if text:
+                self.cache.record('changed')
+                self.cache.put(url, text, 'trafilatura', etag, last_modified, content_hash)
+                return text
+        except:
+            pass
+        return None
+    
+    async def _extract_html(self, html) -> Optional[str]:
+        """Extract and clean the main text of an HTML page (str or raw bytes) with Trafilatura, off-process"""
+        return await extract_in_pool(html, 'trafilatura')
+    
     async def _enhance_with_trafilatura(self, url: str) -> Optional[str]:
-        """Enhance using Trafilatura"""
+        """Enhance using Trafilatura (page fetched through the shared HTTP pool)"""
         try:
-            loop = asyncio.get_event_loop()
-            downloaded = await loop.run_in_executor(None, fetch_url, url)
-            if downloaded:
-                text = await loop.run_in_executor(
-                    None,
-                    lambda: extract(downloaded, include_comments=False, include_tables=True)
-                )
+            session = await http_pool.get_session()
+            async with session.get(url) as response:
+                if response.status != 200:
+                    return None
+                body = await response.read()
+                validators = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'content_hash': hashlib.sha256(body).hexdigest()
+                }
+            
+            if body:
+                text = await self._extract_html(body)
                 if text:
-                    return self._clean_text(text)
+                    self._validators[url] = validators
+                    return text
         except:
             pass
         return None
     
     async def _enhance_with_playwright(self, url: str) -> Optional[str]:
-        """Enhance using Playwright (for complex JS sites)"""
+        """Enhance using Playwright (for complex JS sites) with a pooled browser context"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+            async with browser_pool.page() as page:
                 await page.goto(url, wait_until='networkidle', timeout=10000)
                 content = await page.content()
-                await browser.close()
-                
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(content, 'html.parser')
-                for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
-                    tag.decompose()
-                
-                main = soup.find('main') or soup.find('article') or soup.find('body')
-                if main:
-                    text = main.get_text(separator=' ', strip=True)
-                    return self._clean_text(text)
+            
+            return await extract_in_pool(content, 'soup')
         except:
             pass
         return None
@@ -333,12 +852,7 @@ class ContentEnhancer:
     @staticmethod
     def _clean_text(text: str) -> str:
         """Clean and normalize text"""
-        if not text:
-            return ""
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r'http\S+', '', text)
-        text = re.sub(r'!\[.*?\]\(.*?\)', '', text)
-        return text.strip()
+        return clean_text(text)
     
     def get_stats(self) -> Dict:
         """Get enhancement statistics"""
@@ -358,16 +872,38 @@ def chunk_text(text: str, chunk_size: int = 800) -> List[str]:
     return chunks[:5]  # Max 5 chunks per source
 
 
-async def search_and_process(
+def _source_card(result: Dict, status: str) -> Dict:
+    """Compact source description sent to streaming clients before the answer is ready."""
+    url = result.get('url', '')
+    try:
+        domain = urlparse(url).netloc.replace('www.', '')
+    except:
+        domain = 'unknown'
+    return {
+        'url': url,
+        'title': result.get('title', ''),
+        'domain': result.get('domain') or domain,
+        'favicon': result.get('favicon', ''),
+        'published_date': result.get('published_date', ''),
+        'snippet': (result.get('snippet') or result.get('content') or '')[:200],
+        'status': status
+    }
+
+
+async def search_events(
     query: str,
     num_results: int = 6,
     tavily_api_key: Optional[str] = None,
     exa_api_key: Optional[str] = None,
     jina_api_key: Optional[str] = None,
-    enhance_content: bool = False
-) -> Dict:
+    enhance_content: bool = False,
+    time_budget: float = WEB_QUERY_BUDGET,
+    providers: Optional[List[Tuple[str, object]]] = None,
+    use_local_index: bool = True,
+    dedupe: bool = True
+) -> AsyncIterator[Dict]:
     """
-    Main function: Search using premium APIs and process results
+    Search pipeline as a stream of progress events
     
     Args:
         query: Search query
@@ -376,64 +912,134 @@ async def search_and_process(
         exa_api_key: Exa API key (optional, uses env var)
         jina_api_key: Jina API key for content enhancement (optional)
         enhance_content: Whether to enhance content with additional crawling
+        time_budget: Seconds for search + enhancement; when it runs out,
+            results that are still being enhanced keep their original content
+        providers: (name, engine) pairs in preference order; defaults to the
+            shared Tavily/Exa engines. Any object with an async
+            search(query, num_results) works, e.g. offline stubs.
+        use_local_index: Answer from the persistent web knowledge index when
+            it already has enough fresh, relevant chunks
+        dedupe: Drop near-duplicate chunks (mirrored/syndicated copies, or
+            copies of relevant index chunks) before embedding
         
-    Returns:
-        Dict with chunks, sources, embeddings, and stats
+    Yields:
+        {'type': 'sources', 'sources': [...], 'search_method', 'cache'} as soon
+            as provider (or index) results are known; cards waiting for
+            enhancement have status 'pending', the others 'ready'
+        {'type': 'source_update', 'url', 'status'} when a pending source is
+            'ready' or 'timed_out'
+        {'type': 'result', 'result': {...}} last, with chunks, sources,
+            embeddings, stats and per-stage 'timings' (ms since start)
     """
     logger.info(f"🔍 Starting search for: {query}")
     
-    search_results = []
-    ai_answer = ""
-    search_method = ""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    budget_end = started + time_budget
+    timings = {}
     
-    # Try Tavily first (primary)
-    if TAVILY_AVAILABLE:
-        try:
-            tavily = TavilySearchEngine(api_key=tavily_api_key)
-            response = await tavily.search(query, num_results)
-            
-            if response.get('success') and response.get('results'):
-                search_results = response['results']
-                ai_answer = response.get('answer', '')
-                search_method = 'tavily'
-                logger.info(f"✅ Using Tavily results")
-        except Exception as e:
-            logger.warning(f"⚠️  Tavily failed: {str(e)[:100]}")
+    def mark(stage: str):
+        timings[stage] = round((loop.time() - started) * 1000, 1)
     
-    # Fallback to Exa AI if Tavily failed
-    if not search_results and EXA_AVAILABLE:
-        try:
-            exa = ExaSearchEngine(api_key=exa_api_key)
-            response = await exa.search(query, num_results)
-            
-            if response.get('success') and response.get('results'):
-                search_results = response['results']
-                search_method = 'exa'
-                logger.info(f"✅ Using Exa AI results")
-        except Exception as e:
-            logger.warning(f"⚠️  Exa AI failed: {str(e)[:100]}")
+    embedding_model = get_embedding_model()
+    
+    # Answer from the local web knowledge index when it already covers the query
+    local_hits = []
+    if use_local_index:
+        query_embedding = embedding_model.encode([query], show_progress_bar=False)[0]
+        local_hits = web_index.search(query_embedding, k=LOCAL_SEARCH_K)
+        mark('local_index')
+        if web_index.is_sufficient(local_hits):
+            web_index.stats['local_answers'] += 1
+            logger.info(f"🗂️  Answering from the web knowledge index ({len(local_hits)} chunks)")
+            result_dict = _local_index_result(web_index.relevant_hits(local_hits))
+            yield {'type': 'sources', 'sources': _index_cards(result_dict['sources']),
+                   'search_method': 'local_index', 'cache': 'local_index'}
+            result_dict['timings'] = timings
+            yield {'type': 'result', 'result': result_dict}
+            return
+        local_hits = web_index.relevant_hits(local_hits)
+    web_index.stats['live_searches'] += 1
+    
+    if providers is None:
+        providers = get_default_providers(tavily_api_key, exa_api_key)
+    
+    search_method, response, cache_state = await cached_search(query, num_results, providers)
+    search_results = response.get('results', []) if search_method else []
+    ai_answer = response.get('answer', '') if search_method else ''
+    mark('search')
+    if search_method:
+        logger.info(f"✅ Using {search_method} results")
     
     if not search_results:
-        return {
+        if local_hits:
+            logger.warning("⚠️  No live results; falling back to the web knowledge index")
+            result_dict = _local_index_result(local_hits)
+            yield {'type': 'sources', 'sources': _index_cards(result_dict['sources']),
+                   'search_method': 'local_index', 'cache': 'local_index'}
+            result_dict['timings'] = timings
+            yield {'type': 'result', 'result': result_dict}
+            return
+        yield {'type': 'result', 'result': {
             'chunks': [],
             'sources': [],
             'embeddings': None,
             'error': 'No search results found from any API',
-            'search_method': 'none'
-        }
+            'search_method': 'none',
+            'timings': timings
+        }}
+        return
     
     # Process results and optionally enhance content
     enhancer = ContentEnhancer(jina_api_key=jina_api_key) if enhance_content else None
     all_chunks = []
     all_sources = []
+    contents = [result.get('content', '') for result in search_results]
+    needs_enhancement = [bool(enhancer) and len(content) < 300 for content in contents]
     
-    for result in search_results:
-        content = result.get('content', '')
-        
-        # Optionally enhance content if it's too short
-        if enhancer and len(content) < 300:
-            content = await enhancer.enhance_if_needed(result['url'], content)
+    yield {
+        'type': 'sources',
+        'sources': [_source_card(result, 'pending' if pending else 'ready')
+                    for result, pending in zip(search_results, needs_enhancement)],
+        'search_method': search_method,
+        'cache': cache_state
+    }
+    
+    # Optionally enhance short content, all URLs concurrently, within the time budget
+    enhance_tasks = {}
+    if enhancer:
+        enhance_tasks = {
+            asyncio.create_task(enhancer.enhance_if_needed(result['url'], content)): idx
+            for idx, (result, content) in enumerate(zip(search_results, contents))
+            if needs_enhancement[idx]
+        }
+    try:
+        pending = set(enhance_tasks)
+        while pending:
+            remaining = budget_end - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                idx = enhance_tasks[task]
+                if not task.exception() and task.result():
+                    contents[idx] = task.result()
+                yield {'type': 'source_update', 'url': search_results[idx]['url'], 'status': 'ready'}
         
+        for task in pending:
+            task.cancel()
+            yield {'type': 'source_update', 'url': search_results[enhance_tasks[task]]['url'], 'status': 'timed_out'}
+        if pending:
+            enhancer.stats['timed_out'] += len(pending)
+            logger.warning(f"⏱️  Web query budget spent; {len(pending)} URLs keep their original content")
+    finally:
+        # Also reached when a streaming client disconnects mid-enhancement
+        for task in enhance_tasks:
+            task.cancel()
+    if enhancer:
+        mark('enhance')
+    
+    for result, content in zip(search_results, contents):
         if len(content) < 100:
             logger.warning(f"⚠️  Skipping {result['url']}: content too short")
             continue
@@ -463,58 +1069,147 @@ async def search_and_process(
             })
     
     if not all_chunks:
-        return {
+        yield {'type': 'result', 'result': {
             'chunks': [],
             'sources': [],
             'embeddings': None,
             'error': 'Failed to extract content from search results',
             'search_method': search_method,
-            'total_results': len(search_results)
-        }
+            'total_results': len(search_results),
+            'timings': timings
+        }}
+        return
+    
+    # Drop mirrored/syndicated copies before paying for their embeddings
+    dedup_stats = None
+    if dedupe:
+        all_chunks, all_sources, dedup_stats = dedupe_chunks(
+            all_chunks, all_sources, reference_texts=[h['text'] for h in local_hits]
+        )
+        if not all_chunks:
+            # Every live chunk was a copy of a relevant index chunk
+            result_dict = _local_index_result(local_hits)
+            result_dict['dedup_stats'] = dedup_stats
+            result_dict['timings'] = timings
+            yield {'type': 'result', 'result': result_dict}
+            return
     
     # Generate embeddings
     logger.info(f"🧠 Generating embeddings for {len(all_chunks)} chunks")
     
-    embedding_model = get_embedding_model()
     embeddings = embedding_model.encode(all_chunks, show_progress_bar=False)
+    mark('embed')
+    
+    # Keep the scraped chunks for later queries
+    web_index.upsert(all_chunks, all_sources, embeddings)
+    
+    # Relevant chunks already in the index join the candidates
+    live_ids = {chunk_id(chunk) for chunk in all_chunks}
+    extra_hits = [h for h in local_hits if chunk_id(h['text']) not in live_ids]
+    if extra_hits:
+        all_chunks = all_chunks + [h['text'] for h in extra_hits]
+        all_sources = all_sources + [h['source'] for h in extra_hits]
+        embeddings = np.vstack([embeddings, np.stack([h['embedding'] for h in extra_hits])])
     
     result_dict = {
         'chunks': all_chunks,
         'sources': all_sources,
         'embeddings': embeddings,
+        'scorer': VectorScorer(embeddings),
         'search_method': search_method,
+        'cache': cache_state,
         'ai_answer': ai_answer,
         'total_results': len(search_results),
-        'successful_chunks': len(all_chunks)
+        'successful_chunks': len(all_chunks),
+        'timings': timings
     }
     
     if enhancer:
         result_dict['enhancement_stats'] = enhancer.get_stats()
+    if dedup_stats:
+        result_dict['dedup_stats'] = dedup_stats
     
     logger.info(f"✅ Complete: {len(all_chunks)} chunks from {len(search_results)} sources via {search_method}")
     
-    return result_dict
+    yield {'type': 'result', 'result': result_dict}
+
+
+async def search_and_process(
+    query: str,
+    num_results: int = 6,
+    tavily_api_key: Optional[str] = None,
+    exa_api_key: Optional[str] = None,
+    jina_api_key: Optional[str] = None,
+    enhance_content: bool = False,
+    time_budget: float = WEB_QUERY_BUDGET,
+    providers: Optional[List[Tuple[str, object]]] = None,
+    use_local_index: bool = True,
+    dedupe: bool = True
+) -> Dict:
+    """
+    Main function: Search using premium APIs and process results
+    
+    Runs search_events to completion (same arguments) and returns its final
+    result.
+        
+    Returns:
+        Dict with chunks, sources, embeddings, and stats
+    """
+    events = search_events(query, num_results, tavily_api_key, exa_api_key, jina_api_key,
+                           enhance_content, time_budget, providers, use_local_index, dedupe)
+    try:
+        async for event in events:
+            if event['type'] == 'result':
+                return event['result']
+    finally:
+        await events.aclose()
+
+
+def _index_cards(sources: List[Dict]) -> List[Dict]:
+    """One ready source card per distinct URL of web knowledge index hits."""
+    cards = {}
+    for source in sources:
+        cards.setdefault(source['url'], _source_card(source, 'ready'))
+    return list(cards.values())
+
+
+def _local_index_result(hits: List[Dict]) -> Dict:
+    """Shape web knowledge index hits like a live search result."""
+    embeddings = np.stack([h['embedding'] for h in hits])
+    return {
+        'chunks': [h['text'] for h in hits],
+        'sources': [h['source'] for h in hits],
+        'embeddings': embeddings,
+        'scorer': VectorScorer(embeddings),
+        'search_method': 'local_index',
+        'cache': 'local_index',
+        'ai_answer': '',
+        'total_results': len({h['source']['url'] for h in hits}),
+        'successful_chunks': len(hits)
+    }
 
 
 def find_relevant_chunks(query: str, chunks: List[str], sources: List[Dict],
-                         embeddings: np.ndarray, k: int = 5) -> List[Dict]:
-    """Find most relevant chunks using semantic similarity"""
-    embedding_model = get_embedding_model()
-    query_embedding = embedding_model.encode([query])[0]
+                         embeddings: Optional[np.ndarray] = None, k: int = 5,
+                         scorer: Optional[VectorScorer] = None) -> List[Dict]:
+    """
+    Find most relevant chunks using semantic similarity (normalized matmul + argpartition top-k)
     
-    # Calculate cosine similarity
-    similarities = np.dot(embeddings, query_embedding) / (
-        np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query_embedding)
-    )
+    Pass the search result's 'scorer' (normalized once per chunk set) rather
+    than raw embeddings, which are normalized again on every call.
+    """
+    embedding_model = get_embedding_model()
+    query_embedding = embedding_model.encode([query], show_progress_bar=False)[0]
     
-    # Get top k indices
-    top_indices = np.argsort(similarities)[::-1][:k]
+    if scorer is None:
+        scorer = VectorScorer(embeddings)
+    indices, similarities = scorer.top_k(query_embedding, k)
     
     results = []
-    for idx in top_indices:
+    for idx, similarity in zip(indices[0], similarities[0]):
         results.append({
             'text': chunks[idx],
-            'similarity': float(similarities[idx]),
+            'similarity': float(similarity),
             'source': sources[idx]
         })
     
@@ -531,7 +1226,11 @@ async def process_web_search(
     tavily_api_key: Optional[str] = None,
     exa_api_key: Optional[str] = None,
     jina_api_key: Optional[str] = None,
-    enhance_content: bool = False
+    enhance_content: bool = False,
+    time_budget: float = WEB_QUERY_BUDGET,
+    providers: Optional[List[Tuple[str, object]]] = None,
+    use_local_index: bool = True,
+    dedupe: bool = True
 ) -> Dict:
     """
     FastAPI router-compatible function for web search.
@@ -543,13 +1242,19 @@ async def process_web_search(
         exa_api_key: Exa API key (optional)
         jina_api_key: Jina API key for content enhancement (optional)
         enhance_content: Whether to enhance content with additional crawling
+        time_budget: Seconds for search + enhancement
+        providers: Optional (name, engine) pairs overriding Tavily/Exa
+        use_local_index: Search the persistent web knowledge index first
+        dedupe: Drop near-duplicate chunks before embedding
     
     Returns:
         Dict with keys:
             - chunks: List of text chunks
             - sources: List of source metadata dicts
             - embeddings: numpy array of embeddings
-            - search_method: Which API was used ('tavily' or 'exa')
+            - scorer: VectorScorer over the embeddings, for find_relevant_chunks
+            - search_method: Which API answered first ('tavily' or 'exa'),
+              or 'local_index' when answered from the web knowledge index
             - ai_answer: AI-generated answer (from Tavily)
             - error: Optional error message
     """
@@ -560,7 +1265,11 @@ async def process_web_search(
             tavily_api_key,
             exa_api_key,
             jina_api_key,
-            enhance_content
+            enhance_content,
+            time_budget,
+            providers,
+            use_local_index,
+            dedupe
         )
         return result
     except Exception as e:
@@ -610,8 +1319,8 @@ async def test_search():
             query,
             result['chunks'],
             result['sources'],
-            result['embeddings'],
-            k=3
+            k=3,
+            scorer=result['scorer']
         )
         
         print(f"\n📊 Top 3 relevant chunks:")